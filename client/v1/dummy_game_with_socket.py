@@ -10,9 +10,11 @@ import asyncio
 from websockets import connect
 from websockets.asyncio.client import ClientConnection
 from lib.data_structures import Point
-from game_assets.interface import get_data, get_intro_image_path
+from game_assets.interface import get_data
+from lib.assets import ASSETS
 from lib.v1.common import PlayerInfo
 from lib.v1.config import TEST_DOMAIN, FullPath
+from lib.text_cache import render_text
 
 
 async def send_worker(websocket: ClientConnection, send_queue: asyncio.Queue):
@@ -60,7 +62,7 @@ async def async_simple_game_function_with_socket_communication(frame_limit=None)
     imported_data = get_data()
     message = imported_data
 
-    ball = pygame.image.load(get_intro_image_path())
+    ball = ASSETS.image("intro_ball.gif")
     ball_speed = [2, 2]
     ball_rect = ball.get_rect()
 
@@ -120,11 +122,11 @@ async def async_simple_game_function_with_socket_communication(frame_limit=None)
             if ball_rect.top < 0 or ball_rect.bottom > screen.get_height():
                 ball_speed[1] = -ball_speed[1]
 
-            text_surface_fps = text_surface = font.render(
-                f"FPS: {cur_fps}", False, "yellow"
+            text_surface_fps = text_surface = render_text(
+                font, f"FPS: {cur_fps}", False, "yellow"
             )
 
-            text_surface = font.render(message, False, "yellow")
+            text_surface = render_text(font, message, False, "yellow")
             tw, th = text_surface.get_width(), text_surface.get_height()
             text_surface_rect = (
                 screen.get_width() // 2 - tw // 2,
@@ -18,9 +18,10 @@ import asyncio
 import requests
 from websockets import connect
 from websockets.asyncio.client import ClientConnection
-from game_assets.interface import get_intro_image_path
+from lib.assets import ASSETS
 from lib.v1.common import PlayerInfo, WS_Message, parse_WS_Message
 from lib.v1.config import TEST_DOMAIN, FullPath
+from lib.text_cache import render_text
 
 # Add in some super simple way to have a different domain and ssl or not.
 # EX:
@@ -91,7 +92,7 @@ async def async_simple_game_function_with_socket_communication():
     small_font = pygame.font.SysFont(default_font_name, 24)
     font = pygame.font.SysFont(default_font_name, 40)
 
-    ball = pygame.image.load(get_intro_image_path())
+    ball = ASSETS.image("intro_ball.gif")
     ball_rect = ball.get_rect()
 
     running = True
@@ -172,7 +173,7 @@ async def async_simple_game_function_with_socket_communication():
                     )
                 )
 
-            text_surface_fps = font.render(f"FPS: {cur_fps}", False, "yellow")
+            text_surface_fps = render_text(font, f"FPS: {cur_fps}", False, "yellow")
 
             screen.fill("purple")
 
@@ -183,8 +184,8 @@ async def async_simple_game_function_with_socket_communication():
             for player_session_uuid, client_ball_rect in ball_rect_player_dict.items():
                 if player_session_uuid != player_info.id:
                     screen.blit(ball, client_ball_rect)
-                    player_id_text_surface = small_font.render(
-                        f"{player_session_uuid}", False, "pink"
+                    player_id_text_surface = render_text(
+                        small_font, f"{player_session_uuid}", False, "pink"
                     )
                     screen.blit(player_id_text_surface, client_ball_rect)
 
@@ -20,37 +20,73 @@ or
 ```
 (export DOMAIN="localhost:8000" && export SECURE=FALSE && bazel run client:v2_client)
 ```
+
+Set `WIRE_FORMAT=binary` to use the compact binary encoding for
+position snapshots instead of JSON.  Set `DELTA_COMPRESSION=false` to
+always get full snapshots instead of only what changed.
 """
 
+import asyncio
 import sys
 from lib.v2.game_simple import *
-from lib.v1.common import WS_Message, parse_WS_Message
-from lib.v2.config import TEST_DOMAIN, FullPath
+from lib.v1.common import WS_Message
+from lib.v2.config import TEST_DOMAIN, FullPath, WireFormat
+from lib.v2.wire import (
+    decode_ws_message,
+    encode_ws_message,
+    parse_wire_format,
+    peek_message_type,
+)
 from websockets import connect
 from websockets.asyncio.client import ClientConnection
 
 
-def get_websocket_url(game):
+# Full snapshots and deltas, see `lib/v2/delta.py`
+SNAPSHOT_MESSAGE_TYPES = {"SERVER_POSITION_V2", "SERVER_DELTA_V2"}
+
+
+def get_wire_format() -> WireFormat:
+    return parse_wire_format(os.environ.get("WIRE_FORMAT"))
+
+
+def get_websocket_url(game, wire_format: WireFormat = WireFormat.JSON):
     DOMAIN = os.environ.get("DOMAIN", TEST_DOMAIN)
     SECURE_S = "s" if os.environ.get("SECURE", "false").lower() == "true" else ""
-    url = f"ws{SECURE_S}://{DOMAIN}{FullPath.WS.value}".replace(
+    # Without a room the server puts everyone in its default room
+    room_id = os.environ.get("ROOM_ID")
+    path = FullPath.ROOM_WS.value if room_id else FullPath.WS.value
+    url = f"ws{SECURE_S}://{DOMAIN}{path}".replace(
         "{player_session_uuid}", game.get_cur_player_id()
     )
-    return url
+    if room_id:
+        url = url.replace("{room_id}", room_id)
+    return f"{url}?wire_format={wire_format.value}"
 
 
-async def out_worker(websocket: ClientConnection, out_queue: asyncio.Queue):
+async def out_worker(
+    websocket: ClientConnection,
+    out_queue: asyncio.Queue,
+    wire_format: WireFormat = WireFormat.JSON,
+):
     while True:
         message: WS_Message = await out_queue.get()
-        await websocket.send(message.model_dump_json())
+        await websocket.send(encode_ws_message(message, wire_format))
         out_queue.task_done()
 
 
 async def in_worker(websocket: ClientConnection, in_queue: asyncio.Queue):
     while True:
         message = await websocket.recv()
-        ws_msg: WS_Message = parse_WS_Message(message)
-        if ws_msg.message_type == "SERVER_POSITION_V2":
+        # Skip decoding the debug broadcasts and other messages the game
+        # doesn't handle
+        if peek_message_type(message) not in SNAPSHOT_MESSAGE_TYPES:
+            continue
+        try:
+            ws_msg: WS_Message = decode_ws_message(message)
+        except ValueError as e:
+            print(f"Dropping bad frame from server: {e}")
+            continue
+        if ws_msg.message_type in SNAPSHOT_MESSAGE_TYPES:
             in_queue.put_nowait(ws_msg)
 
 
@@ -58,13 +94,16 @@ async def async_main():
     os.environ["IS_SERVER_MODE"] = "FALSE"
     game = create_game()
     game.network_client = NetworkClient()
-    url = get_websocket_url(game)
+    wire_format = get_wire_format()
+    url = get_websocket_url(game, wire_format)
 
     async with connect(
         url, close_timeout=0.1  # Didn't implement closing functionality yet on server
     ) as websocket:
         tasks = [
-            asyncio.create_task(out_worker(websocket, game.network_client.out_queue)),
+            asyncio.create_task(
+                out_worker(websocket, game.network_client.out_queue, wire_format)
+            ),
             asyncio.create_task(in_worker(websocket, game.network_client.in_queue)),
         ]
         while game.running:
@@ -31,8 +31,8 @@ from typing import List
 from pydantic import BaseModel, ConfigDict
 import pydantic
 import pygame as pg
-from pygame import examples as main_dir
-from importlib.resources import as_file, files
+
+from lib.assets import ASSETS
 
 # see if we can load more than standard BMP
 if not pg.image.get_extended():
@@ -46,37 +46,33 @@ BOMB_ODDS = 60  # chances a new bomb will drop
 ALIEN_RELOAD = 12  # frames between new aliens
 SCREENRECT = pg.Rect(0, 0, 640, 480)
 SCORE = 0
+IMAGES = (
+    "player1.gif",
+    "explosion1.gif",
+    "alien1.gif",
+    "alien2.gif",
+    "alien3.gif",
+    "bomb.gif",
+    "shot.gif",
+    "background.gif",
+)
 
 
 def get_file(file):
-    examples_dir_files = files(main_dir)
-    with as_file(examples_dir_files) as examples_dir:
-        data_dir_filepath = examples_dir.joinpath("data")
-        file = data_dir_filepath.joinpath(file)
-    return file
+    return ASSETS.path(file)
 
 
-def load_image(file):
+def load_image(file, flip_x=False, flip_y=False):
     """loads an image, prepares it for play"""
-    file = get_file(file)
     try:
-        surface = pg.image.load(file)
-    except pg.error:
-        raise SystemExit(f'Could not load image "{file}" {pg.get_error()}')
-    return surface.convert()
+        return ASSETS.image(file, flip_x=flip_x, flip_y=flip_y)
+    except (FileNotFoundError, pg.error) as e:
+        raise SystemExit(f'Could not load image "{file}" {e}')
 
 
 def load_sound(file):
     """because pygame can be compiled without mixer."""
-    if not pg.mixer:
-        return None
-    file = get_file(file)
-    try:
-        sound = pg.mixer.Sound(file)
-        return sound
-    except pg.error:
-        print(f"Warning, unable to load, {file}")
-    return None
+    return ASSETS.sound(file)
 
 
 # Each type of game object gets an init and an update function.
@@ -292,16 +288,18 @@ def create_game(winstyle=0):
 
     # Load images, assign to sprite classes
     # (do this before the classes are used, after screen setup)
-    img = load_image("player1.gif")
-    Player.images = [img, pg.transform.flip(img, 1, 0)]
-    img = load_image("explosion1.gif")
-    Explosion.images = [img, pg.transform.flip(img, 1, 1)]
+    ASSETS.preload(IMAGES)
+    Player.images = [load_image("player1.gif"), load_image("player1.gif", True)]
+    Explosion.images = [
+        load_image("explosion1.gif"),
+        load_image("explosion1.gif", True, True),
+    ]
     Alien.images = [load_image(im) for im in ("alien1.gif", "alien2.gif", "alien3.gif")]
     Bomb.images = [load_image("bomb.gif")]
     Shot.images = [load_image("shot.gif")]
 
     # decorate the game window
-    icon = pg.transform.scale(Alien.images[0], (32, 32))
+    icon = ASSETS.image("alien1.gif", scale=(32, 32))
     pg.display.set_icon(icon)
     pg.display.set_caption("Pygame Aliens")
     pg.mouse.set_visible(0)
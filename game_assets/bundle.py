@@ -0,0 +1,191 @@
+"""
+All the assets in one file, for release builds.
+
+Unpacking and decoding every asset file on start up is slow, mostly
+for the images.  A bundle has the images already decoded to raw pixels
+so `AssetBundle` only has to memory map the file and point surfaces at
+the mapped pixels, nothing gets copied or decoded.  The OS only reads
+the pages of the assets that are used.
+
+```
+header: magic (4s) | version (H) | entry count (H) | index length (I)
+entry:  kind (B) | pixel format (B) | has colorkey (B) | width (I) | height (I) | colorkey (I) | offset (Q) | length (Q) | name length (H) | name
+```
+
+Everything is little endian.  Entries follow the header, the data of
+every entry starts on its own page at `offset` from the start of the
+file.  Images are `RGB` (with their colorkey, if any) or `RGBA` for
+images with per pixel alpha.  Any other file is kept as it is.
+
+Build one with `tools/pack_assets.py`.
+"""
+
+from dataclasses import dataclass
+import mmap
+from pathlib import Path
+import struct
+from typing import Dict, Iterator
+
+import pygame as pg
+
+MAGIC = b"MGAB"
+BUNDLE_VERSION = 1
+
+HEADER = struct.Struct("<4sHHI")
+ENTRY = struct.Struct("<BBBIIIQQH")
+
+KIND_IMAGE = 1
+KIND_FILE = 2
+
+PIXEL_FORMATS = {1: "RGB", 2: "RGBA"}
+PIXEL_FORMAT_CODES = {v: k for k, v in PIXEL_FORMATS.items()}
+
+IMAGE_SUFFIXES = {".bmp", ".gif", ".jpg", ".png", ".tga"}
+
+# Data starts on page boundaries so unused assets are never read
+ALIGNMENT = 4096
+
+
+@dataclass(frozen=True)
+class BundleEntry:
+    name: str
+    kind: int
+    pixel_format: str
+    colorkey: tuple | None
+    size: tuple
+    offset: int
+    length: int
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _pack_image(path: Path) -> tuple:
+    surface = pg.image.load(path)
+    if surface.get_flags() & pg.SRCALPHA:
+        pixel_format, colorkey = "RGBA", None
+    else:
+        pixel_format, colorkey = "RGB", surface.get_colorkey()
+    data = pg.image.tobytes(surface, pixel_format)
+    return pixel_format, colorkey, surface.get_size(), data
+
+
+def write_bundle(files: Dict[str, Path], out_path: Path):
+    """Packs `files`, asset name to path, into a bundle at `out_path`."""
+    entries = []
+    blobs = []
+    for name, path in files.items():
+        path = Path(path)
+        if path.suffix.lower() in IMAGE_SUFFIXES:
+            pixel_format, colorkey, size, data = _pack_image(path)
+            entries.append((name, KIND_IMAGE, pixel_format, colorkey, size))
+        else:
+            data = path.read_bytes()
+            entries.append((name, KIND_FILE, "RGB", None, (0, 0)))
+        blobs.append(data)
+
+    encoded_names = [name.encode() for name, *_ in entries]
+    index_length = sum(ENTRY.size + len(name) for name in encoded_names)
+    offset = _align(HEADER.size + index_length)
+    index = bytearray(HEADER.pack(MAGIC, BUNDLE_VERSION, len(entries), index_length))
+    offsets = []
+    for (name, kind, pixel_format, colorkey, size), encoded, data in zip(
+        entries, encoded_names, blobs
+    ):
+        colorkey_value = 0
+        if colorkey is not None:
+            colorkey_value = int.from_bytes(bytes(colorkey), "little")
+        index += ENTRY.pack(
+            kind,
+            PIXEL_FORMAT_CODES[pixel_format],
+            colorkey is not None,
+            *size,
+            colorkey_value,
+            offset,
+            len(data),
+            len(encoded),
+        )
+        index += encoded
+        offsets.append(offset)
+        offset = _align(offset + len(data))
+
+    with open(out_path, "wb") as f:
+        f.write(index)
+        for data, data_offset in zip(blobs, offsets):
+            f.seek(data_offset)
+            f.write(data)
+
+
+class AssetBundle:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            # The mapping stays valid after the file is closed
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self.entries: Dict[str, BundleEntry] = {}
+
+        magic, version, count, _ = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} isn't an asset bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(
+                f"{self.path} is version {version}, expected {BUNDLE_VERSION}"
+            )
+        position = HEADER.size
+        for _ in range(count):
+            (
+                kind,
+                pixel_format,
+                has_colorkey,
+                width,
+                height,
+                colorkey,
+                offset,
+                length,
+                name_length,
+            ) = ENTRY.unpack_from(self._view, position)
+            position += ENTRY.size
+            name = bytes(self._view[position : position + name_length]).decode()
+            position += name_length
+            self.entries[name] = BundleEntry(
+                name=name,
+                kind=kind,
+                pixel_format=PIXEL_FORMATS[pixel_format],
+                colorkey=(
+                    tuple(colorkey.to_bytes(4, "little")) if has_colorkey else None
+                ),
+                size=(width, height),
+                offset=offset,
+                length=length,
+            )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def read_bytes(self, name: str) -> memoryview:
+        """The mapped data of `name`, read only."""
+        entry = self.entries[name]
+        return self._view[entry.offset : entry.offset + entry.length]
+
+    def image(self, name: str) -> pg.Surface:
+        """
+        A surface on top of the mapped pixels, no copy is made.  It is
+        read only, drawing on it crashes.  `convert()` it or blit it.
+        """
+        entry = self.entries[name]
+        if entry.kind != KIND_IMAGE:
+            raise ValueError(f'"{name}" isn\'t an image')
+        surface = pg.image.frombuffer(
+            self.read_bytes(name), entry.size, entry.pixel_format
+        )
+        if entry.colorkey is not None:
+            surface.set_colorkey(entry.colorkey)
+        return surface
+
+    def text(self, name: str) -> str:
+        return bytes(self.read_bytes(name)).decode()
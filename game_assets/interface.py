@@ -1,17 +1,49 @@
+from functools import cache
 from importlib.resources import as_file, files
+import os
 from pathlib import Path
+from typing import List
+import game_assets
 from game_assets import data, img
+from game_assets.bundle import AssetBundle
 
+# Name of the bundle `tools/pack_assets.py` makes for release builds
+BUNDLE_NAME = "assets.bundle"
 
+
+@cache
+def _package_dir(package) -> Path:
+    """
+    Resolving the resources is slow compared to using the path, so it is
+    only done once per package.
+    """
+    with as_file(files(package)) as package_dir:
+        return Path(package_dir)
+
+
+def get_asset_dirs() -> List[Path]:
+    """Every directory with assets in it, for `lib.assets.AssetManager`."""
+    return [_package_dir(img), _package_dir(data)]
+
+
+@cache
+def get_bundle() -> AssetBundle | None:
+    """
+    The packed assets, if there are any.  `ASSET_BUNDLE` can point to the
+    bundle, otherwise it is `assets.bundle` in this package.
+    """
+    path = os.environ.get("ASSET_BUNDLE")
+    path = Path(path) if path else _package_dir(game_assets) / BUNDLE_NAME
+    return AssetBundle(path) if path.is_file() else None
+
+
+@cache
 def get_data() -> str:
-    data_dir_files = files(data)
-    with as_file(data_dir_files) as data_dir:
-        data_txt_filepath = data_dir.joinpath("data.txt")
-        return data_txt_filepath.read_text()
+    bundle = get_bundle()
+    if bundle is not None and "data.txt" in bundle:
+        return bundle.text("data.txt")
+    return _package_dir(data).joinpath("data.txt").read_text()
 
 
 def get_intro_image_path() -> Path:
-    img_dir_files = files(img)
-    with as_file(img_dir_files) as img_dir:
-        data_txt_filepath = img_dir.joinpath("intro_ball.gif")
-        return data_txt_filepath
+    return _package_dir(img).joinpath("intro_ball.gif")
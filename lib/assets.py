@@ -0,0 +1,231 @@
+"""
+One place to load images, sounds and text files from.
+
+`AssetManager` looks through its asset directories once and after that
+finds files by name only, like `"player1.gif"`.  Images are decoded the
+first time they are asked for, or ahead of time in a thread pool with
+`preload()` (decoding doesn't hold the GIL), and stay in a LRU cache
+bounded by the pixel bytes it holds.  Converted, flipped and scaled
+versions are cached too, so `image("player1.gif", flip_x=True)` is only
+flipped once.
+
+The surfaces are shared, blit them but don't draw on them.
+`load_times` has how long every file took to load.
+
+Release builds come with a bundle of all the assets (see
+`game_assets/bundle.py`), anything in it is taken from the bundle
+instead of the asset directories without decoding.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+from pathlib import Path
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import pygame as pg
+
+from game_assets.bundle import AssetBundle
+from game_assets.interface import get_asset_dirs, get_bundle
+
+# The aliens example and v2 sprites, plus every image of a few scenes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def default_asset_dirs() -> List[Path]:
+    """This repo's assets, then the ones that come with pygame's examples."""
+    from pygame import examples as pygame_examples
+
+    return [*get_asset_dirs(), Path(pygame_examples.__file__).parent / "data"]
+
+
+def _decoded_key(name: str) -> Tuple:
+    """Cache key of the image as it was decoded, see `image()`."""
+    return (name, False, False, False, False, None)
+
+
+def _surface_bytes(surface: pg.Surface) -> int:
+    return surface.get_pitch() * surface.get_height()
+
+
+class AssetManager:
+    def __init__(
+        self,
+        asset_dirs: Iterable[Path] | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        bundle: AssetBundle | None = None,
+    ):
+        """
+        `asset_dirs` defaults to `default_asset_dirs()`, looked up lazily.
+        Without `asset_dirs` the bundle from `get_bundle()` is used too.
+        """
+        self.asset_dirs = None if asset_dirs is None else list(asset_dirs)
+        if bundle is None and asset_dirs is None:
+            bundle = get_bundle()
+        self.bundle = bundle
+        self.max_bytes = max_bytes
+        self._paths: Dict[str, Path] | None = None
+        self._images: OrderedDict[Tuple, pg.Surface] = OrderedDict()
+        self._sounds: Dict[str, "pg.mixer.Sound | None"] = {}
+        self._texts: Dict[str, str] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times: Dict[str, float] = {}
+
+    def _index(self) -> Dict[str, Path]:
+        if self._paths is None:
+            if self.asset_dirs is None:
+                self.asset_dirs = default_asset_dirs()
+            paths: Dict[str, Path] = {}
+            for asset_dir in self.asset_dirs:
+                # Release builds may only have the bundle
+                if not os.path.isdir(asset_dir):
+                    continue
+                for entry in os.scandir(asset_dir):
+                    # The first directory wins for names in more than one
+                    if entry.is_file() and entry.name not in paths:
+                        paths[entry.name] = Path(entry.path)
+            self._paths = paths
+        return self._paths
+
+    def path(self, name: str) -> Path:
+        try:
+            return self._index()[name]
+        except KeyError:
+            raise FileNotFoundError(f'No asset called "{name}"') from None
+
+    def _timed(self, name: str, load, *args):
+        start = time.perf_counter()
+        result = load(*args)
+        self.load_times[name] = self.load_times.get(name, 0.0) + (
+            time.perf_counter() - start
+        )
+        return result
+
+    def _in_bundle(self, name: str) -> bool:
+        return self.bundle is not None and name in self.bundle
+
+    def _decode(self, name: str) -> pg.Surface:
+        if self._in_bundle(name):
+            return self._timed(name, self.bundle.image, name)
+        return self._timed(name, pg.image.load, self.path(name))
+
+    def _get(self, key: Tuple) -> pg.Surface | None:
+        surface = self._images.get(key)
+        if surface is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+        return surface
+
+    def _put(self, key: Tuple, surface: pg.Surface):
+        self.misses += 1
+        old = self._images.pop(key, None)
+        if old is not None:
+            self.bytes -= _surface_bytes(old)
+        self._images[key] = surface
+        self.bytes += _surface_bytes(surface)
+        # Always keep the newest one, even if it's bigger than the cache
+        while self.bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.bytes -= _surface_bytes(evicted)
+            self.evictions += 1
+
+    def image(
+        self,
+        name: str,
+        convert: bool = True,
+        alpha: bool = False,
+        flip_x: bool = False,
+        flip_y: bool = False,
+        scale: Tuple[int, int] | None = None,
+    ) -> pg.Surface:
+        """
+        The image called `name`, `convert()`ed (or `convert_alpha()`ed
+        with `alpha`) to the display's pixel format unless `convert` is
+        false, then flipped and scaled.  Converting needs a display mode
+        to be set, headless games pass `convert=False`.
+        """
+        key = (name, convert, alpha, flip_x, flip_y, scale)
+        surface = self._get(key)
+        if surface is not None:
+            return surface
+
+        if flip_x or flip_y or scale:
+            surface = self.image(name, convert, alpha)
+            if scale:
+                surface = pg.transform.scale(surface, scale)
+            if flip_x or flip_y:
+                surface = pg.transform.flip(surface, flip_x, flip_y)
+        elif convert:
+            decoded = self.image(name, convert=False)
+            surface = decoded.convert_alpha() if alpha else decoded.convert()
+        else:
+            surface = self._decode(name)
+        self._put(key, surface)
+        return surface
+
+    def preload(self, names: Iterable[str], workers: int | None = None):
+        """
+        Decode `names` in parallel so the first `image()` calls don't.
+        Converting needs the display and happens on first use.
+        """
+        names = [name for name in names if _decoded_key(name) not in self._images]
+        # Bundled images don't need decoding
+        for name in [name for name in names if self._in_bundle(name)]:
+            self.image(name, convert=False)
+        names = [name for name in names if not self._in_bundle(name)]
+        if not names:
+            return
+        workers = workers or min(len(names), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            surfaces = list(pool.map(self._decode, names))
+        for name, surface in zip(names, surfaces):
+            self._put(_decoded_key(name), surface)
+
+    def sound(self, name: str) -> "pg.mixer.Sound | None":
+        """`None` when pygame has no mixer or it couldn't load the sound."""
+        if name not in self._sounds:
+            sound = None
+            if pg.mixer:
+                try:
+                    if self._in_bundle(name):
+                        file = io.BytesIO(self.bundle.read_bytes(name))
+                    else:
+                        file = self.path(name)
+                    sound = self._timed(name, pg.mixer.Sound, file)
+                except pg.error:
+                    print(f"Warning, unable to load, {name}")
+            self._sounds[name] = sound
+        return self._sounds[name]
+
+    def text(self, name: str) -> str:
+        if name not in self._texts:
+            if self._in_bundle(name):
+                self._texts[name] = self._timed(name, self.bundle.text, name)
+            else:
+                self._texts[name] = self._timed(name, self.path(name).read_text)
+        return self._texts[name]
+
+    def clear(self):
+        self._images.clear()
+        self._sounds.clear()
+        self._texts.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "images": len(self._images),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "load_seconds": sum(self.load_times.values()),
+        }
+
+
+# Shared by everything that loads assets in this process
+ASSETS = AssetManager()
@@ -0,0 +1,86 @@
+"""
+Cache of rendered text surfaces.
+
+`Font.render()` rasterizes every glyph each time it is called, even when
+the text is the same as last frame.  FPS counters, labels and nameplates
+barely ever change, so `render_text()` keeps the surfaces it rendered
+keyed by (font, text, antialias, colour, background) and hands the same
+surface back next time.  The least recently used surfaces get dropped
+once there are more than `max_entries`.
+
+The surfaces are shared, blit them but don't draw on them.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+import pygame as pg
+
+# Enough for every nameplate of a full server plus FPS counters
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def _color_key(color) -> Hashable:
+    # `pg.Color` isn't hashable
+    return tuple(color) if isinstance(color, pg.Color) else color
+
+
+class TextCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError("`max_entries` must be positive!")
+        self.max_entries = max_entries
+        self._surfaces: OrderedDict[Tuple, pg.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def render(
+        self, font: pg.font.Font, text: str, antialias: bool, color, background=None
+    ) -> pg.Surface:
+        """Same arguments as `Font.render()` with the font first."""
+        key = (
+            font,
+            text,
+            bool(antialias),
+            _color_key(color),
+            _color_key(background),
+        )
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color, background)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared by everything that draws text in this process
+TEXT_CACHE = TextCache()
+
+
+def render_text(
+    font: pg.font.Font, text: str, antialias: bool, color, background=None
+) -> pg.Surface:
+    return TEXT_CACHE.render(font, text, antialias, color, background)
@@ -13,6 +13,7 @@ class WS_Message(BaseModel):
     player_session_uuid: str
     message_type: str
     body: Any
+    tick: int | None = None
 
 
 def parse_WS_Message(input_str: str):
@@ -2,7 +2,9 @@ import sys
 import pygame
 import asyncio
 from lib.data_structures import Point
-from game_assets.interface import get_data, get_intro_image_path
+from lib.text_cache import render_text
+from game_assets.interface import get_data
+from lib.assets import ASSETS
 
 
 async def async_simple_game_function(frame_limit=None):
@@ -43,7 +45,7 @@ async def async_simple_game_function(frame_limit=None):
     default_font_name = pygame.font.get_default_font()
     font = pygame.font.SysFont(default_font_name, 40)
 
-    ball = pygame.image.load(get_intro_image_path())
+    ball = ASSETS.image("intro_ball.gif")
     ball_speed = [2, 2]
     ball_rect = ball.get_rect()
 
@@ -71,11 +73,11 @@ async def async_simple_game_function(frame_limit=None):
         if ball_rect.top < 0 or ball_rect.bottom > screen.get_height():
             ball_speed[1] = -ball_speed[1]
 
-        text_surface_fps = text_surface = font.render(
-            f"FPS: {cur_fps}", False, "yellow"
+        text_surface_fps = text_surface = render_text(
+            font, f"FPS: {cur_fps}", False, "yellow"
         )
 
-        text_surface = font.render(imported_data, False, "yellow")
+        text_surface = render_text(font, imported_data, False, "yellow")
         tw, th = text_surface.get_width(), text_surface.get_height()
         text_surface_rect = (
             screen.get_width() // 2 - tw // 2,
@@ -6,6 +6,60 @@ TEST_HOST = "127.0.0.1"
 TEST_PORT = 8000
 TEST_DOMAIN = f"{TEST_HOST}:{TEST_PORT}"
 
+# Simulation ticks per second on the server, can be overridden with the
+# `SERVER_TICK_RATE` environment variable.
+SERVER_TICK_RATE = 60
+
+# Area of interest filtering is turned on by setting the `AOI_RADIUS`
+# environment variable on the server (in pixels).  `AOI_CELL_SIZE`
+# defaults to the radius and `AOI_HYSTERESIS` to this value.
+AOI_HYSTERESIS = 1.25
+
+# The server sends a snapshot every this many ticks, can be overridden
+# with the `SNAPSHOT_EVERY_N_TICKS` environment variable.
+SNAPSHOT_EVERY_N_TICKS = 5
+
+# Clients draw network sprites this far in the past so there is always a
+# snapshot on either side to interpolate between.  Should be at least
+# two snapshot intervals.  Set `INTERPOLATION_DELAY_MS=0` to turn off
+# interpolation.  `MAX_EXTRAPOLATION_MS` limits how far sprites keep
+# moving on their own when snapshots are late.
+INTERPOLATION_DELAY_MS = 150
+MAX_EXTRAPOLATION_MS = 250
+
+# The server can keep the rect of every entity for this many ticks so
+# hits can be checked against what a client saw, see
+# `lib/v2/lag_compensation.py`.  Off (0) by default since nothing checks
+# hits yet and recording costs time every tick, 64 is a bit over a
+# second at the default tick rate.  Can be overridden with the
+# `HISTORY_TICKS` environment variable.
+HISTORY_TICKS = 0
+
+# Clients acknowledge the snapshots they got and the server only sends
+# them what changed since, see `lib/v2/delta.py`.  Every this many
+# snapshots a full one is sent anyways, and deltas are only made against
+# the last `DELTA_BASELINES` snapshots.  Set `DELTA_COMPRESSION=false`
+# on the client to never acknowledge snapshots, the server then sends
+# full snapshots only.
+KEYFRAME_EVERY_N_SNAPSHOTS = 30
+DELTA_BASELINES = 32
+
+# Most messages each `NetworkClient` queue holds, see `MessageQueue`.
+MAX_QUEUED_MESSAGES = 1024
+
+# Rooms are separate games on the same server, see `server/v2/rooms.py`.
+# Clients connecting to `FullPath.WS` play in `DEFAULT_ROOM_ID`, which
+# is always running.  Other rooms are started by the first player that
+# joins and stopped once they have been empty for `ROOM_IDLE_TIMEOUT`
+# seconds.
+DEFAULT_ROOM_ID = "default"
+ROOM_ID_PATTERN = r"[A-Za-z0-9_-]{1,32}"
+MAX_ROOMS = 64
+ROOM_IDLE_TIMEOUT = 10.0
+
+# Prometheus scrapes this path by default, so it isn't under `ROOT_PREFIX`
+METRICS_PATH = "/metrics"
+
 
 class RootPath(Enum):
     JOIN = f"/{ROOT_PREFIX}/join"
@@ -13,6 +67,9 @@ class RootPath(Enum):
     UPDATE = f"/{ROOT_PREFIX}/update"
     LEAVE = f"/{ROOT_PREFIX}/leave"
     WS = f"/{ROOT_PREFIX}/ws"
+    ROOMS = f"/{ROOT_PREFIX}/rooms"
+    WORKERS = f"/{ROOT_PREFIX}/workers"
+    DEBUG_TICKS = f"/{ROOT_PREFIX}/debug/ticks"
 
 
 class FullPath(Enum):
@@ -21,3 +78,18 @@ class FullPath(Enum):
     UPDATE = f"{RootPath.UPDATE.value}/{{player_session_uuid}}"
     LEAVE = f"{RootPath.LEAVE.value}/{{player_session_uuid}}"
     WS = f"{RootPath.WS.value}/{{player_session_uuid}}"
+    ROOMS = RootPath.ROOMS.value
+    WORKERS = RootPath.WORKERS.value
+    ROOM_WS = f"{RootPath.ROOMS.value}/{{room_id}}/ws/{{player_session_uuid}}"
+    DEBUG_TICKS = RootPath.DEBUG_TICKS.value
+    DEBUG_TICK_TRACE = f"{RootPath.DEBUG_TICKS.value}/trace"
+
+
+class WireFormat(Enum):
+    """
+    Encoding used for position snapshots on a websocket connection.
+    Picked by the client with the `wire_format` query parameter.
+    """
+
+    JSON = "json"
+    BINARY = "binary"
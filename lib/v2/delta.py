@@ -0,0 +1,276 @@
+"""
+Delta compression of position snapshots.
+
+A `SERVER_POSITION_V2` snapshot has every sprite in it even when most
+of them didn't move since the last one.  Instead every client
+acknowledges the snapshots it applied (`CLIENT_ACK_V2`) and the server
+sends `SERVER_DELTA_V2` messages with only what changed since the
+newest snapshot that client acknowledged, its baseline:
+
+- entities that are new or changed, with only the fields that changed
+- ids of entities that are gone
+- the last input of the receiving player the server applied, for client
+  side prediction (see `lib/v2/prediction.py`)
+
+Full snapshots have the last input of every player, but only the
+receiving player needs theirs.  Players that keep sending inputs while
+standing still would otherwise show up in every delta just for their
+input seq, so deltas only have the one of the player they are sent to
+(`input_seq`) and entities never change just because of it.
+
+A delta only depends on its baseline, not on the deltas before it, so
+deltas can be dropped or coalesced like full snapshots.  The server
+falls back to a full snapshot (a keyframe) when:
+
+- the client hasn't acknowledged anything yet, like old clients that
+  never do
+- its baseline is older than the last `max_baselines` snapshots, which
+  happens when acks get lost or the client falls behind
+- `keyframe_every` snapshots were sent since the last keyframe
+
+`DeltaEncoder` keeps the server side state of one connection and
+`DeltaDecoder` the client side.  Both keep the last `max_baselines`
+snapshots, the client can always resolve a baseline the server picked
+since it only picks snapshots out of the last ones it sent.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+from lib.v2.config import DELTA_BASELINES, KEYFRAME_EVERY_N_SNAPSHOTS
+from lib.v2.messages import EntityState, register_body
+
+States = Dict[str, EntityState]
+
+
+class EntityDelta(NamedTuple):
+    """
+    An entity in a delta, None for fields that didn't change.  New
+    entities have every field.
+    """
+
+    id: str
+    class_name: str | None = None
+    position: Tuple[int, int] | None = None
+    size: Tuple[int, int] | None = None
+
+
+class SnapshotDelta(NamedTuple):
+    baseline_tick: int
+    changed: List[EntityDelta]
+    removed: List[str]
+    # Last input of the receiving player the server applied
+    input_seq: int | None = None
+
+
+class SnapshotChanges(NamedTuple):
+    """What applying a snapshot changed compared to the one before."""
+
+    states: States
+    changed: List[EntityState]
+    removed: List[str]
+
+
+def to_states(body: Iterable[Dict[str, Any] | EntityState]) -> States:
+    """Snapshot body, dicts or `EntityState` tuples, by id."""
+    states = {}
+    for item in body:
+        if isinstance(item, dict):
+            rect = item["rect"]
+            item = EntityState(
+                item["id"],
+                item["class_name"],
+                rect if isinstance(rect, tuple) else tuple(rect),
+                item.get("last_input_seq"),
+            )
+        states[item.id] = item
+    return states
+
+
+def _unchanged(old: EntityState | None, state: EntityState) -> bool:
+    """Input seqs don't count, see `SnapshotDelta.input_seq`."""
+    return (
+        old is not None
+        and old.rect == state.rect
+        and old.class_name == state.class_name
+    )
+
+
+def diff_states(baseline_tick: int, baseline: States, states: States) -> Dict[str, Any]:
+    """
+    The `SERVER_DELTA_V2` body that turns `baseline` into `states`.
+    Changed entities are dicts with the changed fields only, like the
+    dicts of `Game.get_network_sprites_dict()`.  It is the same for
+    every client with this baseline, `input_seq` is left for the caller
+    to fill in per client.
+    """
+    changed = []
+    for id, state in states.items():
+        old = baseline.get(id)
+        if _unchanged(old, state):
+            continue
+        item: Dict[str, Any] = {"id": id}
+        rect = state.rect
+        if old is None or old.class_name != state.class_name:
+            item["class_name"] = state.class_name
+        if old is None or old.rect[:2] != rect[:2]:
+            item["position"] = rect[:2]
+        if old is None or old.rect[2:] != rect[2:]:
+            item["size"] = rect[2:]
+        changed.append(item)
+    removed = [id for id in baseline if id not in states]
+    return {
+        "baseline_tick": baseline_tick,
+        "input_seq": None,
+        "changed": changed,
+        "removed": removed,
+    }
+
+
+def parse_snapshot_delta(body: Any) -> SnapshotDelta:
+    """Body parser of `SERVER_DELTA_V2` JSON messages."""
+    if isinstance(body, SnapshotDelta):
+        return body
+    changed = []
+    for item in body["changed"]:
+        position, size = item.get("position"), item.get("size")
+        if position is not None:
+            position = tuple(position)
+            if len(position) != 2:
+                raise ValueError(f"Bad position {position}")
+        if size is not None:
+            size = tuple(size)
+            if len(size) != 2:
+                raise ValueError(f"Bad size {size}")
+        changed.append(EntityDelta(item["id"], item.get("class_name"), position, size))
+    input_seq = body.get("input_seq")
+    return SnapshotDelta(
+        int(body["baseline_tick"]),
+        changed,
+        list(body["removed"]),
+        int(input_seq) if input_seq else None,
+    )
+
+
+register_body("SERVER_DELTA_V2", parse_snapshot_delta)
+
+
+def _apply_entity(old: EntityState | None, delta: EntityDelta) -> EntityState:
+    """
+    Entities out of deltas have no `last_input_seq`, the one of the
+    baseline would be stale by now.
+    """
+    if old is None:
+        if None in (delta.class_name, delta.position, delta.size):
+            raise ValueError(f"New entity '{delta.id}' is missing fields")
+        return EntityState(
+            delta.id, delta.class_name, delta.position + delta.size, None
+        )
+    rect = old.rect
+    if delta.position is not None or delta.size is not None:
+        rect = (delta.position or rect[:2]) + (delta.size or rect[2:])
+    return EntityState(delta.id, delta.class_name or old.class_name, rect, None)
+
+
+class DeltaEncoder:
+    """Picks the baseline of the next snapshot sent to one client."""
+
+    def __init__(
+        self,
+        keyframe_every: int = KEYFRAME_EVERY_N_SNAPSHOTS,
+        max_baselines: int = DELTA_BASELINES,
+    ):
+        self.keyframe_every = keyframe_every
+        self.max_baselines = max_baselines
+        self.sent: OrderedDict[int, States] = OrderedDict()
+        self.acked_tick: int | None = None
+        self.since_keyframe = 0
+        self.keyframes = 0
+        self.deltas = 0
+
+    def acknowledge(self, tick: int):
+        """Acks of snapshots we no longer have or that are older are ignored."""
+        if tick in self.sent and (self.acked_tick is None or tick > self.acked_tick):
+            self.acked_tick = tick
+
+    def baseline(self) -> int | None:
+        """Tick the next snapshot should be relative to, None for a keyframe."""
+        if self.acked_tick not in self.sent:
+            return None
+        if self.since_keyframe + 1 >= self.keyframe_every:
+            return None
+        return self.acked_tick
+
+    def baseline_states(self, tick: int) -> States:
+        return self.sent[tick]
+
+    def record(self, tick: int, states: States, baseline_tick: int | None):
+        """Remember a snapshot that was sent, `baseline_tick` as picked."""
+        if baseline_tick is None:
+            self.keyframes += 1
+            self.since_keyframe = 0
+        else:
+            self.deltas += 1
+            self.since_keyframe += 1
+        self.sent[tick] = states
+        self.sent.move_to_end(tick)
+        while len(self.sent) > self.max_baselines:
+            self.sent.popitem(last=False)
+
+
+class DeltaDecoder:
+    """
+    Rebuilds full snapshots from keyframes and deltas on the client and
+    works out what changed since the last applied one.
+    """
+
+    def __init__(self, max_baselines: int = DELTA_BASELINES):
+        self.max_baselines = max_baselines
+        self.received: OrderedDict[int, States] = OrderedDict()
+        self.latest_tick: int | None = None
+        self.latest: States = {}
+        # Deltas that were late or whose baseline was already forgotten
+        self.skipped = 0
+
+    def keyframe(self, tick: int, body: Iterable[Dict[str, Any] | EntityState]):
+        """Returns None if the snapshot is older than the latest one."""
+        if self._is_stale(tick):
+            return None
+        return self._applied(tick, to_states(body))
+
+    def delta(self, tick: int, delta: SnapshotDelta) -> SnapshotChanges | None:
+        """
+        Returns None if the snapshot is older than the latest one or the
+        baseline is unknown, the server sends a keyframe sooner or later.
+        Raises a `ValueError` for new entities that are missing fields.
+        """
+        baseline = self.received.get(delta.baseline_tick)
+        if baseline is None or self._is_stale(tick):
+            self.skipped += 1
+            return None
+        states = dict(baseline)
+        for id in delta.removed:
+            states.pop(id, None)
+        for entity in delta.changed:
+            states[entity.id] = _apply_entity(states.get(entity.id), entity)
+        return self._applied(tick, states)
+
+    def _is_stale(self, tick: int) -> bool:
+        return self.latest_tick is not None and tick <= self.latest_tick
+
+    def _applied(self, tick: int, states: States) -> SnapshotChanges:
+        latest = self.latest
+        # Compared to the latest snapshot and not the baseline, the
+        # sprites show the latest one
+        changed = [
+            state
+            for id, state in states.items()
+            if not _unchanged(latest.get(id), state)
+        ]
+        removed = [id for id in latest if id not in states]
+        self.received[tick] = states
+        while len(self.received) > self.max_baselines:
+            self.received.popitem(last=False)
+        self.latest_tick = tick
+        self.latest = states
+        return SnapshotChanges(states, changed, removed)
@@ -0,0 +1,133 @@
+"""
+Struct of arrays entity store for the server side simulation.
+
+Every `Player` is a `pg.sprite.Sprite` with its own `pg.Rect`, so moving
+and clamping them is a Python function call per sprite per tick.  On the
+server the store keeps positions, sizes, velocities and directions in
+contiguous NumPy arrays instead, so a whole tick of movement, clamping
+and bouncing is a handful of array operations no matter how many
+entities there are.
+
+Rows are kept packed: removing an entity moves the last row into its
+place, so the first `count` rows are always the live entities.  Sprites
+read and write their rect through the store (see `Player.rect`) so they
+can still be drawn and sent over the network like before.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pygame as pg
+
+
+class EntityStore:
+    def __init__(self, capacity: int = 64):
+        self.count = 0
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+        self.sizes = np.zeros((capacity, 2), dtype=np.float64)
+        self.velocities = np.zeros((capacity, 2), dtype=np.float64)
+        self.directions = np.ones((capacity, 2), dtype=np.float64)
+        self.bounces = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.positions)
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name in ("positions", "sizes", "velocities", "directions", "bounces"):
+            old = getattr(self, name)
+            new = (
+                np.ones((new_capacity, *old.shape[1:]), dtype=old.dtype)
+                if name == "directions"
+                else np.zeros((new_capacity, *old.shape[1:]), dtype=old.dtype)
+            )
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def add(
+        self,
+        id: str,
+        rect: pg.Rect,
+        velocity: Tuple[float, float] = (0.0, 0.0),
+        bounce: bool = False,
+    ):
+        """
+        Add an entity.  Entities with `bounce` set flip direction on any
+        axis where they hit the bounds, the rest are only clamped.
+        """
+        if id in self.index:
+            raise ValueError(f"Entity '{id}' is already in the store")
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.positions[i] = rect.topleft
+        self.sizes[i] = rect.size
+        self.velocities[i] = velocity
+        self.directions[i] = 1.0
+        self.bounces[i] = bounce
+        self.ids.append(id)
+        self.index[id] = i
+        self.count += 1
+
+    def remove(self, id: str):
+        i = self.index.pop(id)
+        last = self.count - 1
+        if i != last:
+            for array in (
+                self.positions,
+                self.sizes,
+                self.velocities,
+                self.directions,
+                self.bounces,
+            ):
+                array[i] = array[last]
+            moved_id = self.ids[last]
+            self.ids[i] = moved_id
+            self.index[moved_id] = i
+        self.ids.pop()
+        self.count -= 1
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.index
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_rect(self, id: str) -> pg.Rect:
+        i = self.index[id]
+        x, y = self.positions[i]
+        w, h = self.sizes[i]
+        return pg.Rect(int(x), int(y), int(w), int(h))
+
+    def set_rect(self, id: str, rect: pg.Rect):
+        i = self.index[id]
+        self.positions[i] = rect[0], rect[1]
+        self.sizes[i] = rect[2], rect[3]
+
+    def integrate(self, dt: float, bounds: pg.Rect):
+        """
+        Move every entity by its velocity, clamp it inside `bounds` and
+        flip the direction of bouncing entities that hit the edge.
+        """
+        n = self.count
+        if n == 0:
+            return
+        positions = self.positions[:n]
+        positions += self.velocities[:n] * self.directions[:n] * dt
+
+        lower = np.array(bounds.topleft, dtype=np.float64)
+        upper = np.array(bounds.bottomright, dtype=np.float64) - self.sizes[:n]
+        clamped = np.clip(positions, lower, np.maximum(upper, lower))
+
+        hit = (clamped != positions) & self.bounces[:n, None]
+        directions = self.directions[:n]
+        directions[hit] *= -1
+        positions[:] = clamped
+
+    def rects(self) -> np.ndarray:
+        """All live rects as an (count, 4) int array of x, y, w, h."""
+        n = self.count
+        return np.hstack((self.positions[:n], self.sizes[:n])).astype(np.int32)
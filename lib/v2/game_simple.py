@@ -1,40 +1,89 @@
 # import basic pygame modules
-import asyncio
+from dataclasses import replace
+import math
 import os
-from typing import Any, Dict, List, Set
-from pydantic import BaseModel, ConfigDict
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from pydantic import BaseModel, ConfigDict, Field
 import pygame as pg
-from pygame import examples as main_dir
-from importlib.resources import as_file, files
 import uuid
 
+from lib.assets import ASSETS
+from lib.text_cache import render_text
 from lib.v1.common import WS_Message
-
-# see if we can load more than standard BMP
-if not pg.image.get_extended():
-    raise SystemExit("Sorry, extended image module required")
+from lib.v2.config import (
+    AOI_HYSTERESIS,
+    HISTORY_TICKS,
+    INTERPOLATION_DELAY_MS,
+    MAX_EXTRAPOLATION_MS,
+    SNAPSHOT_EVERY_N_TICKS,
+)
+from lib.v2.delta import DeltaDecoder
+from lib.v2.entity_store import EntityStore
+from lib.v2.interest import InterestManager
+from lib.v2.interpolation import SnapshotInterpolator
+from lib.v2.lag_compensation import EntityHistory
+from lib.v2.message_queue import MessageQueue
+from lib.v2.messages import EntityState
+from lib.v2.prediction import (
+    MAX_INPUT_BUDGET,
+    InputCommand,
+    InputPredictor,
+    apply_input,
+    get_axes,
+    get_pressed_buttons,
+)
+from lib.v2.tick_profiler import TickProfiler
 
 # game constants
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 
+# Layers of the sprite groups with dirty rect rendering, in the same
+# order `_render_game()` draws them without it
+LOCAL_LAYER = 0
+NETWORK_LAYER = 1
+OTHER_LAYER = 2
+
+# Phases of `Game.update()` in the order they run, see `TickProfiler`
+UPDATE_PHASES = (
+    "events",
+    "integrate",
+    "predict",
+    "sprites",
+    "send",
+    "receive",
+    "interest",
+    "interpolate",
+    "render",
+    "frame_end",
+)
+
 
 def get_file(file):
-    examples_dir_files = files(main_dir)
-    with as_file(examples_dir_files) as examples_dir:
-        data_dir_filepath = examples_dir.joinpath("data")
-        file = data_dir_filepath.joinpath(file)
-    return file
+    return ASSETS.path(file)
+
 
+def get_display_surface() -> pg.Surface:
+    """The window's surface, the window is opened the first time."""
+    return pg.display.get_surface() or pg.display.set_mode(
+        (SCREEN_WIDTH, SCREEN_HEIGHT)
+    )
 
-def load_image(file):
-    """loads an image, prepares it for play"""
-    file = get_file(file)
+
+def load_image(file, convert: bool = True, flip_x: bool = False):
+    """
+    loads an image, prepares it for play.  Headless games only need the
+    size of the image, so they skip `convert()` since it needs a display.
+    Images come from `ASSETS`, so only the first call decodes the file.
+    """
+    if convert:
+        # `convert()` needs the display to know the pixel format
+        get_display_surface()
     try:
-        surface = pg.image.load(file)
-    except pg.error:
-        raise SystemExit(f'Could not load image "{file}" {pg.get_error()}')
-    return surface.convert()
+        return ASSETS.image(file, convert=convert, flip_x=flip_x)
+    except (FileNotFoundError, pg.error) as e:
+        raise SystemExit(f'Could not load image "{file}" {e}')
 
 
 def get_rand_player_id():
@@ -49,8 +98,9 @@ def get_cur_player_id():
 
 class BaseNetworkClient(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    out_queue: asyncio.Queue = asyncio.Queue()
-    in_queue: asyncio.Queue = asyncio.Queue()
+    # Bounded, see `MessageQueue` for what gets dropped when full
+    out_queue: MessageQueue = Field(default_factory=MessageQueue)
+    in_queue: MessageQueue = Field(default_factory=MessageQueue)
 
     def has_message_out(self):
         return not self.out_queue.empty()
@@ -80,37 +130,172 @@ class Game(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
     # Defaults set:
-    network_client: BaseNetworkClient | NetworkClient = BaseNetworkClient()
+    network_client: BaseNetworkClient | NetworkClient = Field(
+        default_factory=BaseNetworkClient
+    )
     is_server_mode: bool = False
-    screen: pg.Surface = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    # None for headless games, see `create_game()` and `attach_debug_view()`
+    screen: pg.Surface | None = Field(default_factory=get_display_surface)
+    # The world, sprites are kept inside of it
+    bounds: pg.Rect = Field(
+        default_factory=lambda: pg.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+    )
+    # Only draw every this many frames, for debug views of headless games
+    render_every_n_frames: int = 1
+    # Set by `enable_dirty_rendering()`, every sprite that gets drawn
+    render_sprites: pg.sprite.LayeredDirty | None = None
+    background: pg.Surface | None = None
+    # Parts of the screen drawn this frame with dirty rect rendering
+    dirty_rects: List[pg.Rect] = Field(default_factory=list)
     running: bool = True
-    clock: pg.time.Clock = pg.time.Clock()
+    clock: pg.time.Clock = Field(default_factory=pg.time.Clock)
     __cur_player_id: str | None = None
-    local_game_sprites: pg.sprite.Group = pg.sprite.Group()
-    network_game_sprites: pg.sprite.Group = pg.sprite.Group()
-    network_sprite_lookup: Dict[str, pg.sprite.Sprite] = dict()
-    other_game_sprites: pg.sprite.Group = pg.sprite.Group()
+    cur_player: pg.sprite.Sprite | None = None
+    local_game_sprites: pg.sprite.Group = Field(default_factory=pg.sprite.Group)
+    network_game_sprites: pg.sprite.Group = Field(default_factory=pg.sprite.Group)
+    network_sprite_lookup: Dict[str, pg.sprite.Sprite] = Field(default_factory=dict)
+    other_game_sprites: pg.sprite.Group = Field(default_factory=pg.sprite.Group)
+    # Only set on the server when area of interest filtering is enabled
+    interest: InterestManager | None = None
+    # Only set on the server, see `EntityStore`
+    entity_store: EntityStore | None = None
+    # Only set on the server unless turned off, see `EntityHistory`
+    history: EntityHistory | None = None
+    # Only set on the client unless turned off, see `lib/v2/delta.py`
+    delta_decoder: DeltaDecoder | None = None
+    # Only set on the client when interpolation isn't turned off
+    interpolator: SnapshotInterpolator | None = None
+    send_every_n_frames: int = SNAPSHOT_EVERY_N_TICKS
+    # Only set on the client when prediction is turned on
+    predictor: InputPredictor | None = None
+    # Server side, last input sequence number applied per player
+    last_processed_input: Dict[str, int] = Field(default_factory=dict)
+    # Server side, seconds of input each player can still apply and the
+    # `sim_time` that was as of, see `_input_time()`
+    input_budgets: Dict[str, Tuple[float, float]] = Field(default_factory=dict)
+    # Sum of every `dt` so far
+    sim_time: float = 0.0
+    # Set on the server, or on the client with `TICK_PROFILE=true`
+    profiler: TickProfiler | None = None
     dt: float = 0.0
     cur_fps: float = 0.0
     frame_count: int = 0
 
     def update(self):
+        if self.profiler:
+            self.profiler.begin_tick(self.frame_count)
+        self.sim_time += self.dt
         # poll for events
         # pygame.QUIT event means the user clicked X to close your window
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                self.running = False
+        rendering = self.renders_this_frame()
+        if self.owns_display():
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    self.running = False
+                elif event.type == pg.KEYDOWN and event.key == pg.K_F9:
+                    self._dump_profile()
+        self._mark("events")
+        if self.entity_store is not None:
+            self.entity_store.integrate(self.dt, self.bounds)
+        self._mark("integrate")
+        if self.predictor:
+            self._predict_local_input()
+        self._mark("predict")
         self.local_game_sprites.update()
-        self.other_game_sprites.update()
+        if rendering:
+            # Only the `Fps` counter, nothing to update if it isn't drawn
+            self.other_game_sprites.update()
+        self._mark("sprites")
 
+        if self.history is not None:
+            self._record_history()
         self._send_out_data()
+        self._mark("send")
         self._receive_data()
-
-        self._render_game()
+        self._mark("receive")
+        if self.interest:
+            self._update_interest()
+        self._mark("interest")
+        if self.interpolator:
+            self._interpolate_network_sprites()
+        self._mark("interpolate")
+
+        if rendering:
+            self._render_game()
+        self._mark("render")
         self._handle_frame_end()
+        self._mark("frame_end")
+        if self.profiler:
+            self.profiler.end_tick()
         return
 
+    def owns_display(self) -> bool:
+        """
+        Only the game drawn in the window handles its events and flips
+        it, other games would steal the events.
+        """
+        return self.screen is not None and self.screen is pg.display.get_surface()
+
+    def renders_this_frame(self) -> bool:
+        return (
+            self.screen is not None
+            and self.frame_count % self.render_every_n_frames == 0
+        )
+
+    def attach_debug_view(self, every_n_frames: int = 1):
+        """
+        Opens a window for a headless game that is drawn every
+        `every_n_frames` frames, the simulation doesn't change.
+        """
+        pg.init()
+        self.screen = get_display_surface()
+        self.render_every_n_frames = every_n_frames
+        pg.display.set_caption("SERVER" if self.is_server_mode else "CLIENT")
+        if not self.other_game_sprites:
+            self._add_fps()
+
+    def _mark(self, phase: str):
+        if self.profiler:
+            self.profiler.mark(phase)
+
+    def _dump_profile(self):
+        """Press F9 to save the recent ticks, see `TickProfiler`."""
+        if not self.profiler:
+            return
+        path = f"tick_trace_{int(time.time())}.json"
+        self.profiler.dump_chrome_trace(path)
+        print(f"Saved tick trace to {path}")
+
+    def enable_dirty_rendering(self):
+        """
+        Only redraw and update the parts of the screen that changed
+        instead of the whole window every frame.  Sprites are marked
+        dirty when their rect or image changes, `LayeredDirty` redraws
+        them and whatever overlaps them over a cached background.  When
+        that gets slower than drawing everything, like when most sprites
+        move, it switches to full redraws by itself.
+        """
+        self.background = pg.Surface(self.screen.get_size()).convert()
+        self.background.fill("purple")
+        self.render_sprites = pg.sprite.LayeredDirty(_use_update=True)
+        for group, layer in (
+            (self.local_game_sprites, LOCAL_LAYER),
+            (self.network_game_sprites, NETWORK_LAYER),
+            (self.other_game_sprites, OTHER_LAYER),
+        ):
+            for sprite in group:
+                self._track_sprite(sprite, layer)
+        # The first frame draws the whole window
+        self.render_sprites.repaint_rect(self.screen.get_rect())
+
+    def _track_sprite(self, sprite: pg.sprite.Sprite, layer: int):
+        if self.render_sprites is not None:
+            self.render_sprites.add(sprite, layer=layer)
+
     def _render_game(self):
+        if self.render_sprites is not None:
+            self.dirty_rects = self.render_sprites.draw(self.screen, self.background)
+            return
         # fill the screen with a color to wipe away anything from last frame
         self.screen.fill("purple")
         # RENDER YOUR GAME HERE
@@ -121,7 +306,11 @@ class Game(BaseModel):
 
     def _handle_frame_end(self):
         # flip() the display to put your work on screen
-        pg.display.flip()
+        if self.owns_display() and self.renders_this_frame():
+            if self.render_sprites is not None:
+                pg.display.update(self.dirty_rects)
+            else:
+                pg.display.flip()
         self.frame_count += 1
         # limits FPS to 60
         self.cur_fps = round(self.clock.get_fps(), 1)
@@ -130,13 +319,19 @@ class Game(BaseModel):
             # Not running on server, stall to 60 fps
             self.dt = self.clock.tick(60) / 1000
         else:
-            # Running on server, maybe stall differently? Manage tick rate on server
-            self.dt = self.clock.tick(60) / 1000
+            # Running on server, the tick rate and `dt` are managed by
+            # `TickScheduler`, so only measure the frame time here
+            # without stalling the event loop.
+            self.clock.tick()
 
         return
 
     def _send_out_data(self):
-        if self.frame_count % 5 == 0:
+        if self.predictor:
+            # The server is authoritative for our position, it only
+            # gets our inputs in `_predict_local_input()`
+            return
+        if self.frame_count % self.send_every_n_frames == 0:
             body = self.get_local_sprites_dict()
             if self.is_server_mode:
                 body.extend(self.get_network_sprites_dict())
@@ -147,17 +342,18 @@ class Game(BaseModel):
                 player_session_uuid=self.get_cur_player_id(),
                 message_type=message_type,
                 body=body,
+                tick=self.frame_count,
             )
 
             if self.is_server_mode:
                 if len(self.network_sprite_lookup) > 0:
-                    # Only send out messages if a user connected to
-                    # avoid collecting too much memory on server and
-                    # crashing!
+                    # Only send out messages if a user connected.  The
+                    # out queue is bounded and keeps just the latest
+                    # snapshot, so a slow broadcaster can't use up
+                    # memory either.
                     self.network_client.enque_message_out(ws_message)
                 else:
-                    # Clear out queue if no one connected to avoid
-                    # crashing server by using up all memory!
+                    # Don't leave a stale snapshot for the next user
                     while self.network_client.has_message_out():
                         self.network_client.out_queue.get_nowait()
             else:
@@ -167,81 +363,291 @@ class Game(BaseModel):
     def _receive_data(self):
         while self.network_client.has_message_in():
             ws_msg = self.network_client.get_message_in()
+            if ws_msg.message_type in ("SERVER_POSITION_V2", "SERVER_DELTA_V2"):
+                if self.delta_decoder and ws_msg.tick is not None:
+                    self._apply_server_snapshot(ws_msg)
+                    continue
             if ws_msg.message_type in ("SERVER_POSITION_V2", "CLIENT_POSITION_V2"):
-                self.get_network_sprites(ws_msg.body)
+                self.get_network_sprites(ws_msg.body, ws_msg.tick)
+                continue
+            if ws_msg.message_type == "CLIENT_INPUT_V2":
+                self._apply_network_input(ws_msg.player_session_uuid, ws_msg.body)
+                continue
+            if ws_msg.message_type == "CLIENT_CONNECTED_TO_SERVER_V2":
+                # Clients only send inputs once something is pressed,
+                # players still show up before that
+                self._spawn_network_player(ws_msg.player_session_uuid)
                 continue
             if ws_msg.message_type == "CLIENT_DISCONNECTED_FROM_SERVER_V2":
                 self._remove_network_player(ws_msg.player_session_uuid)
         return
 
+    def _apply_server_snapshot(self, ws_msg: WS_Message):
+        """
+        Full snapshots and deltas go through `delta_decoder`, so only
+        the sprites that changed since the last snapshot get touched.
+        Every applied snapshot is acknowledged so the server can send
+        deltas against it.  Deltas have our last acknowledged input in
+        the message instead of with our player, it is reconciled even if
+        we didn't move.
+        """
+        decoder = self.delta_decoder
+        try:
+            if ws_msg.message_type == "SERVER_DELTA_V2":
+                changes = decoder.delta(ws_msg.tick, ws_msg.body)
+                input_seq = ws_msg.body.input_seq
+            else:
+                changes = decoder.keyframe(ws_msg.tick, ws_msg.body)
+                input_seq = None
+        except (KeyError, TypeError, ValueError):
+            return
+        if changes is None:
+            # Late, or its baseline is gone.  The server sends a full
+            # snapshot once the ack we sent for it ages out.
+            return
+        self.get_network_sprites(changes.changed, ws_msg.tick, changes.removed)
+        own = changes.states.get(self.get_cur_player_id())
+        if own is not None:
+            input_seq = input_seq or own.last_input_seq
+            if self.predictor and input_seq:
+                self._reconcile_cur_player(input_seq, pg.Rect(own.rect))
+        self.network_client.enque_message_out(
+            WS_Message(
+                player_session_uuid=self.get_cur_player_id(),
+                message_type="CLIENT_ACK_V2",
+                body="",
+                tick=ws_msg.tick,
+            )
+        )
+
+    def _predict_local_input(self):
+        self._send_input(get_pressed_buttons(), *get_axes())
+
+    def _send_input(self, buttons: int, axis_x: float = 0.0, axis_y: float = 0.0):
+        """
+        Send this frame's input to the server and apply it to our own
+        player right away instead of waiting for the server.  Frames
+        without any input don't move anyone, so nothing is sent for them.
+        """
+        if not buttons and not axis_x and not axis_y:
+            return
+        command = self.predictor.record(buttons, self.dt, axis_x, axis_y)
+        player = self.cur_player
+        player.rect = apply_input(player.rect, command, player.speed, self.bounds)
+        self.network_client.enque_message_out(
+            WS_Message(
+                player_session_uuid=self.get_cur_player_id(),
+                message_type="CLIENT_INPUT_V2",
+                body=command.to_body(),
+                tick=self.frame_count,
+            )
+        )
+
+    def _apply_network_input(self, id: str, body: Any):
+        # Already an `InputCommand` when it came through `lib/v2/messages.py`
+        if isinstance(body, InputCommand):
+            command = body
+        else:
+            try:
+                command = InputCommand.from_body(body)
+            except (KeyError, TypeError, ValueError):
+                return
+        if command.seq <= self.last_processed_input.get(id, 0):
+            # Resent or replayed, it already moved the player
+            return
+        sprite = self._spawn_network_player(id)
+        dt = self._input_time(id, command.dt)
+        if dt != command.dt:
+            command = replace(command, dt=dt)
+        sprite.rect = apply_input(sprite.rect, command, sprite.speed, self.bounds)
+        self.last_processed_input[id] = command.seq
+
+    def _input_time(self, id: str, dt: float) -> float:
+        """
+        How much of `dt` a player's input may move them.  Inputs can't
+        add up to more time than passed on the server since the last
+        one, plus what was left over then (up to `MAX_INPUT_BUDGET`),
+        so sending more inputs doesn't make anyone faster.  NaN, inf and
+        negative times don't move anyone and leave the budget alone, they
+        would break the `min()` below for good.
+        """
+        if not math.isfinite(dt) or dt < 0:
+            return 0.0
+        budget, since = self.input_budgets.get(id, (MAX_INPUT_BUDGET, self.sim_time))
+        budget = min(budget + self.sim_time - since, MAX_INPUT_BUDGET)
+        dt = min(dt, budget)
+        self.input_budgets[id] = (budget - dt, self.sim_time)
+        return dt
+
+    def _reconcile_cur_player(self, acked_seq: int, server_rect: pg.Rect):
+        player = self.cur_player
+        rect = self.predictor.reconcile(
+            acked_seq, server_rect, player.rect, player.speed, self.bounds
+        )
+        if rect is not None:
+            player.rect = rect
+
+    def _interpolate_network_sprites(self):
+        now = time.monotonic()
+        for id, sprite in self.network_sprite_lookup.items():
+            rect = self.interpolator.sample(id, now)
+            if rect:
+                sprite.rect = rect
+
+    def _record_history(self):
+        """The world as the snapshot sent this tick shows it."""
+        store = self.entity_store
+        n = store.count
+        self.history.record(
+            time.monotonic(),
+            self.frame_count,
+            store.ids,
+            store.positions[:n],
+            store.sizes[:n],
+        )
+
+    def _update_interest(self):
+        # Cheap for sprites that didn't change grid cells
+        if self.entity_store is not None:
+            store = self.entity_store
+            centers = store.positions[: store.count] + store.sizes[: store.count] / 2
+            for id, center in zip(store.ids, centers.tolist()):
+                self.interest.update_entity(id, center)
+            return
+        for group in (self.local_game_sprites, self.network_game_sprites):
+            for sprite in group:
+                self.interest.update_entity(sprite.id, sprite.rect.center)
+
     def _add_cur_player(self, id):
         if not self.__cur_player_id:
             self.__cur_player_id = id
-            Player(self, id, self.local_game_sprites)
+            self.cur_player = Player(self, id, self.local_game_sprites)
+            self._track_sprite(self.cur_player, LOCAL_LAYER)
 
     def _add_other_local_player(self):
         id = get_rand_player_id()
-        Player(self, id, self.local_game_sprites)
+        self._track_sprite(Player(self, id, self.local_game_sprites), LOCAL_LAYER)
 
     def _add_network_player(self, id: str, rect: pg.Rect | None = None):
         p = Player(self, id, self.network_game_sprites)
+        self._track_sprite(p, NETWORK_LAYER)
         if rect:
             p.rect = rect
         return p
 
+    def _spawn_network_player(self, id: str):
+        """The sprite of player `id`, added if it isn't there yet."""
+        sprite = self.network_sprite_lookup.get(id)
+        if sprite is None:
+            sprite = self._add_network_player(id)
+            self.network_sprite_lookup[id] = sprite
+        return sprite
+
     def _remove_network_player(self, id):
-        sprite = self.network_sprite_lookup.pop(id)
+        sprite = self.network_sprite_lookup.pop(id, None)
+        if sprite is None:
+            # Disconnected before sending anything
+            return
         sprite.kill()
+        if self.entity_store is not None:
+            self.entity_store.remove(id)
+        if self.history is not None:
+            self.history.remove(id)
+        if self.interpolator:
+            self.interpolator.remove(id)
+        self.last_processed_input.pop(id, None)
+        self.input_budgets.pop(id, None)
+        if self.interest:
+            self.interest.remove_entity(id)
         return
 
     def get_cur_player_id(self):
         return self.__cur_player_id
 
     def _add_fps(self):
-        Fps(self, self.other_game_sprites)
+        self._track_sprite(Fps(self, self.other_game_sprites), OTHER_LAYER)
 
-    def get_local_sprites_dict(self):
-        return [
-            {
+    def _get_sprites_dict(self, group: pg.sprite.Group):
+        body = []
+        for sprite in group:
+            item = {
                 "id": sprite.id,
                 "class_name": sprite.__class__.__name__,
                 "rect": tuple(sprite.rect),
             }
-            for sprite in self.local_game_sprites
-        ]
+            # Acknowledges inputs for client side prediction
+            last_input_seq = self.last_processed_input.get(sprite.id)
+            if last_input_seq:
+                item["last_input_seq"] = last_input_seq
+            body.append(item)
+        return body
+
+    def get_local_sprites_dict(self):
+        return self._get_sprites_dict(self.local_game_sprites)
 
     def get_network_sprites_dict(self):
-        return [
-            {
-                "id": sprite.id,
-                "class_name": sprite.__class__.__name__,
-                "rect": tuple(sprite.rect),
+        return self._get_sprites_dict(self.network_game_sprites)
+
+    def get_network_sprites(
+        self,
+        network_dict: List[Dict[str, Any] | EntityState],
+        tick: int | None = None,
+        removed: Iterable[str] | None = None,
+    ):
+        """
+        Apply a snapshot.  With `removed`, `network_dict` only has the
+        entities that changed since the last snapshot (see
+        `DeltaDecoder`) and the sprites of the others are left alone.
+        """
+        if removed is None:
+            # This gets rid of lingering player data on the server that gets
+            # sent over to clients when a new client joins after an old
+            # client has left
+            disconnected_client_ids = set(self.network_sprite_lookup.keys())
+        else:
+            disconnected_client_ids = {
+                id for id in removed if id in self.network_sprite_lookup
             }
-            for sprite in self.network_game_sprites
-        ]
-
-    def get_network_sprites(self, network_dict: List[Dict[str, Any]]):
-
-        # This gets rid of lingering player data on the server that gets
-        # sent over to clients when a new client joins after an old
-        # client has left
-        disconnected_client_ids = set(self.network_sprite_lookup.keys())
+        now = time.monotonic()
 
         for item in network_dict:
-            id = item.get("id")
+            # Decoded messages have `EntityState` tuples (see
+            # `lib/v2/messages.py`), our own snapshots have dicts.
+            if isinstance(item, dict):
+                id, class_name, rect, last_input_seq = (
+                    item.get("id"),
+                    item.get("class_name"),
+                    item.get("rect"),
+                    item.get("last_input_seq"),
+                )
+            else:
+                id, class_name, rect, last_input_seq = item
             if id in disconnected_client_ids:
                 disconnected_client_ids.remove(id)
-            rect = pg.Rect(item.get("rect"))
+            rect = pg.Rect(rect)
             if id == self.get_cur_player_id():
+                if self.predictor and last_input_seq:
+                    self._reconcile_cur_player(last_input_seq, rect)
                 continue
             elif id in self.network_sprite_lookup:
-                cur_sprite = self.network_sprite_lookup[id]
-                cur_sprite.rect = rect
+                if self.interpolator:
+                    # Drawn from the interpolation buffer every frame
+                    self.interpolator.push(id, rect, now, tick)
+                else:
+                    cur_sprite = self.network_sprite_lookup[id]
+                    cur_sprite.rect = rect
                 continue
 
-            if item.get("class_name") == "Player":
-                player = self._add_network_player(id)
+            if class_name == "Player":
+                player = self._add_network_player(id, rect)
                 self.network_sprite_lookup[id] = player
+                if self.interpolator:
+                    self.interpolator.push(id, rect, now, tick)
+
+        if removed is not None and self.interpolator:
+            # The sprites that didn't change stay where they are instead
+            # of being extrapolated
+            self.interpolator.hold(now, tick)
 
         # Only clean up ids that haven't receievd updates on clients
         # b/c on server this method will be triggered when individual
@@ -253,7 +659,7 @@ class Game(BaseModel):
         return
 
 
-class Player(pg.sprite.Sprite):
+class Player(pg.sprite.DirtySprite):
     """Representing the player as a moon buggy type car."""
 
     speed = 1000
@@ -262,67 +668,166 @@ class Player(pg.sprite.Sprite):
     def __init__(self, game: Game, id: str, *groups):
         self.game = game
         self.id = id
-        pg.sprite.Sprite.__init__(self, *groups)
+        pg.sprite.DirtySprite.__init__(self, *groups)
         self.image = self.images[0]
-        self.rect = self.image.get_rect(midtop=game.screen.get_rect().midtop)
+        rect = self.image.get_rect(midtop=game.bounds.midtop)
+        self.store = game.entity_store
+        if self.store is not None:
+            # Only the server's own player moves by itself, network
+            # players get their positions from the clients.
+            is_cpu_player = id == game.get_cur_player_id()
+            velocity = (self.speed, 0) if is_cpu_player else (0, 0)
+            self.store.add(id, rect, velocity, bounce=is_cpu_player)
+        self.rect = rect
         self.server_last_position = self.rect.center
         self.server_direction = 1
 
+    @property
+    def rect(self) -> pg.Rect:
+        """
+        On the server the rect lives in the game's `EntityStore`, so
+        changes to the returned rect must be assigned back to stick.
+        """
+        if self.store is None:
+            return self._rect
+        return self.store.get_rect(self.id)
+
+    @rect.setter
+    def rect(self, rect: pg.Rect):
+        if self.store is None:
+            if rect != getattr(self, "_rect", None):
+                # Copied so rects shared with others (like in
+                # `SnapshotInterpolator`) can't move us without being
+                # marked dirty
+                self._rect = pg.Rect(rect)
+                self.dirty = 1
+        else:
+            self.store.set_rect(self.id, rect)
+
     def update(self, *args, **kwargs):
+        if self.store is not None:
+            # Moved and clamped along with every other entity in
+            # `EntityStore.integrate()`
+            return
         if self.id == self.game.get_cur_player_id():
-            if not self.game.is_server_mode:
+            if self.game.predictor:
+                # Moved in `Game._predict_local_input()`
+                pass
+            elif not self.game.is_server_mode:
+                # Moved on a copy, see the `rect` setter
+                rect = self.rect.copy()
                 keys = pg.key.get_pressed()
                 if keys[pg.K_w]:
-                    self.rect.centery -= self.speed * self.game.dt
+                    rect.centery -= self.speed * self.game.dt
                 if keys[pg.K_s]:
-                    self.rect.centery += self.speed * self.game.dt
+                    rect.centery += self.speed * self.game.dt
                 if keys[pg.K_a]:
-                    self.rect.centerx -= self.speed * self.game.dt
+                    rect.centerx -= self.speed * self.game.dt
                 if keys[pg.K_d]:
-                    self.rect.centerx += self.speed * self.game.dt
+                    rect.centerx += self.speed * self.game.dt
+                self.rect = rect
             else:
-                self.rect.centerx += self.server_direction * self.speed * self.game.dt
-                if self.server_last_position == self.rect.center:
+                rect = self.rect.copy()
+                rect.centerx += self.server_direction * self.speed * self.game.dt
+                if self.server_last_position == rect.center:
                     self.server_direction *= -1
-                self.server_last_position = self.rect.center
-        self.rect = self.rect.clamp(self.game.screen.get_rect())
+                self.server_last_position = rect.center
+                self.rect = rect
+        self.rect = self.rect.clamp(self.game.bounds)
 
 
-class Fps(pg.sprite.Sprite):
+class Fps(pg.sprite.DirtySprite):
     """to keep track of the Fps."""
 
     def __init__(self, game: Game, *groups):
         self.game = game
-        pg.sprite.Sprite.__init__(self, *groups)
+        pg.sprite.DirtySprite.__init__(self, *groups)
         self.font = pg.font.Font(None, 20)
         self.font.set_italic(1)
         self.color = "white"
         self.last_fps = -1
         self.update()
-        self.rect = self.image.get_rect(topleft=(0, 0))
 
     def update(self, *args, **kwargs):
         """We only update the Fps in update() when it has changed."""
         if self.game.cur_fps != self.last_fps:
             self.last_fps = self.game.cur_fps
             msg = f"FPS: {self.game.cur_fps}"
-            self.image = self.font.render(msg, 0, self.color)
-
-
-def create_game():
-    pg.init()
-
-    is_server_mode = os.environ.get("IS_SERVER_MODE", "false").lower() == "true"
-
-    game = Game(is_server_mode=is_server_mode)
-    display_caption = "SERVER" if is_server_mode else "CLIENT"
-    pg.display.set_caption(display_caption)
-
-    # Add some sort of environment variable guard eventually maybe:
-    game._add_fps()
+            self.image = render_text(self.font, msg, False, self.color)
+            # The text gets wider and narrower
+            self.rect = self.image.get_rect(topleft=(0, 0))
+            self.dirty = 1
+
+
+def create_game(is_server_mode: bool | None = None, headless: bool = False):
+    """
+    `is_server_mode` defaults to the `IS_SERVER_MODE` environment
+    variable.
+
+    Headless games never touch SDL: no window, no events, no drawing and
+    no fonts, sprites are only rects.  `Game.attach_debug_view()` can
+    still show one later.
+    """
+    if is_server_mode is None:
+        is_server_mode = os.environ.get("IS_SERVER_MODE", "false").lower() == "true"
+
+    if headless:
+        game = Game(is_server_mode=is_server_mode, screen=None)
+    else:
+        pg.init()
+        game = Game(is_server_mode=is_server_mode)
+    if is_server_mode:
+        game.entity_store = EntityStore()
+        history_ticks = int(os.environ.get("HISTORY_TICKS", HISTORY_TICKS))
+        if history_ticks:
+            game.history = EntityHistory(capacity=history_ticks)
+        game.send_every_n_frames = int(
+            os.environ.get("SNAPSHOT_EVERY_N_TICKS", SNAPSHOT_EVERY_N_TICKS)
+        )
+    else:
+        # Clients send their inputs instead of their positions unless
+        # this is turned off
+        if os.environ.get("PREDICTION", "true").lower() == "true":
+            game.predictor = InputPredictor()
+        if os.environ.get("DELTA_COMPRESSION", "true").lower() == "true":
+            game.delta_decoder = DeltaDecoder()
+        if os.environ.get("TICK_PROFILE", "false").lower() == "true":
+            game.profiler = TickProfiler(UPDATE_PHASES, budget=1 / 60)
+        if not headless and os.environ.get("DIRTY_RECTS", "true").lower() == "true":
+            game.enable_dirty_rendering()
+        delay_ms = float(
+            os.environ.get("INTERPOLATION_DELAY_MS", INTERPOLATION_DELAY_MS)
+        )
+        if delay_ms > 0:
+            game.interpolator = SnapshotInterpolator(
+                delay=delay_ms / 1000,
+                max_extrapolation=float(
+                    os.environ.get("MAX_EXTRAPOLATION_MS", MAX_EXTRAPOLATION_MS)
+                )
+                / 1000,
+            )
 
-    img = load_image("player1.gif")
-    Player.images = [img, pg.transform.flip(img, 1, 0)]
+    aoi_radius = os.environ.get("AOI_RADIUS")
+    if is_server_mode and aoi_radius:
+        game.interest = InterestManager(
+            radius=float(aoi_radius),
+            cell_size=float(os.environ.get("AOI_CELL_SIZE", aoi_radius)),
+            hysteresis=float(os.environ.get("AOI_HYSTERESIS", AOI_HYSTERESIS)),
+        )
+    if not headless:
+        display_caption = "SERVER" if is_server_mode else "CLIENT"
+        pg.display.set_caption(display_caption)
+
+        # Add some sort of environment variable guard eventually maybe:
+        game._add_fps()
+
+    # see if we can load more than standard BMP
+    if not pg.image.get_extended():
+        raise SystemExit("Sorry, extended image module required")
+    Player.images = [
+        load_image("player1.gif", convert=not headless),
+        load_image("player1.gif", convert=not headless, flip_x=True),
+    ]
 
     cur_player_id = get_cur_player_id()
 
@@ -0,0 +1,142 @@
+"""
+Area of interest filtering for server snapshots.
+
+Sending every sprite to every client is O(N^2) bandwidth as rooms grow,
+even though a client only cares about what is close to its own player.
+`SpatialGrid` buckets entities into uniform cells so the entities near a
+point can be found without looking at all of them, and
+`InterestManager` uses it to work out which entities each client should
+get in its snapshot.
+
+To keep entities from flickering in and out when they sit right on the
+edge of the radius, an entity that is already visible to a client stays
+visible until it moves past `radius * hysteresis`.
+"""
+
+from collections import defaultdict
+import math
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("`cell_size` must be positive!")
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, Set[str]] = defaultdict(set)
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self.entity_cells: Dict[str, Cell] = {}
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def update(self, id: str, x: float, y: float):
+        """
+        Move an entity, only touching the cell sets when the entity
+        actually changed cells.
+        """
+        self.positions[id] = (x, y)
+        cell = self._cell(x, y)
+        old_cell = self.entity_cells.get(id)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(id, old_cell)
+        self.cells[cell].add(id)
+        self.entity_cells[id] = cell
+
+    def remove(self, id: str):
+        self.positions.pop(id, None)
+        cell = self.entity_cells.pop(id, None)
+        if cell is not None:
+            self._discard(id, cell)
+
+    def _discard(self, id: str, cell: Cell):
+        ids = self.cells[cell]
+        ids.discard(id)
+        if not ids:
+            del self.cells[cell]
+
+    def query(self, x: float, y: float, radius: float) -> Iterator[str]:
+        """Yield the ids of all entities within `radius` of (x, y)."""
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        radius_sq = radius * radius
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                ids = self.cells.get((cx, cy))
+                if not ids:
+                    continue
+                for id in ids:
+                    ex, ey = self.positions[id]
+                    if (ex - x) ** 2 + (ey - y) ** 2 <= radius_sq:
+                        yield id
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class InterestManager:
+    def __init__(
+        self,
+        radius: float,
+        cell_size: float | None = None,
+        hysteresis: float = 1.25,
+    ):
+        if hysteresis < 1:
+            raise ValueError("`hysteresis` can't be less than 1!")
+        self.radius = radius
+        self.exit_radius = radius * hysteresis
+        self.grid = SpatialGrid(cell_size or radius)
+        self.visible: Dict[str, Set[str]] = {}
+
+    def update_entity(self, id: str, center: Tuple[float, float]):
+        self.grid.update(id, *center)
+
+    def remove_entity(self, id: str):
+        self.grid.remove(id)
+        self.visible.pop(id, None)
+        for visible_ids in self.visible.values():
+            visible_ids.discard(id)
+
+    def _within(self, id: str, x: float, y: float, radius: float) -> bool:
+        position = self.grid.positions.get(id)
+        if position is None:
+            return False
+        return (position[0] - x) ** 2 + (position[1] - y) ** 2 <= radius * radius
+
+    def visible_for(self, viewer_id: str) -> Set[str] | None:
+        """
+        Work out which entities `viewer_id` should see right now.
+        Returns None when the viewer has no position yet (it just
+        connected), meaning it should get everything.
+        """
+        position = self.grid.positions.get(viewer_id)
+        if position is None:
+            return None
+        x, y = position
+
+        visible_ids = set(self.grid.query(x, y, self.radius))
+        for id in self.visible.get(viewer_id, ()):
+            if id not in visible_ids and self._within(id, x, y, self.exit_radius):
+                visible_ids.add(id)
+        visible_ids.add(viewer_id)
+
+        self.visible[viewer_id] = visible_ids
+        return visible_ids
+
+    def filter_snapshot(self, viewer_id: str, body: List[Any]) -> List[Any]:
+        """
+        Only keep the snapshot items `viewer_id` is interested in.  Items
+        can be dicts (JSON) or `EntityState` tuples (binary).
+        """
+        visible_ids = self.visible_for(viewer_id)
+        if visible_ids is None:
+            return body
+        return [
+            item
+            for item in body
+            if (item["id"] if isinstance(item, dict) else item[0]) in visible_ids
+        ]
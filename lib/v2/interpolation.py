@@ -0,0 +1,118 @@
+"""
+Snapshot interpolation for network sprites on the client.
+
+Snapshots only arrive every few server ticks, so snapping remote sprites
+straight to the latest rect makes them stutter.  Instead every remote
+entity gets a small buffer of timestamped rects, and it is drawn where
+it was `delay` seconds ago, interpolating between the two snapshots on
+either side of that time.  If the next snapshot is late the entity keeps
+moving along its last velocity, but only for up to `max_extrapolation`
+seconds so a lost connection doesn't fling sprites off the screen.
+
+Snapshots are timestamped with the local receive time.  The server tick
+in the message is only used to drop duplicate and out of order
+snapshots.
+"""
+
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Tuple
+
+Rect = Tuple[int, int, int, int]
+
+
+class TimedRect(NamedTuple):
+    time: float
+    tick: int | None
+    rect: Rect
+
+
+def _lerp_rect(a: Rect, b: Rect, t: float) -> Rect:
+    return (
+        round(a[0] + (b[0] - a[0]) * t),
+        round(a[1] + (b[1] - a[1]) * t),
+        b[2],
+        b[3],
+    )
+
+
+class SnapshotBuffer:
+    def __init__(self, max_snapshots: int = 32):
+        self.snapshots: Deque[TimedRect] = deque(maxlen=max_snapshots)
+
+    def push(self, time: float, tick: int | None, rect: Rect) -> bool:
+        """Returns False if the snapshot was stale and got dropped."""
+        if self.snapshots:
+            last = self.snapshots[-1]
+            if time < last.time:
+                return False
+            if tick is not None and last.tick is not None and tick <= last.tick:
+                return False
+        self.snapshots.append(TimedRect(time, tick, tuple(rect)))
+        return True
+
+    def sample(self, render_time: float, max_extrapolation: float) -> Rect | None:
+        snapshots = self.snapshots
+        if not snapshots:
+            return None
+
+        # Forget snapshots that are too old to be used again, but always
+        # keep two around for extrapolating.
+        while len(snapshots) > 2 and snapshots[1].time <= render_time:
+            snapshots.popleft()
+
+        first = snapshots[0]
+        if len(snapshots) == 1 or render_time <= first.time:
+            return first.rect
+
+        second = snapshots[1]
+        elapsed = second.time - first.time
+        if elapsed <= 0:
+            return second.rect
+        if render_time <= second.time:
+            return _lerp_rect(
+                first.rect, second.rect, (render_time - first.time) / elapsed
+            )
+
+        # The next snapshot is late, keep going the same way for a bit
+        ahead = min(render_time - second.time, max_extrapolation)
+        return _lerp_rect(first.rect, second.rect, 1 + ahead / elapsed)
+
+
+class SnapshotInterpolator:
+    def __init__(
+        self,
+        delay: float = 0.15,
+        max_extrapolation: float = 0.25,
+        max_snapshots: int = 32,
+    ):
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.max_snapshots = max_snapshots
+        self.buffers: Dict[str, SnapshotBuffer] = {}
+        self.dropped_snapshots = 0
+
+    def push(self, id: str, rect: Rect, now: float, tick: int | None = None):
+        buffer = self.buffers.get(id)
+        if buffer is None:
+            buffer = self.buffers[id] = SnapshotBuffer(self.max_snapshots)
+        if not buffer.push(now, tick, rect):
+            self.dropped_snapshots += 1
+
+    def remove(self, id: str):
+        self.buffers.pop(id, None)
+
+    def hold(self, now: float, tick: int | None = None):
+        """
+        Push the last rect again for every entity that didn't get one at
+        `now`, for snapshots that leave out entities that didn't change
+        (see `lib/v2/delta.py`).  Otherwise they would be extrapolated.
+        """
+        for buffer in self.buffers.values():
+            if buffer.snapshots and buffer.snapshots[-1].time < now:
+                buffer.push(now, tick, buffer.snapshots[-1].rect)
+
+    def sample(self, id: str, now: float) -> Rect | None:
+        buffer = self.buffers.get(id)
+        if buffer is None:
+            return None
+        return buffer.sample(now - self.delay, self.max_extrapolation)
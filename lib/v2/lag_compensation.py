@@ -0,0 +1,212 @@
+"""
+Server side lag compensation.
+
+Clients draw other players where they were a round trip plus the
+interpolation delay ago (see `lib/v2/interpolation.py`), so checking a
+shot against where everyone is right now misses players the shooter
+clearly hit on their screen.  `EntityHistory` remembers the rect of every
+entity for the last `capacity` ticks so a check can be done against the
+world as the shooter saw it instead.
+
+Everything lives in preallocated NumPy arrays used as a ring buffer, one
+row per tick and one column per entity:
+
+- `times`, `ticks`: when each row was recorded
+- `rects`: x, y, w, h of every entity, as float32
+- `present`: if the entity existed in that tick
+
+Recording a tick overwrites the oldest row with a couple of array
+copies, no matter how long the history is, and memory stays at
+`capacity` rows.  Columns belong to an entity until it is removed, so
+rows of different ticks line up.  `rewind()` interpolates between the
+two rows on either side of a time, like clients do between snapshots.
+
+The v2 game has no shots yet, so the server only records into it
+(`Game._record_history()`) when `HISTORY_TICKS` turns it on.
+"""
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+Rect = Tuple[int, int, int, int]
+
+
+class EntityHistory:
+    def __init__(self, capacity: int = 64, max_entities: int = 64):
+        if capacity < 2:
+            raise ValueError("`capacity` must be at least 2!")
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.ticks = np.zeros(capacity, dtype=np.int64)
+        self.rects = np.zeros((capacity, max_entities, 4), dtype=np.float32)
+        self.present = np.zeros((capacity, max_entities), dtype=bool)
+        self.recorded = 0
+
+        self.columns: Dict[str, int] = {}
+        self.column_ids: List[str | None] = [None] * max_entities
+        self._free_columns = list(range(max_entities - 1, -1, -1))
+        # Columns of the last `ids` passed to `record()`, reused while
+        # the ids don't change
+        self._last_ids: List[str] = []
+        self._last_columns = np.zeros(0, dtype=np.intp)
+
+    @property
+    def max_entities(self) -> int:
+        return self.rects.shape[1]
+
+    def __len__(self) -> int:
+        """Ticks in the history."""
+        return min(self.recorded, self.capacity)
+
+    def _grow(self):
+        old = self.max_entities
+        rects = np.zeros((self.capacity, old * 2, 4), dtype=np.float32)
+        rects[:, :old] = self.rects
+        present = np.zeros((self.capacity, old * 2), dtype=bool)
+        present[:, :old] = self.present
+        self.rects, self.present = rects, present
+        self.column_ids.extend([None] * old)
+        self._free_columns = list(range(old * 2 - 1, old - 1, -1)) + self._free_columns
+
+    def _column(self, id: str) -> int:
+        column = self.columns.get(id)
+        if column is None:
+            if not self._free_columns:
+                self._grow()
+            column = self._free_columns.pop()
+            self.columns[id] = column
+            self.column_ids[column] = id
+        return column
+
+    def remove(self, id: str):
+        """
+        Forget an entity.  Its column gets cleared so the next entity in
+        it doesn't inherit its past.
+        """
+        column = self.columns.pop(id, None)
+        if column is None:
+            return
+        self.present[:, column] = False
+        self.column_ids[column] = None
+        self._free_columns.append(column)
+        self._last_ids = []
+
+    def record(
+        self,
+        time: float,
+        tick: int,
+        ids: Sequence[str],
+        positions: np.ndarray,
+        sizes: np.ndarray,
+    ):
+        """
+        Record one tick.  `positions` and `sizes` are (len(ids), 2)
+        arrays of top left corners and sizes, like `EntityStore` keeps.
+        """
+        if ids != self._last_ids:
+            self._last_columns = np.fromiter(
+                (self._column(id) for id in ids), dtype=np.intp, count=len(ids)
+            )
+            self._last_ids = list(ids)
+        columns = self._last_columns
+
+        row = self.recorded % self.capacity
+        self.times[row] = time
+        self.ticks[row] = tick
+        self.present[row] = False
+        self.present[row, columns] = True
+        rects = self.rects[row]
+        rects[columns, :2] = positions
+        rects[columns, 2:] = sizes
+        self.recorded += 1
+
+    def _rows(self) -> np.ndarray:
+        """Rows of the buffer, oldest tick first."""
+        count = len(self)
+        first = self.recorded - count
+        return np.arange(first, self.recorded) % self.capacity
+
+    def time_of_tick(self, tick: float) -> float:
+        """
+        When `tick` was recorded, interpolated for fractions of ticks
+        like clients see between snapshots.
+        """
+        rows = self._rows()
+        if len(rows) == 0:
+            raise ValueError("Nothing recorded yet")
+        return float(np.interp(tick, self.ticks[rows], self.times[rows]))
+
+    def _rewind_arrays(self, time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The rects and presence of every column at `time`.  Times before
+        the oldest or after the newest tick are clamped to them.
+        """
+        rows = self._rows()
+        if len(rows) == 0:
+            raise ValueError("Nothing recorded yet")
+        times = self.times[rows]
+        i = int(np.searchsorted(times, time, side="right"))
+        if i == 0:
+            return self.rects[rows[0]], self.present[rows[0]]
+        if i == len(rows):
+            return self.rects[rows[-1]], self.present[rows[-1]]
+
+        before, after = rows[i - 1], rows[i]
+        span = times[i] - times[i - 1]
+        t = (time - times[i - 1]) / span if span > 0 else 1.0
+        a, b = self.rects[before], self.rects[after]
+        in_a, in_b = self.present[before], self.present[after]
+        rects = a + (b - a) * np.float32(t)
+        # Sizes aren't interpolated, and entities that only exist on one
+        # side stay where they were on that side
+        rects[:, 2:] = b[:, 2:]
+        only_a = in_a & ~in_b
+        rects[only_a] = a[only_a]
+        only_b = in_b & ~in_a
+        rects[only_b] = b[only_b]
+        return rects, in_a | in_b
+
+    def rewind(self, time: float) -> Dict[str, Rect]:
+        """Rects of every entity at `time`."""
+        rects, present = self._rewind_arrays(time)
+        return {
+            self.column_ids[column]: _to_rect(rects[column])
+            for column in np.flatnonzero(present)
+            if self.column_ids[column] is not None
+        }
+
+    def rect_at(self, id: str, time: float) -> Rect | None:
+        column = self.columns.get(id)
+        if column is None:
+            return None
+        rects, present = self._rewind_arrays(time)
+        return _to_rect(rects[column]) if present[column] else None
+
+    def hits(
+        self, rect: Sequence[float], time: float, exclude: Iterable[str] = ()
+    ) -> List[str]:
+        """
+        Ids of the entities that overlapped `rect` at `time`, checked
+        for all of them at once.
+        """
+        rects, present = self._rewind_arrays(time)
+        x, y, w, h = rect
+        overlaps = (
+            present
+            & (rects[:, 0] < x + w)
+            & (rects[:, 0] + rects[:, 2] > x)
+            & (rects[:, 1] < y + h)
+            & (rects[:, 1] + rects[:, 3] > y)
+        )
+        exclude = set(exclude)
+        return [
+            self.column_ids[column]
+            for column in np.flatnonzero(overlaps)
+            if self.column_ids[column] not in exclude
+        ]
+
+
+def _to_rect(values: np.ndarray) -> Rect:
+    x, y, w, h = values.tolist()
+    return round(x), round(y), round(w), round(h)
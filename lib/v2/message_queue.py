@@ -0,0 +1,134 @@
+"""
+Bounded queue for `NetworkClient` messages.
+
+A plain `asyncio.Queue()` grows forever when the side reading it falls
+behind, like the server's out queue when the broadcaster is slow or its
+in queue when a client floods it with positions.  `MessageQueue` keeps
+the `asyncio.Queue` interface but holds at most `maxsize` messages and
+decides what to do with each message by its type:
+
+- `COALESCE`: only the latest value matters, like position messages.  A
+  new message drops a queued one with the same type and
+  `player_session_uuid` and goes to the back, so it still comes after
+  everything queued before it, like a delta after its keyframe.
+- `FIFO`: events that must be seen in order, like disconnects.  These
+  are never dropped, even past the bound, since there can only be one
+  per connection.
+- `DROP_OLDEST`: everything else, like inputs.  When the queue is full
+  the oldest message that isn't `FIFO` gets dropped.
+
+`coalesced` and `dropped` count how often that happened.
+"""
+
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, Tuple
+
+from lib.v1.common import WS_Message
+from lib.v2.config import MAX_QUEUED_MESSAGES
+
+
+class QueuePolicy(Enum):
+    COALESCE = "coalesce"
+    FIFO = "fifo"
+    DROP_OLDEST = "drop_oldest"
+
+
+DEFAULT_POLICIES: Dict[str, QueuePolicy] = {
+    "SERVER_POSITION_V2": QueuePolicy.COALESCE,
+    "CLIENT_POSITION_V2": QueuePolicy.COALESCE,
+    # Deltas only depend on their baseline, and only the newest ack matters
+    "SERVER_DELTA_V2": QueuePolicy.COALESCE,
+    "CLIENT_ACK_V2": QueuePolicy.COALESCE,
+    "CLIENT_CONNECTED_TO_SERVER_V2": QueuePolicy.FIFO,
+    "CLIENT_DISCONNECTED_FROM_SERVER_V2": QueuePolicy.FIFO,
+}
+
+
+class _Slot:
+    __slots__ = ("message", "policy", "key")
+
+    def __init__(self, message: Any, policy: QueuePolicy, key: Tuple | None):
+        self.message = message
+        self.policy = policy
+        self.key = key
+
+
+class MessageQueue(asyncio.Queue):
+    def __init__(
+        self,
+        maxsize: int = MAX_QUEUED_MESSAGES,
+        policies: Dict[str, QueuePolicy] | None = None,
+    ):
+        # The base class would block or raise when full, the bound is
+        # handled in `_put()` instead
+        super().__init__()
+        self.max_messages = maxsize
+        self.policies = DEFAULT_POLICIES if policies is None else policies
+        self.coalesced = 0
+        self.dropped = 0
+        self._discarded = 0
+
+    def policy_for(self, message: Any) -> QueuePolicy:
+        if isinstance(message, WS_Message):
+            return self.policies.get(message.message_type, QueuePolicy.DROP_OLDEST)
+        return QueuePolicy.DROP_OLDEST
+
+    def put_nowait(self, item: Any):
+        super().put_nowait(item)
+        # Messages that were replaced or dropped will never be handed
+        # out, so `join()` shouldn't wait on them
+        while self._discarded:
+            self._discarded -= 1
+            self.task_done()
+
+    # Hooks used by `asyncio.Queue`
+
+    def _init(self, maxsize: int):
+        self._queue: Deque[_Slot] = deque()
+        self._latest: Dict[Tuple, _Slot] = {}
+
+    def _qsize(self) -> int:
+        return len(self._queue)
+
+    def _get(self) -> Any:
+        slot = self._queue.popleft()
+        if slot.key is not None:
+            del self._latest[slot.key]
+        return slot.message
+
+    def _put(self, item: Any):
+        policy = self.policy_for(item)
+        key = None
+        if policy is QueuePolicy.COALESCE:
+            key = (item.message_type, item.player_session_uuid)
+            slot = self._latest.pop(key, None)
+            if slot is not None:
+                # Not in place, it may depend on what was queued after it
+                self._queue.remove(slot)
+                self.coalesced += 1
+                self._discarded += 1
+
+        if len(self._queue) >= self.max_messages and not self._drop_oldest():
+            if policy is not QueuePolicy.FIFO:
+                # Everything queued must be kept, so this one goes
+                self.dropped += 1
+                self._discarded += 1
+                return
+
+        slot = _Slot(item, policy, key)
+        self._queue.append(slot)
+        if key is not None:
+            self._latest[key] = slot
+
+    def _drop_oldest(self) -> bool:
+        for i, slot in enumerate(self._queue):
+            if slot.policy is not QueuePolicy.FIFO:
+                del self._queue[i]
+                if slot.key is not None:
+                    del self._latest[slot.key]
+                self.dropped += 1
+                self._discarded += 1
+                return True
+        return False
@@ -0,0 +1,124 @@
+"""
+Registry of typed message bodies for the v2 JSON protocol.
+
+`parse_WS_Message()` in `lib/v1/common.py` hands every handler a raw
+dict body, and every frame gets fully decoded even when the receiver is
+going to ignore it (the client only cares about snapshots, the server
+only about game messages).  Here every `message_type` the game handles
+maps to a parser that turns the JSON body into a typed, slotted object:
+
+- `SERVER_POSITION_V2` and `CLIENT_POSITION_V2`: list of `EntityState`
+- `CLIENT_INPUT_V2`: `InputCommand`
+
+`peek_json_message_type()` reads the message type straight out of the
+text without decoding it, so receivers can skip frames they don't
+handle.  Frames that aren't JSON objects (the debug text clients can
+send) skip `json.loads()` completely and message types without a parser
+keep their body as is.
+
+Most of the decoding time is `json.loads()` itself, pydantic's envelope
+validation is cheap (`model_construct()` is actually slower), so the
+fast paths are skipping frames and the binary format in
+`lib/v2/wire.py`, which decodes to the same typed bodies.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from lib.v1.common import WS_Message
+from lib.v2.prediction import InputCommand
+
+
+class EntityState(NamedTuple):
+    """One sprite in a position snapshot."""
+
+    id: str
+    class_name: str
+    rect: Tuple[int, int, int, int]
+    last_input_seq: int | None = None
+
+
+BodyParser = Callable[[Any], Any]
+
+BODY_PARSERS: Dict[str, BodyParser] = {}
+
+
+def register_body(message_type: str, parser: BodyParser):
+    """
+    `parser` gets the decoded JSON body and should raise a `ValueError`,
+    `KeyError` or `TypeError` if it's not valid.
+    """
+    BODY_PARSERS[message_type] = parser
+
+
+def parse_entity_states(body: Any) -> List[EntityState]:
+    states = []
+    for item in body:
+        rect = tuple(item["rect"])
+        if len(rect) != 4:
+            raise ValueError(f"Bad rect {rect}")
+        states.append(
+            EntityState(
+                item["id"], item["class_name"], rect, item.get("last_input_seq")
+            )
+        )
+    return states
+
+
+register_body("SERVER_POSITION_V2", parse_entity_states)
+register_body("CLIENT_POSITION_V2", parse_entity_states)
+register_body("CLIENT_INPUT_V2", InputCommand.from_body)
+
+
+_TYPE_KEY = '"message_type":'
+
+
+def peek_json_message_type(data: str) -> str | None:
+    """
+    Cheap look at the message type of a JSON frame, None if there isn't
+    one.  Only a hint for skipping frames, a body with its own
+    `message_type` key can fool it, so check the decoded message again.
+    """
+    start = data.find(_TYPE_KEY)
+    if start == -1:
+        return None
+    start = data.find('"', start + len(_TYPE_KEY))
+    end = data.find('"', start + 1)
+    if start == -1 or end == -1:
+        return None
+    return data[start + 1 : end]
+
+
+def _unknown_message(data: str) -> WS_Message:
+    # Same as what `parse_WS_Message()` does with text that isn't a message
+    return WS_Message(player_session_uuid="UNKOWN", message_type="UNKOWN", body=data)
+
+
+def decode_json_message(data: str) -> WS_Message:
+    """
+    Decode a JSON text frame.  Raises a `ValueError` if the envelope is
+    invalid or the body doesn't match the parser registered for its
+    message type.
+    """
+    if not data.startswith("{"):
+        return _unknown_message(data)
+    try:
+        fields = json.loads(data)
+    except ValueError:
+        return _unknown_message(data)
+
+    body = fields.get("body")
+    parser = BODY_PARSERS.get(fields.get("message_type"))
+    if parser is not None:
+        try:
+            body = parser(body)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Bad '{fields['message_type']}' body: {e}") from e
+
+    # pydantic's `ValidationError` is a `ValueError` too
+    return WS_Message(
+        player_session_uuid=fields.get("player_session_uuid"),
+        message_type=fields.get("message_type"),
+        body=body,
+        tick=fields.get("tick"),
+    )
@@ -0,0 +1,182 @@
+"""
+Minimal Prometheus style metrics, rendered in the text exposition
+format by `MetricsRegistry.render()`.
+
+Only what the server needs, so no extra dependency:
+
+- `Counter`: only goes up, like messages received
+- `Gauge`: can go up and down, like connections
+- `Histogram`: fixed buckets, like tick durations
+
+Counters and gauges can also read their value from a function when
+rendering, so values that already live somewhere (queue sizes, counters
+of other objects) don't have to be kept in sync.
+
+Updating a metric is a dict lookup and an addition, so they can stay on
+in the hot path.  Label values are passed positionally in the order of
+`labelnames`, keep them to a small fixed set of values.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds, for durations well under a 60/s tick up to a few ticks
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.0167,
+    0.025,
+    0.05,
+    0.1,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, label_values, value in self.samples():
+            labelnames = self.labelnames
+            if len(label_values) > len(labelnames):
+                # Histogram buckets add `le`
+                labelnames = (*labelnames, "le")
+            lines.append(
+                f"{self.name}{suffix}{_labels(labelnames, label_values)} "
+                f"{_number(value)}"
+            )
+        return lines
+
+
+class _ValueMetric(Metric):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        function: Callable[[], float | Dict[Tuple[str, ...], float]] | None = None,
+    ):
+        """
+        `function` is called on every render instead of keeping values
+        here.  With labels it returns a dict of label values to value.
+        """
+        super().__init__(name, help, labelnames)
+        self.function = function
+        self.values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def samples(self):
+        values = self.values
+        if self.function is not None:
+            result = self.function()
+            values = result if isinstance(result, dict) else {(): result}
+        return [("", labels, value) for labels, value in values.items()]
+
+
+class Counter(_ValueMetric):
+    type = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self.values[label_values] += amount
+
+
+class Gauge(_ValueMetric):
+    type = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        self.values[label_values] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # One more for +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            cumulative += count
+            samples.append(("_bucket", (_number(bound),), cumulative))
+        samples.append(("_sum", (), self.sum))
+        samples.append(("_count", (), self.count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, help: str, labelnames: Sequence[str] = (), function=None
+    ) -> Counter:
+        return self.register(Counter(name, help, labelnames, function))
+
+    def gauge(
+        self, name: str, help: str, labelnames: Sequence[str] = (), function=None
+    ) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, function))
+
+    def histogram(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
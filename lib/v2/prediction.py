@@ -0,0 +1,215 @@
+"""
+Client side prediction with server reconciliation.
+
+The client doesn't send its own position, the server is the only source
+of truth for where players are.  It sends the input of every frame
+with something pressed instead, a small `InputCommand` stamped with an
+increasing sequence number (the client's input tick), and moves its
+player right away using the same `apply_input()` function the server
+uses.  Idle frames send nothing since they don't move anyone.  The
+server applies the inputs to its copy of the player and includes the
+sequence number of the last input it processed in the snapshot, as
+`last_input_seq` of every player in full snapshots and as `input_seq`
+of only the receiving player in deltas (see `lib/v2/delta.py`).
+
+When that snapshot arrives the client resets its player to the
+server's rect and replays the inputs the server hadn't processed yet on
+top of it.  If both sides agree this lands exactly where the client
+already was, otherwise the server wins.
+
+An input is a bitmask of the W/A/S/D buttons plus an optional analog
+stick, so it packs into a few bytes (see `lib/v2/wire.py`).  In JSON the
+body is the list `[seq, buttons, axis_x, axis_y, dt]`.
+"""
+
+from collections import deque
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Deque, Sequence, Tuple
+
+# Only imported when needed, the server imports this module through
+# `lib/v2/wire.py` long before it runs a game
+if TYPE_CHECKING:
+    import pygame as pg
+
+BUTTON_UP = 1 << 0
+BUTTON_DOWN = 1 << 1
+BUTTON_LEFT = 1 << 2
+BUTTON_RIGHT = 1 << 3
+
+# Longest frame the server will apply for one input, so clients can't
+# move faster by claiming huge frame times.
+MAX_INPUT_DT = 0.1
+
+# Most input time the server lets a player save up, see
+# `Game._input_time()`.  Covers inputs that arrive in bursts because of
+# network jitter without letting a client move faster than real time.
+MAX_INPUT_BUDGET = 0.25
+
+# Analog sticks rarely rest at exactly 0
+AXIS_DEAD_ZONE = 0.15
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+def _finite(value: Any) -> float:
+    """
+    `float(value)`, raising a `ValueError` for NaN and inf, which
+    `_clamp()` would let through and `apply_input()` would fling the
+    player across the int range with.
+    """
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Not a finite number: {value}")
+    return value
+
+
+def quantize_dt(dt: float) -> float:
+    """Whole milliseconds, at most `MAX_INPUT_DT`."""
+    return round(_clamp(dt, 0.0, MAX_INPUT_DT) * 1000) / 1000
+
+
+def quantize_axis(value: float) -> float:
+    """Steps of 1/127, so the axis fits in a signed byte."""
+    return round(_clamp(value, -1.0, 1.0) * 127) / 127
+
+
+@dataclass(slots=True)
+class InputCommand:
+    seq: int
+    buttons: int
+    dt: float
+    # Analog stick position from -1 to 1, added to the buttons
+    axis_x: float = 0.0
+    axis_y: float = 0.0
+
+    @classmethod
+    def from_body(cls, body: Sequence[Any]) -> "InputCommand":
+        """Raises a `ValueError` for bodies that aren't valid."""
+        seq, buttons, axis_x, axis_y, dt = body
+        return cls(
+            seq=int(seq),
+            buttons=int(buttons),
+            dt=_clamp(_finite(dt), 0.0, MAX_INPUT_DT),
+            axis_x=_clamp(_finite(axis_x), -1.0, 1.0),
+            axis_y=_clamp(_finite(axis_y), -1.0, 1.0),
+        )
+
+    def to_body(self) -> Tuple[int, int, float, float, float]:
+        return (self.seq, self.buttons, self.axis_x, self.axis_y, self.dt)
+
+    def direction(self) -> Tuple[float, float]:
+        x = self.axis_x
+        y = self.axis_y
+        if self.buttons & BUTTON_UP:
+            y -= 1
+        if self.buttons & BUTTON_DOWN:
+            y += 1
+        if self.buttons & BUTTON_LEFT:
+            x -= 1
+        if self.buttons & BUTTON_RIGHT:
+            x += 1
+        return _clamp(x, -1.0, 1.0), _clamp(y, -1.0, 1.0)
+
+
+def get_pressed_buttons() -> int:
+    import pygame as pg
+
+    keys = pg.key.get_pressed()
+    buttons = 0
+    if keys[pg.K_w]:
+        buttons |= BUTTON_UP
+    if keys[pg.K_s]:
+        buttons |= BUTTON_DOWN
+    if keys[pg.K_a]:
+        buttons |= BUTTON_LEFT
+    if keys[pg.K_d]:
+        buttons |= BUTTON_RIGHT
+    return buttons
+
+
+def get_axes() -> Tuple[float, float]:
+    """
+    Left stick of the first joystick, or (0, 0) if there isn't one.
+    """
+    import pygame as pg
+
+    if not pg.joystick.get_init() or pg.joystick.get_count() == 0:
+        return 0.0, 0.0
+    joystick = pg.joystick.Joystick(0)
+    if joystick.get_numaxes() < 2:
+        return 0.0, 0.0
+    axes = []
+    for i in range(2):
+        value = joystick.get_axis(i)
+        axes.append(value if abs(value) > AXIS_DEAD_ZONE else 0.0)
+    return axes[0], axes[1]
+
+
+def apply_input(
+    rect: "pg.Rect", command: InputCommand, speed: float, bounds: "pg.Rect"
+) -> "pg.Rect":
+    """
+    Move `rect` by one input.  Used by both the client and the server so
+    replaying the same inputs gives the same result on both.
+    """
+    rect = rect.copy()
+    x, y = command.direction()
+    rect.centerx += speed * command.dt * x
+    rect.centery += speed * command.dt * y
+    return rect.clamp(bounds)
+
+
+class InputPredictor:
+    def __init__(self, max_pending: int = 256):
+        self.next_seq = 1
+        # Inputs sent to the server that it hasn't acknowledged yet.  If
+        # it falls too far behind, the oldest are forgotten, which just
+        # means a correction when the next snapshot arrives.
+        self.pending: Deque[InputCommand] = deque(maxlen=max_pending)
+        self.last_acked_seq = 0
+        self.corrections = 0
+
+    def record(
+        self, buttons: int, dt: float, axis_x: float = 0.0, axis_y: float = 0.0
+    ) -> InputCommand:
+        # Rounded the same way the wire format does, so the server
+        # replays exactly what we predicted with
+        command = InputCommand(
+            seq=self.next_seq,
+            buttons=buttons,
+            dt=quantize_dt(dt),
+            axis_x=quantize_axis(axis_x),
+            axis_y=quantize_axis(axis_y),
+        )
+        self.next_seq += 1
+        self.pending.append(command)
+        return command
+
+    def reconcile(
+        self,
+        acked_seq: int,
+        server_rect: "pg.Rect",
+        predicted_rect: "pg.Rect",
+        speed: float,
+        bounds: "pg.Rect",
+    ) -> "pg.Rect | None":
+        """
+        Returns where the player should be after replaying the inputs
+        the server hasn't seen on top of `server_rect`, or None if this
+        acknowledgement is older than one already applied.
+        """
+        if acked_seq <= self.last_acked_seq:
+            return None
+        self.last_acked_seq = acked_seq
+        while self.pending and self.pending[0].seq <= acked_seq:
+            self.pending.popleft()
+
+        rect = server_rect.copy()
+        for command in self.pending:
+            rect = apply_input(rect, command, speed, bounds)
+        if rect != predicted_rect:
+            self.corrections += 1
+        return rect
@@ -0,0 +1,163 @@
+"""
+Per phase timing of `Game.update()`.
+
+`TickScheduler` can tell that a tick took too long, but not why.  The
+profiler splits every tick into the phases of `Game.update()` (event
+polling, sprite updates, sending, receiving, rendering, ...) and keeps
+the duration of each phase for the last `capacity` ticks in a ring
+buffer.  Recording is one `perf_counter()` call per phase, cheap enough
+to leave on in production.
+
+When a tick goes over `budget` the phase that took the longest gets the
+blame in `overrun_phases`.  On demand the buffer can be turned into:
+
+- `summary()`: percentiles and a histogram per phase, for a quick look
+- `chrome_trace()`: Chrome trace event JSON, open it in
+  `chrome://tracing` or https://ui.perfetto.dev to see every tick
+"""
+
+from collections import Counter
+import json
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Sequence
+
+# Only needed for summaries, so servers don't import it on start up
+if TYPE_CHECKING:
+    import numpy as np
+
+# Upper edges of the histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+
+class TickProfiler:
+    def __init__(
+        self,
+        phases: Sequence[str],
+        budget: float,
+        capacity: int = 600,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.phases = tuple(phases)
+        self.budget = budget
+        self.capacity = capacity
+        self.clock = clock
+        self._phase_index = {phase: i for i, phase in enumerate(self.phases)}
+
+        # Plain lists are faster than numpy for setting single values,
+        # numpy is only used when summarizing
+        self._ticks = [0] * capacity
+        self._starts = [0.0] * capacity
+        self._durations = [[0.0] * len(self.phases) for _ in range(capacity)]
+        self._row = 0
+        self._last = 0.0
+
+        self.recorded_ticks = 0
+        self.overruns = 0
+        self.overrun_phases: Counter = Counter()
+
+    def begin_tick(self, tick: int):
+        self._row = self.recorded_ticks % self.capacity
+        self._ticks[self._row] = tick
+        durations = self._durations[self._row]
+        for i in range(len(durations)):
+            durations[i] = 0.0
+        self._last = self._starts[self._row] = self.clock()
+
+    def mark(self, phase: str):
+        """Everything since the last mark (or the tick start) was `phase`."""
+        now = self.clock()
+        self._durations[self._row][self._phase_index[phase]] += now - self._last
+        self._last = now
+
+    def end_tick(self):
+        durations = self._durations[self._row]
+        self.recorded_ticks += 1
+        if self._last - self._starts[self._row] > self.budget:
+            self.overruns += 1
+            slowest = max(range(len(durations)), key=durations.__getitem__)
+            self.overrun_phases[self.phases[slowest]] += 1
+
+    def _rows(self) -> Iterator[int]:
+        """Rows of the buffer, oldest tick first."""
+        count = min(self.recorded_ticks, self.capacity)
+        first = self.recorded_ticks - count
+        for i in range(first, self.recorded_ticks):
+            yield i % self.capacity
+
+    def summary(self) -> Dict[str, Any]:
+        import numpy as np
+
+        rows = list(self._rows())
+        if rows:
+            durations = np.array([self._durations[row] for row in rows]) * 1000
+        else:
+            durations = np.zeros((0, len(self.phases)))
+        phases = {
+            phase: _describe(durations[:, i]) for i, phase in enumerate(self.phases)
+        }
+        phases["total"] = _describe(durations.sum(axis=1))
+        return {
+            "recorded_ticks": self.recorded_ticks,
+            "window_ticks": len(rows),
+            "budget_ms": self.budget * 1000,
+            "overruns": self.overruns,
+            "overrun_phases": dict(self.overrun_phases),
+            "phases": phases,
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Every tick in the buffer as a "complete" event with one nested
+        event per phase, timestamps in microseconds.
+        """
+        events: List[Dict[str, Any]] = []
+        rows = list(self._rows())
+        origin = self._starts[rows[0]] if rows else 0.0
+        for row in rows:
+            start = (self._starts[row] - origin) * 1e6
+            tick = self._ticks[row]
+            durations = [duration * 1e6 for duration in self._durations[row]]
+            events.append(_trace_event("tick", start, sum(durations), tick))
+            for phase, duration in zip(self.phases, durations):
+                if duration > 0:
+                    events.append(_trace_event(phase, start, duration, tick))
+                start += duration
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def _trace_event(name: str, start: float, duration: float, tick: int):
+    return {
+        "name": name,
+        "ph": "X",
+        "ts": start,
+        "dur": duration,
+        "pid": 1,
+        "tid": 1,
+        "args": {"tick": tick},
+    }
+
+
+def _describe(values_ms: "np.ndarray") -> Dict[str, Any]:
+    import numpy as np
+
+    edges = (0, *HISTOGRAM_BUCKETS_MS, np.inf)
+    counts, _ = np.histogram(values_ms, bins=edges)
+    labels = [f"<{edge}ms" for edge in HISTOGRAM_BUCKETS_MS]
+    labels.append(f">={HISTOGRAM_BUCKETS_MS[-1]}ms")
+    if len(values_ms) == 0:
+        stats = dict.fromkeys(("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"), 0.0)
+    else:
+        p50, p90, p99 = np.percentile(values_ms, (50, 90, 99))
+        stats = {
+            "mean_ms": float(values_ms.mean()),
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99),
+            "max_ms": float(values_ms.max()),
+        }
+    stats["histogram"] = dict(zip(labels, counts.tolist()))
+    return stats
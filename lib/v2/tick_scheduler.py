@@ -0,0 +1,121 @@
+"""
+Fixed timestep tick scheduler for running the V2 `Game` on the server.
+
+`Game.update()` on the client ends with `clock.tick(60)`, which is a
+blocking sleep.  That's fine on the client, but on the server it blocks
+the asyncio event loop, so the websockets can't send or receive for most
+of every frame.  This scheduler runs the game at a fixed tick rate by
+awaiting the deadline of the next tick instead, so networking gets the
+idle part of every tick.
+
+Deadlines are kept on an absolute schedule (`start + n * interval`), so
+late wake ups don't add up to drift over time.  When a tick takes longer
+than its budget the following ticks run back to back to catch up, unless
+the scheduler fell more than `max_catch_up_ticks` behind, in which case
+the missed ticks are skipped instead of spiraling further behind.
+
+An exception in `game.update()` is logged and counted in `errors`, the
+game keeps ticking.  Otherwise one bad message would end the tick task
+and leave everyone connected without snapshots.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import logging
+
+from lib.v2.config import SERVER_TICK_RATE
+from lib.v2.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TickStats:
+    ticks: int = 0
+    overruns: int = 0
+    skipped_ticks: int = 0
+    errors: int = 0
+    last_tick_duration: float = 0.0
+    max_tick_duration: float = 0.0
+    total_tick_duration: float = 0.0
+
+    @property
+    def mean_tick_duration(self) -> float:
+        return self.total_tick_duration / self.ticks if self.ticks else 0.0
+
+
+class TickScheduler:
+    def __init__(
+        self,
+        tick_rate: int = SERVER_TICK_RATE,
+        max_catch_up_ticks: int = 5,
+        report_interval: float = 30.0,
+        duration_histogram: Histogram | None = None,
+    ):
+        if tick_rate <= 0:
+            raise ValueError("`tick_rate` must be positive!")
+        self.tick_rate = tick_rate
+        self.interval = 1 / tick_rate
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.report_interval = report_interval
+        self.duration_histogram = duration_histogram
+        self.stats = TickStats()
+
+    def _record_tick(self, duration: float):
+        self.stats.ticks += 1
+        self.stats.last_tick_duration = duration
+        self.stats.total_tick_duration += duration
+        if duration > self.stats.max_tick_duration:
+            self.stats.max_tick_duration = duration
+        if duration > self.interval:
+            self.stats.overruns += 1
+        if self.duration_histogram:
+            self.duration_histogram.observe(duration)
+
+    def report(self):
+        logger.info(
+            f"Ticks: {self.stats.ticks} @ {self.tick_rate}/s, "
+            f"overruns: {self.stats.overruns}, "
+            f"skipped: {self.stats.skipped_ticks}, "
+            f"errors: {self.stats.errors}, "
+            f"mean: {self.stats.mean_tick_duration * 1000:.2f}ms, "
+            f"max: {self.stats.max_tick_duration * 1000:.2f}ms"
+        )
+
+    async def run(self, game):
+        """
+        Run `game.update()` every tick until `game.running` is False.
+        `game.dt` is set to the fixed timestep before every update.
+        """
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time()
+        next_report = next_deadline + self.report_interval
+
+        while game.running:
+            tick_start = loop.time()
+            game.dt = self.interval
+            try:
+                game.update()
+            except Exception:
+                self.stats.errors += 1
+                logger.exception(f"Tick {self.stats.ticks} failed")
+            tick_end = loop.time()
+            self._record_tick(tick_end - tick_start)
+
+            next_deadline += self.interval
+            behind = tick_end - next_deadline
+            if behind > 0:
+                missed_ticks = int(behind // self.interval)
+                if missed_ticks > self.max_catch_up_ticks:
+                    # Too far behind to catch up, drop the missed ticks
+                    # but stay aligned to the original schedule.
+                    self.stats.skipped_ticks += missed_ticks
+                    next_deadline += missed_ticks * self.interval
+                # Still let the network I/O run between catch up ticks.
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(-behind)
+
+            if tick_end >= next_report:
+                self.report()
+                next_report = tick_end + self.report_interval
@@ -0,0 +1,447 @@
+"""
+Compact binary encoding for the position snapshot messages
+(`SERVER_POSITION_V2` and `CLIENT_POSITION_V2`), snapshot deltas and
+their acks (`SERVER_DELTA_V2` and `CLIENT_ACK_V2`) and client input
+commands (`CLIENT_INPUT_V2`).
+
+The JSON version of a snapshot repeats the keys, a 36 character UUID
+string and the class name for every sprite, which adds up fast with a
+lot of players connected.  The binary version is a fixed layout header
+followed by one fixed size record per entity:
+
+```
+header: magic (2s) | version (B) | message type (B) | tick (I) | count (H) | sender uuid (16s)
+entity: uuid (16s) | class code (B) | x (h) | y (h) | w (h) | h (h) | last input seq (I)
+```
+
+`last input seq` is 0 for entities that aren't driven by client inputs
+(see `lib/v2/prediction.py`).
+
+Input commands are sent every frame something is pressed, so they get
+their own 12 byte layout without a sender, the server knows who sent it
+from the connection:
+
+```
+input: magic (2s) | version (B) | message type (B) | seq (I) | buttons (B) | axis x (b) | axis y (b) | dt ms (B)
+```
+
+Deltas (see `lib/v2/delta.py`) have records of different sizes.  Every
+changed entity has a bit mask of the fields that follow it, in this
+order: class code (B), position (2h) and size (2h).  The removed ids
+come after the changed entities:
+
+```
+header: magic (2s) | version (B) | message type (B) | tick (I) | baseline tick (I) | input seq (I) | changed count (H) | removed count (H) | sender uuid (16s)
+changed: uuid (16s) | fields (B) | the fields in the mask
+removed: uuid (16s)
+```
+
+`input seq` is the last input of the receiving player, 0 for none.  It
+is the only part that differs between clients with the same baseline,
+`with_input_seq()` sets it in an already encoded delta.
+
+Acks are just the tick:
+
+```
+ack: magic (2s) | version (B) | message type (B) | tick (I)
+```
+
+Everything is little endian.  Decoding walks a `memoryview` of the
+frame with `struct.iter_unpack` so no intermediate dicts are created,
+the body of the decoded `WS_Message` is a list of `EntityState` tuples.
+
+Any message type without a binary layout (disconnects, debug text,
+etc.) is still sent as JSON text, so JSON is always the fallback.
+"""
+
+from functools import lru_cache
+import struct
+import uuid
+from typing import Any, Dict, List
+
+from lib.v1.common import WS_Message
+from lib.v2.config import WireFormat
+from lib.v2.delta import EntityDelta, SnapshotDelta, parse_snapshot_delta
+from lib.v2.messages import EntityState, decode_json_message, peek_json_message_type
+from lib.v2.prediction import InputCommand
+
+MAGIC = b"MG"
+WIRE_VERSION = 2
+
+HEADER = struct.Struct("<2sBBIH16s")
+ENTITY = struct.Struct("<16sB4hI")
+INPUT = struct.Struct("<2sBBIBbbB")
+DELTA_HEADER = struct.Struct("<2sBBIIIHH16s")
+DELTA_ENTITY = struct.Struct("<16sB")
+# Where `input seq` is in `DELTA_HEADER`
+DELTA_INPUT_SEQ_OFFSET = struct.calcsize("<2sBBII")
+UUID = struct.Struct("<16s")
+SEQ = struct.Struct("<I")
+ACK = struct.Struct("<2sBBI")
+
+# Fields of a changed entity in a delta, in the order they are packed
+DELTA_CLASS = 1
+DELTA_POSITION = 2
+DELTA_SIZE = 4
+CLASS_CODE = struct.Struct("<B")
+PAIR = struct.Struct("<2h")
+
+MESSAGE_TYPE_CODES: Dict[str, int] = {
+    "SERVER_POSITION_V2": 1,
+    "CLIENT_POSITION_V2": 2,
+}
+MESSAGE_TYPE_NAMES: Dict[int, str] = {v: k for k, v in MESSAGE_TYPE_CODES.items()}
+INPUT_TYPE_CODE = 3
+DELTA_TYPE_CODE = 4
+ACK_TYPE_CODE = 5
+
+CLASS_NAME_CODES: Dict[str, int] = {
+    "Player": 1,
+}
+CLASS_NAMES: Dict[int, str] = {v: k for k, v in CLASS_NAME_CODES.items()}
+
+
+@lru_cache(maxsize=4096)
+def uuid_bytes(id: str) -> bytes:
+    """
+    Parsing UUID strings is most of the encoding time and the same few
+    ids are in every snapshot, so they are cached.
+    """
+    return uuid.UUID(id).bytes
+
+
+@lru_cache(maxsize=4096)
+def uuid_str(raw: bytes) -> str:
+    return str(uuid.UUID(bytes=raw))
+
+
+def _entity_fields(item: Dict[str, Any] | EntityState):
+    if isinstance(item, dict):
+        return (
+            item["id"],
+            item["class_name"],
+            item["rect"],
+            item.get("last_input_seq"),
+        )
+    return item
+
+
+def encode_snapshot(message: WS_Message) -> bytes:
+    """
+    Pack a position message into the binary layout.  Raises a
+    `ValueError` if the message can't be represented, such as a non
+    position message type, an unknown class name or an id that is not
+    a UUID.  Callers should fall back to JSON in that case.
+    """
+    type_code = MESSAGE_TYPE_CODES.get(message.message_type)
+    if type_code is None:
+        raise ValueError(f"No binary layout for '{message.message_type}'")
+
+    body = message.body
+    buffer = bytearray(HEADER.size + len(body) * ENTITY.size)
+    HEADER.pack_into(
+        buffer,
+        0,
+        MAGIC,
+        WIRE_VERSION,
+        type_code,
+        message.tick or 0,
+        len(body),
+        uuid_bytes(message.player_session_uuid),
+    )
+
+    offset = HEADER.size
+    for item in body:
+        id, class_name, rect, last_input_seq = _entity_fields(item)
+        class_code = CLASS_NAME_CODES.get(class_name)
+        if class_code is None:
+            raise ValueError(f"No binary class code for '{class_name}'")
+        try:
+            ENTITY.pack_into(
+                buffer,
+                offset,
+                uuid_bytes(id),
+                class_code,
+                *rect,
+                last_input_seq or 0,
+            )
+        except struct.error as e:
+            raise ValueError(f"Unable to pack entity '{id}': {e}") from e
+        offset += ENTITY.size
+    return bytes(buffer)
+
+
+def decode_snapshot(data: bytes | bytearray | memoryview) -> WS_Message:
+    """
+    Unpack a binary position message.  Validation is skipped when
+    building the `WS_Message` because the fixed layout already
+    guarantees the field types.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("Binary frame is shorter than the header")
+
+    magic, version, type_code, tick, count, sender = HEADER.unpack_from(view)
+    if magic != MAGIC or version != WIRE_VERSION:
+        raise ValueError(f"Unsupported binary frame {magic!r} v{version}")
+    if type_code not in MESSAGE_TYPE_NAMES:
+        raise ValueError(f"Unknown binary message type {type_code}")
+
+    end = HEADER.size + count * ENTITY.size
+    if len(view) < end:
+        raise ValueError("Binary frame is shorter than its entity count")
+
+    body: List[EntityState] = [
+        EntityState(
+            uuid_str(raw_id),
+            CLASS_NAMES.get(class_code, "Unknown"),
+            (x, y, w, h),
+            last_input_seq or None,
+        )
+        for raw_id, class_code, x, y, w, h, last_input_seq in ENTITY.iter_unpack(
+            view[HEADER.size : end]
+        )
+    ]
+    return WS_Message.model_construct(
+        player_session_uuid=uuid_str(sender),
+        message_type=MESSAGE_TYPE_NAMES[type_code],
+        body=body,
+        tick=tick,
+    )
+
+
+def encode_delta(message: WS_Message) -> bytes:
+    """
+    Pack a `SERVER_DELTA_V2` message, its body can be the dict made by
+    `diff_states()` or a `SnapshotDelta`.  Raises a `ValueError` if it
+    can't be represented, like `encode_snapshot()`.
+    """
+    delta = parse_snapshot_delta(message.body)
+    try:
+        parts = [
+            DELTA_HEADER.pack(
+                MAGIC,
+                WIRE_VERSION,
+                DELTA_TYPE_CODE,
+                message.tick or 0,
+                delta.baseline_tick,
+                delta.input_seq or 0,
+                len(delta.changed),
+                len(delta.removed),
+                uuid_bytes(message.player_session_uuid),
+            )
+        ]
+        for entity in delta.changed:
+            fields = 0
+            packed = []
+            if entity.class_name is not None:
+                class_code = CLASS_NAME_CODES.get(entity.class_name)
+                if class_code is None:
+                    raise ValueError(f"No binary class code for '{entity.class_name}'")
+                fields |= DELTA_CLASS
+                packed.append(CLASS_CODE.pack(class_code))
+            if entity.position is not None:
+                fields |= DELTA_POSITION
+                packed.append(PAIR.pack(*entity.position))
+            if entity.size is not None:
+                fields |= DELTA_SIZE
+                packed.append(PAIR.pack(*entity.size))
+            parts.append(DELTA_ENTITY.pack(uuid_bytes(entity.id), fields))
+            parts.extend(packed)
+        parts.extend(uuid_bytes(id) for id in delta.removed)
+    except struct.error as e:
+        raise ValueError(f"Unable to pack delta: {e}") from e
+    return b"".join(parts)
+
+
+def decode_delta(data: bytes | bytearray | memoryview) -> WS_Message:
+    """Unpack a binary `SERVER_DELTA_V2` message into a `SnapshotDelta`."""
+    view = memoryview(data)
+    if len(view) < DELTA_HEADER.size:
+        raise ValueError("Binary delta is shorter than the header")
+    (
+        magic,
+        version,
+        type_code,
+        tick,
+        baseline_tick,
+        input_seq,
+        changed_count,
+        removed_count,
+        sender,
+    ) = DELTA_HEADER.unpack_from(view)
+    if magic != MAGIC or version != WIRE_VERSION or type_code != DELTA_TYPE_CODE:
+        raise ValueError(f"Unsupported binary delta {magic!r} v{version}")
+
+    offset = DELTA_HEADER.size
+    changed: List[EntityDelta] = []
+    try:
+        for _ in range(changed_count):
+            raw_id, fields = DELTA_ENTITY.unpack_from(view, offset)
+            offset += DELTA_ENTITY.size
+            class_name = position = size = None
+            if fields & DELTA_CLASS:
+                class_name = CLASS_NAMES.get(view[offset], "Unknown")
+                offset += CLASS_CODE.size
+            if fields & DELTA_POSITION:
+                position = PAIR.unpack_from(view, offset)
+                offset += PAIR.size
+            if fields & DELTA_SIZE:
+                size = PAIR.unpack_from(view, offset)
+                offset += PAIR.size
+            changed.append(EntityDelta(uuid_str(raw_id), class_name, position, size))
+        removed = [
+            uuid_str(raw_id)
+            for (raw_id,) in UUID.iter_unpack(
+                view[offset : offset + removed_count * UUID.size]
+            )
+        ]
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Binary delta is too short: {e}") from e
+    if len(removed) != removed_count:
+        raise ValueError("Binary delta is shorter than its removed count")
+
+    return WS_Message.model_construct(
+        player_session_uuid=uuid_str(sender),
+        message_type="SERVER_DELTA_V2",
+        body=SnapshotDelta(baseline_tick, changed, removed, input_seq or None),
+        tick=tick,
+    )
+
+
+def with_input_seq(data: bytes, input_seq: int | None) -> bytes:
+    """
+    A copy of the binary delta `data` for the player whose last input
+    was `input_seq`, so the rest of it can be shared between players.
+    """
+    offset = DELTA_INPUT_SEQ_OFFSET
+    return data[:offset] + SEQ.pack(input_seq or 0) + data[offset + SEQ.size :]
+
+
+def encode_ack(message: WS_Message) -> bytes:
+    """Pack a `CLIENT_ACK_V2` message, the acknowledged tick is its `tick`."""
+    try:
+        return ACK.pack(MAGIC, WIRE_VERSION, ACK_TYPE_CODE, message.tick)
+    except struct.error as e:
+        raise ValueError(f"Unable to pack ack: {e}") from e
+
+
+def decode_ack(data: bytes | bytearray | memoryview) -> WS_Message:
+    """The sender is left empty like in `decode_input()`."""
+    if len(data) < ACK.size:
+        raise ValueError("Binary ack frame is too short")
+    magic, version, type_code, tick = ACK.unpack_from(data)
+    if magic != MAGIC or version != WIRE_VERSION or type_code != ACK_TYPE_CODE:
+        raise ValueError(f"Unsupported binary ack {magic!r} v{version}")
+    return WS_Message.model_construct(
+        player_session_uuid="", message_type="CLIENT_ACK_V2", body="", tick=tick
+    )
+
+
+def encode_input(message: WS_Message) -> bytes:
+    """
+    Pack a `CLIENT_INPUT_V2` message.  Raises a `ValueError` if the
+    body isn't a valid input command.
+    """
+    try:
+        command = message.body
+        if not isinstance(command, InputCommand):
+            command = InputCommand.from_body(command)
+        return INPUT.pack(
+            MAGIC,
+            WIRE_VERSION,
+            INPUT_TYPE_CODE,
+            command.seq,
+            command.buttons,
+            round(command.axis_x * 127),
+            round(command.axis_y * 127),
+            round(command.dt * 1000),
+        )
+    except (TypeError, ValueError, struct.error) as e:
+        raise ValueError(f"Unable to pack input: {e}") from e
+
+
+def decode_input(data: bytes | bytearray | memoryview) -> WS_Message:
+    """
+    Unpack a binary input message.  The sender is left empty, the
+    server fills it in from the connection the frame arrived on.
+    """
+    if len(data) < INPUT.size:
+        raise ValueError("Binary input frame is too short")
+    magic, version, type_code, seq, buttons, axis_x, axis_y, dt_ms = INPUT.unpack_from(
+        data
+    )
+    if magic != MAGIC or version != WIRE_VERSION or type_code != INPUT_TYPE_CODE:
+        raise ValueError(f"Unsupported binary input {magic!r} v{version}")
+    # Checked and clamped the same way as JSON inputs
+    command = InputCommand.from_body(
+        (seq, buttons, axis_x / 127, axis_y / 127, dt_ms / 1000)
+    )
+    return WS_Message.model_construct(
+        player_session_uuid="",
+        message_type="CLIENT_INPUT_V2",
+        body=command,
+        tick=seq,
+    )
+
+
+# Every binary message type, by the code in its fourth byte
+BINARY_TYPE_NAMES: Dict[int, str] = {
+    **MESSAGE_TYPE_NAMES,
+    INPUT_TYPE_CODE: "CLIENT_INPUT_V2",
+    DELTA_TYPE_CODE: "SERVER_DELTA_V2",
+    ACK_TYPE_CODE: "CLIENT_ACK_V2",
+}
+BINARY_DECODERS = {
+    INPUT_TYPE_CODE: decode_input,
+    DELTA_TYPE_CODE: decode_delta,
+    ACK_TYPE_CODE: decode_ack,
+}
+
+
+def parse_wire_format(value: str | None) -> WireFormat:
+    """Unknown or missing values fall back to JSON."""
+    try:
+        return WireFormat((value or "").lower())
+    except ValueError:
+        return WireFormat.JSON
+
+
+def encode_ws_message(message: WS_Message, wire_format: WireFormat) -> str | bytes:
+    """
+    Encode a message for a connection using `wire_format`.  Returns
+    `bytes` for binary frames and `str` for JSON text frames.
+    """
+    if wire_format is WireFormat.BINARY:
+        try:
+            if message.message_type in MESSAGE_TYPE_CODES:
+                return encode_snapshot(message)
+            if message.message_type == "CLIENT_INPUT_V2":
+                return encode_input(message)
+            if message.message_type == "SERVER_DELTA_V2":
+                return encode_delta(message)
+            if message.message_type == "CLIENT_ACK_V2":
+                return encode_ack(message)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return message.model_dump_json()
+
+
+def peek_message_type(data: str | bytes) -> str | None:
+    """
+    Message type of a binary or JSON text frame without decoding it, see
+    `peek_json_message_type()`.
+    """
+    if isinstance(data, str):
+        return peek_json_message_type(data)
+    if len(data) < 4 or data[:2] != MAGIC:
+        return None
+    return BINARY_TYPE_NAMES.get(data[3])
+
+
+def decode_ws_message(data: str | bytes) -> WS_Message:
+    """Decode either a binary or a JSON text frame."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        decode = BINARY_DECODERS.get(data[3] if len(data) > 3 else None)
+        return (decode or decode_snapshot)(data)
+    return decode_json_message(data)
@@ -0,0 +1,116 @@
+"""
+Per connection fan-out for the websocket servers.
+
+Broadcasting used to `await send_text()` on every connection one after
+the other, so a single slow client (a phone on a bad connection for
+example) held up every other client and the game loop's out queue.
+
+Now every connection gets a `ConnectionSender` which owns a bounded
+queue of outbound frames and a writer task that drains it.  Broadcasting
+only appends the same pre-encoded frame to every queue, so it never
+waits on the network.  When a queue is full the overflow policy of the
+frames decides what happens:
+
+- `DROP_OLDEST`: for frames that are replaced by newer ones anyways,
+  like position snapshots.  The oldest droppable frame gets dropped.
+- `NEVER_DROP`: for events clients must see, like disconnects.  These
+  are always queued, even past the bound, since they are rare.
+"""
+
+import asyncio
+from collections import deque
+from enum import Enum
+import logging
+from typing import Deque, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE_SIZE = 32
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    NEVER_DROP = "never_drop"
+
+
+class ConnectionSender:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        player_session_uuid: str,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+    ):
+        self.websocket = websocket
+        self.player_session_uuid = player_session_uuid
+        self.max_queue_size = max_queue_size
+        self.closed = False
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped_frames = 0
+        self.send_failures = 0
+        self._frames: Deque[Tuple[str | bytes, OverflowPolicy]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+
+    def stop(self):
+        self.closed = True
+        self._frames.clear()
+        if self._task:
+            self._task.cancel()
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def enqueue(
+        self, data: str | bytes, policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    ) -> bool:
+        """
+        Queue a frame to be sent, returns False if the frame was dropped
+        instead.  Never waits, so it is safe to call from the game loop.
+        """
+        if self.closed:
+            return False
+        if len(self._frames) >= self.max_queue_size and not self._drop_oldest():
+            # Queue is full of frames that can't be dropped
+            if policy is OverflowPolicy.DROP_OLDEST:
+                self.dropped_frames += 1
+                return False
+        self._frames.append((data, policy))
+        self._wakeup.set()
+        return True
+
+    def _drop_oldest(self) -> bool:
+        for i, (_, policy) in enumerate(self._frames):
+            if policy is OverflowPolicy.DROP_OLDEST:
+                del self._frames[i]
+                self.dropped_frames += 1
+                return True
+        return False
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self._frames:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                data, _ = self._frames.popleft()
+                if isinstance(data, bytes):
+                    await self.websocket.send_bytes(data)
+                else:
+                    await self.websocket.send_text(data)
+                self.sent_frames += 1
+                self.sent_bytes += len(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The receive loop for this connection will see the
+            # disconnect and clean up, just stop sending to it here.
+            self.send_failures += 1
+            self.closed = True
+            self._frames.clear()
+            logger.info(f"Stopped sending to {self.player_session_uuid}: {e!r}")
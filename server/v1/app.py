@@ -44,6 +44,7 @@ from lib.data_structures import Point
 from datetime import datetime, timezone
 
 from server.v1.async_simple_game_event_queue import async_simple_game_function_event
+from server.fan_out import ConnectionSender, OverflowPolicy
 
 
 logger = logging.getLogger(__name__)
@@ -58,13 +59,15 @@ logging.basicConfig(
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: dict[WebSocket, ConnectionSender] = {}
         self.active_player_uuids: set[str] = set()
         self.network_event_io_queue = asyncio.Queue()
 
     async def connect(self, websocket: WebSocket, player_session_uuid: str):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        sender = ConnectionSender(websocket, player_session_uuid)
+        sender.start()
+        self.active_connections[websocket] = sender
         self.active_player_uuids.add(player_session_uuid)
 
     def disconnect(self, websocket: WebSocket, player_session_uuid: str):
@@ -74,24 +77,19 @@ class ConnectionManager:
             body="",
         )
         self.network_event_io_queue.put_nowait(ws_disconnect_msg)
-        self.active_connections.remove(websocket)
+        self.active_connections.pop(websocket).stop()
         self.active_player_uuids.remove(player_session_uuid)
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    def send_personal_message(self, message: str, websocket: WebSocket):
+        self.active_connections[websocket].enqueue(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            # If a disconnect exception gets raised when broadcasting,
-            # catch it and log it, so the right client will be disconnected,
-            # not any that happens to get this error when trying to
-            # broadcast a message to all clients and disconnected the
-            # client that gets this error caught, who still has an open
-            # websocket connection.
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.exception(e)
+    def broadcast(
+        self, message: str, policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    ):
+        # Only queues the message, each connection's writer task sends
+        # it.  See `server/fan_out.py`.
+        for sender in self.active_connections.values():
+            sender.enqueue(message, policy)
 
 
 manager = ConnectionManager()
@@ -258,8 +256,8 @@ async def websocket_endpoint(websocket: WebSocket, player_session_uuid: str):
                 manager.network_event_io_queue.put_nowait(ws_msg)
 
             # Send out this info for debugging
-            await manager.send_personal_message(f"You wrote: {data}", websocket)
-            await manager.broadcast(f"Client {player_session_uuid} says: {data}")
+            manager.send_personal_message(f"You wrote: {data}", websocket)
+            manager.broadcast(f"Client {player_session_uuid} says: {data}")
 
             while not manager.network_event_io_queue.empty():
                 message: WS_Message = await manager.network_event_io_queue.get()
@@ -271,13 +269,15 @@ async def websocket_endpoint(websocket: WebSocket, player_session_uuid: str):
                     message.message_type == "CLIENT_POSITION_V1"
                     and message.player_session_uuid in manager.active_player_uuids
                 ):
-                    await manager.broadcast(message.model_dump_json())
+                    manager.broadcast(message.model_dump_json())
                 if message.message_type == "CLIENT_DISCONNECTED_FROM_SERVER_V2":
-                    await manager.broadcast(message.model_dump_json())
+                    manager.broadcast(
+                        message.model_dump_json(), OverflowPolicy.NEVER_DROP
+                    )
 
     except WebSocketDisconnect:
         manager.disconnect(websocket, player_session_uuid)
-        await manager.broadcast(f"Client {player_session_uuid} left the chat")
+        manager.broadcast(f"Client {player_session_uuid} left the chat")
 
 
 async def start_uvicorn_server():
@@ -2,8 +2,9 @@ import ast
 import sys
 import pygame
 import asyncio
-from game_assets.interface import get_intro_image_path
+from lib.assets import ASSETS
 from lib.v1.common import WS_Message
+from lib.text_cache import render_text
 
 
 async def async_simple_game_function_event(
@@ -26,7 +27,7 @@ async def async_simple_game_function_event(
     font = pygame.font.SysFont(default_font_name, 40)
     small_font = pygame.font.SysFont(default_font_name, 24)
 
-    ball = pygame.image.load(get_intro_image_path())
+    ball = ASSETS.image("intro_ball.gif")
 
     ball_rect_player_dict = {}
 
@@ -72,7 +73,7 @@ async def async_simple_game_function_event(
         # UPDATE
         cur_fps = round(clock.get_fps())
 
-        text_surface_fps = font.render(f"FPS: {cur_fps}", False, "yellow")
+        text_surface_fps = render_text(font, f"FPS: {cur_fps}", False, "yellow")
 
         screen.fill("lightblue")
 
@@ -80,8 +81,8 @@ async def async_simple_game_function_event(
 
         for player_session_uuid, ball_rect in ball_rect_player_dict.items():
             screen.blit(ball, ball_rect)
-            player_id_text_surface = small_font.render(
-                f"{player_session_uuid}", False, "pink"
+            player_id_text_surface = render_text(
+                small_font, f"{player_session_uuid}", False, "pink"
             )
             screen.blit(player_id_text_surface, ball_rect)
 
@@ -20,18 +20,42 @@ from contextlib import asynccontextmanager
 import os
 import sys
 from typing import Dict
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import PlainTextResponse
 import uuid
 import logging
 
 import uvicorn
 
-from lib.v1.common import PlayerInfo, WS_Message, parse_WS_Message
-from lib.v2.config import TEST_HOST, TEST_PORT, FullPath
+from lib.v1.common import PlayerInfo
+from lib.v2.config import (
+    DEFAULT_ROOM_ID,
+    MAX_ROOMS,
+    METRICS_PATH,
+    ROOM_IDLE_TIMEOUT,
+    SERVER_TICK_RATE,
+    TEST_HOST,
+    TEST_PORT,
+    FullPath,
+    WireFormat,
+)
+from lib.v2.wire import (
+    decode_ws_message,
+    parse_wire_format,
+    peek_message_type,
+)
 from lib.data_structures import Point
 from datetime import datetime, timezone
 
-from lib.v2.game_simple import NetworkClient, create_game
+from lib.v2.metrics import CONTENT_TYPE
+from server.v2.metrics import (
+    BYTES_IN,
+    MESSAGES_IN,
+    REGISTRY,
+    message_type_label,
+    register_room_metrics,
+)
+from server.v2.rooms import Room, RoomManager, import_game_module
 
 
 logger = logging.getLogger(__name__)
@@ -43,49 +67,30 @@ logging.basicConfig(
     datefmt="%m/%d/%Y %I:%M:%S %p",
 )
 
-NETWORK_CLIENT = NetworkClient()
-
+# Messages from clients that get passed on to the game
+GAME_MESSAGE_TYPES = {"CLIENT_POSITION_V2", "CLIENT_INPUT_V2"}
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-        self.active_player_uuids: set[str] = set()
-        self.game_network_client = NETWORK_CLIENT
 
-    async def connect(self, websocket: WebSocket, player_session_uuid: str):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        self.active_player_uuids.add(player_session_uuid)
-
-    def disconnect(self, websocket: WebSocket, player_session_uuid: str):
-        ws_disconnect_msg = WS_Message(
-            player_session_uuid=player_session_uuid,
-            message_type="CLIENT_DISCONNECTED_FROM_SERVER_V2",
-            body="",
-        )
-        self.game_network_client.in_queue.put_nowait(ws_disconnect_msg)
-        self.game_network_client.out_queue.put_nowait(ws_disconnect_msg)
-        self.active_connections.remove(websocket)
-        self.active_player_uuids.remove(player_session_uuid)
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            # If a disconnect exception gets raised when broadcasting,
-            # catch it and log it, so the right client will be disconnected,
-            # not any that happens to get this error when trying to
-            # broadcast a message to all clients and disconnected the
-            # client that gets this error caught, who still has an open
-            # websocket connection.
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.exception(e)
-
-
-manager = ConnectionManager()
+async def receive_frame(websocket: WebSocket) -> str | bytes:
+    """
+    Like `websocket.receive_text()`, but also allows binary frames from
+    clients using the binary wire format.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+
+ROOMS = RoomManager(
+    tick_rate=int(os.environ.get("SERVER_TICK_RATE", SERVER_TICK_RATE)),
+    max_rooms=int(os.environ.get("MAX_ROOMS", MAX_ROOMS)),
+    idle_timeout=float(os.environ.get("ROOM_IDLE_TIMEOUT", ROOM_IDLE_TIMEOUT)),
+    debug_view_every_n_ticks=int(os.environ.get("DEBUG_VIEW_EVERY_N_TICKS", 0)),
+)
+register_room_metrics(ROOMS)
 
 # For keeping track of players on server
 ALL_PLAYERS: Dict[str, PlayerInfo] = {}
@@ -98,16 +103,6 @@ def get_now_utc() -> float:
     return datetime.now(timezone.utc).timestamp()
 
 
-async def async_main_server():
-    os.environ["IS_SERVER_MODE"] = "TRUE"
-    game = create_game()
-    game.network_client = NETWORK_CLIENT
-
-    while game.running:
-        game.update()
-        await asyncio.sleep(0)
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -124,13 +119,21 @@ async def lifespan(app: FastAPI):
     # the logic to pygame and back.  I think I will send events to
     # PyGame from the server as if it was another client that cannot
     # play at some point.
-    task = asyncio.create_task(async_main_server())
+    # Workers of `server/v2/supervisor.py` that don't own the default
+    # room never get its players
+    if os.environ.get("START_DEFAULT_ROOM", "true").lower() == "true":
+        ROOMS.join(DEFAULT_ROOM_ID)
+        import_game = None
+    else:
+        import_game = asyncio.create_task(import_game_module())
 
     yield
 
+    if import_game:
+        await import_game
+
     logger.info("lifespan closing!")
-    task.cancel()
-    await asyncio.gather(task, return_exceptions=True)
+    await ROOMS.close_all()
 
     # Docs: https://docs.python.org/3/library/threading.html#thread-objects
 
@@ -147,32 +150,117 @@ async def read_root():
     return {"hello": "world"}
 
 
+@app.get(METRICS_PATH, response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get(FullPath.ROOMS.value)
+async def list_rooms():
+    return {
+        room.id: {"players": room.player_count, "ticks": room.scheduler.stats.ticks}
+        for room in ROOMS.rooms.values()
+    }
+
+
+def get_room(room_id: str) -> Room:
+    if room_id not in ROOMS.rooms:
+        raise HTTPException(status_code=404, detail=f"No room '{room_id}'")
+    return ROOMS.rooms[room_id]
+
+
+@app.get(FullPath.DEBUG_TICKS.value)
+async def debug_ticks(room_id: str = DEFAULT_ROOM_ID):
+    """Per phase percentiles and histograms of the recent ticks."""
+    return get_room(room_id).profiler.summary()
+
+
+@app.get(FullPath.DEBUG_TICK_TRACE.value)
+async def debug_tick_trace(room_id: str = DEFAULT_ROOM_ID):
+    """
+    Recent ticks in Chrome trace event format, save it and open it in
+    `chrome://tracing` or https://ui.perfetto.dev
+    """
+    return get_room(room_id).profiler.chrome_trace()
+
+
 @app.websocket(FullPath.WS.value)
-async def websocket_endpoint(websocket: WebSocket, player_session_uuid: str):
-    global manager
-    await manager.connect(websocket, player_session_uuid)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    player_session_uuid: str,
+    wire_format: str = WireFormat.JSON.value,
+):
+    await play_in_room(websocket, DEFAULT_ROOM_ID, player_session_uuid, wire_format)
+
+
+@app.websocket(FullPath.ROOM_WS.value)
+async def room_websocket_endpoint(
+    websocket: WebSocket,
+    room_id: str,
+    player_session_uuid: str,
+    wire_format: str = WireFormat.JSON.value,
+):
+    await play_in_room(websocket, room_id, player_session_uuid, wire_format)
+
+
+async def play_in_room(
+    websocket: WebSocket, room_id: str, player_session_uuid: str, wire_format: str
+):
+    try:
+        room = ROOMS.join(room_id)
+    except ValueError as e:
+        logger.warning(f"Refusing {player_session_uuid}: {e}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+    manager = room.connections
     try:
+        await manager.connect(
+            websocket, player_session_uuid, parse_wire_format(wire_format)
+        )
         while True:
-            data = await websocket.receive_text()
-            ws_msg = parse_WS_Message(data)
-            if ws_msg.message_type == "CLIENT_POSITION_V2":
-                manager.game_network_client.in_queue.put_nowait(ws_msg)
-
-            # This is currently the only way the disconnect exceptions get
-            # thrown to disconnect a client.  Well websocket.receive_text()
-            # might also raise the exeption too.  It could be worth
-            # cleaning up.
-            await manager.send_personal_message(f"You wrote: {data}", websocket)
-
-            # Send out this info for debugging
-            await manager.broadcast(f"Client {player_session_uuid} says: {data}")
-
-            while not manager.game_network_client.out_queue.empty():
-                message: WS_Message = await manager.game_network_client.out_queue.get()
-                await manager.broadcast(message.model_dump_json())
+            data = await receive_frame(websocket)
+            message_type = peek_message_type(data)
+            label = message_type_label(message_type)
+            MESSAGES_IN.inc(label)
+            BYTES_IN.inc(label, amount=len(data))
+            if message_type == "CLIENT_ACK_V2":
+                try:
+                    ack = decode_ws_message(data)
+                except ValueError as e:
+                    logger.warning(f"Dropping bad ack from {player_session_uuid}: {e}")
+                    continue
+                if ack.message_type == "CLIENT_ACK_V2" and ack.tick is not None:
+                    manager.acknowledge(websocket, ack.tick)
+                continue
+            # Only game messages are worth decoding, the rest is echoed
+            if message_type in GAME_MESSAGE_TYPES:
+                try:
+                    ws_msg = decode_ws_message(data)
+                except ValueError as e:
+                    logger.warning(
+                        f"Dropping bad frame from {player_session_uuid}: {e}"
+                    )
+                    continue
+                if ws_msg.message_type in GAME_MESSAGE_TYPES:
+                    # Clients can only send messages for their own player
+                    ws_msg.player_session_uuid = player_session_uuid
+                    manager.game_network_client.in_queue.put_nowait(ws_msg)
+                    continue
+            if isinstance(data, str):
+                # Send out this info for debugging.  Disconnects are
+                # raised by `receive_frame()`, failed sends only stop
+                # the writer task of that connection.
+                manager.send_personal_message(f"You wrote: {data}", websocket)
+                manager.broadcast(f"Client {player_session_uuid} says: {data}")
     except WebSocketDisconnect:
-        manager.disconnect(websocket, player_session_uuid)
-        await manager.broadcast(f"Client {player_session_uuid} left the chat")
+        pass
+    finally:
+        # Also when the connection broke some other way or the server
+        # shuts down, or the player stays in the room forever
+        if websocket in manager.active_connections:
+            manager.disconnect(websocket, player_session_uuid)
+            manager.broadcast(f"Client {player_session_uuid} left the chat")
+        ROOMS.leave(room)
 
 
 async def start_uvicorn_server():
@@ -0,0 +1,145 @@
+"""
+Metrics of the v2 server, served in the Prometheus text format at
+`/metrics` by `server/v2/app.py`.  See `lib/v2/metrics.py`.
+"""
+
+from typing import Dict, Tuple
+
+from lib.v2.metrics import MetricsRegistry
+
+REGISTRY = MetricsRegistry()
+
+# Message types come from clients, anything else is counted as "OTHER"
+# so a client can't create unlimited label values.
+KNOWN_MESSAGE_TYPES = {
+    "SERVER_POSITION_V2",
+    "CLIENT_POSITION_V2",
+    "CLIENT_INPUT_V2",
+    "SERVER_DELTA_V2",
+    "CLIENT_ACK_V2",
+    "CLIENT_DISCONNECTED_FROM_SERVER_V2",
+}
+
+MESSAGES_IN = REGISTRY.counter(
+    "game_messages_received_total",
+    "Frames received from clients",
+    ("message_type",),
+)
+BYTES_IN = REGISTRY.counter(
+    "game_received_bytes_total",
+    "Bytes received from clients",
+    ("message_type",),
+)
+MESSAGES_OUT = REGISTRY.counter(
+    "game_messages_queued_total",
+    "Frames queued to be sent to clients, one per connection",
+    ("message_type",),
+)
+BYTES_OUT = REGISTRY.counter(
+    "game_queued_bytes_total",
+    "Bytes queued to be sent to clients",
+    ("message_type",),
+)
+TICK_DURATION = REGISTRY.histogram(
+    "game_tick_duration_seconds", "Duration of Game.update() on the server"
+)
+BROADCAST_DURATION = REGISTRY.histogram(
+    "game_broadcast_duration_seconds",
+    "Time to encode a game message and queue it on every connection",
+)
+
+
+def message_type_label(message_type: str | None) -> str:
+    if message_type is None:
+        # Debug text
+        return "TEXT"
+    return message_type if message_type in KNOWN_MESSAGE_TYPES else "OTHER"
+
+
+def register_room_metrics(rooms):
+    """
+    Gauges and counters read from a `RoomManager` when `/metrics` is
+    requested, summed over all rooms.
+    """
+
+    def total(get_value) -> float:
+        return sum(get_value(room) for room in list(rooms.rooms.values()))
+
+    def queue_depths() -> Dict[Tuple[str, ...], float]:
+        return {
+            ("in",): total(lambda room: room.network_client.in_queue.qsize()),
+            ("out",): total(lambda room: room.network_client.out_queue.qsize()),
+        }
+
+    def queue_totals(attribute: str):
+        return lambda: {
+            ("in",): rooms.queue_total("in_queue", attribute),
+            ("out",): rooms.queue_total("out_queue", attribute),
+        }
+
+    def sender_totals(attribute: str):
+        return lambda: rooms.sender_total(attribute)
+
+    REGISTRY.gauge(
+        "game_rooms",
+        "Rooms with a running game",
+        function=lambda: len(rooms.rooms),
+    )
+    REGISTRY.gauge(
+        "game_active_connections",
+        "Open websocket connections",
+        function=lambda: total(lambda room: room.player_count),
+    )
+    REGISTRY.gauge(
+        "game_active_player_uuids",
+        "Players with an open websocket connection",
+        function=lambda: total(lambda room: len(room.connections.active_player_uuids)),
+    )
+    REGISTRY.gauge(
+        "game_queue_depth",
+        "Messages waiting in the games' network queues",
+        ("queue",),
+        function=queue_depths,
+    )
+    REGISTRY.counter(
+        "game_queue_dropped_total",
+        "Messages dropped from the games' full network queues",
+        ("queue",),
+        function=queue_totals("dropped"),
+    )
+    REGISTRY.counter(
+        "game_queue_coalesced_total",
+        "Messages replaced by a newer one in the games' network queues",
+        ("queue",),
+        function=queue_totals("coalesced"),
+    )
+    REGISTRY.counter(
+        "game_sent_frames_total",
+        "Frames written to websockets",
+        function=sender_totals("sent_frames"),
+    )
+    REGISTRY.counter(
+        "game_sent_bytes_total",
+        "Bytes written to websockets",
+        function=sender_totals("sent_bytes"),
+    )
+    REGISTRY.counter(
+        "game_dropped_frames_total",
+        "Frames dropped because a connection's send queue was full",
+        function=sender_totals("dropped_frames"),
+    )
+    REGISTRY.counter(
+        "game_send_failures_total",
+        "Websocket sends that failed",
+        function=sender_totals("send_failures"),
+    )
+    REGISTRY.gauge(
+        "game_send_queue_depth",
+        "Frames waiting in all connections' send queues",
+        function=lambda: total(
+            lambda room: sum(
+                sender.qsize()
+                for sender in room.connections.active_connections.values()
+            )
+        ),
+    )
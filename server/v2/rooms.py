@@ -0,0 +1,432 @@
+"""
+Rooms let one server process host many small matches instead of one
+shared world.  Every `Room` has its own `Game`, `NetworkClient`,
+connections, tick scheduler and profiler, nothing is shared between
+rooms except the process.
+
+`RoomManager` starts a room when the first player joins it and stops it
+once it has been empty for `idle_timeout` seconds, so a player that
+reconnects right away finds the room as they left it.  The default room
+(`DEFAULT_ROOM_ID`) is always running.
+
+Rooms are headless, they only simulate and send snapshots.  With
+`debug_view_every_n_ticks` the default room opens a window that gets
+drawn every that many ticks.
+"""
+
+import asyncio
+from collections import Counter
+from importlib import import_module
+import logging
+import re
+import time
+from typing import TYPE_CHECKING, Dict, List
+
+from fastapi import WebSocket
+
+from lib.v1.common import WS_Message
+from lib.v2.config import (
+    DEFAULT_ROOM_ID,
+    MAX_ROOMS,
+    ROOM_ID_PATTERN,
+    ROOM_IDLE_TIMEOUT,
+    SERVER_TICK_RATE,
+    WireFormat,
+)
+from lib.v2.delta import DeltaEncoder, diff_states, to_states
+from lib.v2.interest import InterestManager
+from lib.v2.tick_profiler import TickProfiler
+from lib.v2.tick_scheduler import TickScheduler
+from lib.v2.wire import encode_ws_message, with_input_seq
+from server.fan_out import ConnectionSender, OverflowPolicy
+from server.v2.metrics import (
+    BROADCAST_DURATION,
+    BYTES_OUT,
+    MESSAGES_OUT,
+    TICK_DURATION,
+    message_type_label,
+)
+
+# The game pulls in pygame, which is most of the import time of the
+# server.  It is imported with the first room instead, see
+# `import_game_module()`.
+if TYPE_CHECKING:
+    from lib.v2.game_simple import NetworkClient
+
+logger = logging.getLogger(__name__)
+
+# Messages clients must always get, even if their send queue is full.
+RELIABLE_MESSAGE_TYPES = {"CLIENT_DISCONNECTED_FROM_SERVER_V2"}
+
+# `ConnectionSender` counters exported in `/metrics`
+SENDER_STATS = ("sent_frames", "sent_bytes", "dropped_frames", "send_failures")
+# `MessageQueue` counters of the rooms' network clients
+QUEUES = ("in_queue", "out_queue")
+QUEUE_STATS = ("dropped", "coalesced")
+
+
+class ConnectionManager:
+    def __init__(self, network_client: "NetworkClient"):
+        self.active_connections: dict[WebSocket, ConnectionSender] = {}
+        self.active_player_uuids: set[str] = set()
+        self.wire_formats: dict[WebSocket, WireFormat] = {}
+        # Snapshots are only delta compressed for clients that acknowledge
+        # them, see `lib/v2/delta.py`
+        self.delta_encoders: dict[WebSocket, DeltaEncoder] = {}
+        self.game_network_client = network_client
+        # Set from the game when area of interest filtering is enabled
+        self.interest: InterestManager | None = None
+        # Counters of senders that already disconnected, see `sender_total()`
+        self.retired_sender_stats: Counter = Counter()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        player_session_uuid: str,
+        wire_format: WireFormat = WireFormat.JSON,
+    ):
+        await websocket.accept()
+        sender = ConnectionSender(websocket, player_session_uuid)
+        sender.start()
+        self.active_connections[websocket] = sender
+        self.active_player_uuids.add(player_session_uuid)
+        self.wire_formats[websocket] = wire_format
+        self.delta_encoders[websocket] = DeltaEncoder()
+        if self.game_network_client:
+            # The game adds the player right away, not with its first input
+            self.game_network_client.in_queue.put_nowait(
+                WS_Message(
+                    player_session_uuid=player_session_uuid,
+                    message_type="CLIENT_CONNECTED_TO_SERVER_V2",
+                    body="",
+                )
+            )
+
+    def disconnect(self, websocket: WebSocket, player_session_uuid: str):
+        ws_disconnect_msg = WS_Message(
+            player_session_uuid=player_session_uuid,
+            message_type="CLIENT_DISCONNECTED_FROM_SERVER_V2",
+            body="",
+        )
+        self.game_network_client.in_queue.put_nowait(ws_disconnect_msg)
+        self.game_network_client.out_queue.put_nowait(ws_disconnect_msg)
+        sender = self.active_connections.pop(websocket)
+        sender.stop()
+        for attribute in SENDER_STATS:
+            self.retired_sender_stats[attribute] += getattr(sender, attribute)
+        self.active_player_uuids.remove(player_session_uuid)
+        self.wire_formats.pop(websocket, None)
+        self.delta_encoders.pop(websocket, None)
+
+    def acknowledge(self, websocket: WebSocket, tick: int):
+        """A client applied the snapshot of `tick`."""
+        encoder = self.delta_encoders.get(websocket)
+        if encoder:
+            encoder.acknowledge(tick)
+
+    def sender_total(self, attribute: str) -> int:
+        """Sum of a `ConnectionSender` counter over every connection so far."""
+        return self.retired_sender_stats[attribute] + sum(
+            getattr(sender, attribute) for sender in self.active_connections.values()
+        )
+
+    def send_personal_message(self, message: str, websocket: WebSocket):
+        self.active_connections[websocket].enqueue(message)
+        _count_out("TEXT", message)
+
+    def broadcast(
+        self, message: str | bytes, policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    ):
+        """
+        Queue the same frame on every connection.  The writer task of
+        each connection does the actual sending, so a slow client only
+        ever fills up its own queue.  Send errors are handled by the
+        writer so the right client gets disconnected by its own receive
+        loop.
+        """
+        for sender in self.active_connections.values():
+            sender.enqueue(message, policy)
+        _count_out("TEXT", message, len(self.active_connections))
+
+    def broadcast_ws_message(self, message: WS_Message):
+        """
+        Send a game message to every connection in the wire format that
+        connection asked for.  Each format is only encoded once per
+        message, not once per connection.
+        """
+        if message.message_type == "SERVER_POSITION_V2":
+            self._broadcast_snapshot(message)
+            return
+
+        policy = (
+            OverflowPolicy.NEVER_DROP
+            if message.message_type in RELIABLE_MESSAGE_TYPES
+            else OverflowPolicy.DROP_OLDEST
+        )
+        message_type = message_type_label(message.message_type)
+        encoded: dict[WireFormat, str | bytes] = {}
+        for connection, sender in self.active_connections.items():
+            wire_format = self.wire_formats.get(connection, WireFormat.JSON)
+            if wire_format not in encoded:
+                encoded[wire_format] = encode_ws_message(message, wire_format)
+            sender.enqueue(encoded[wire_format], policy)
+            _count_out(message_type, encoded[wire_format])
+
+    def _broadcast_snapshot(self, message: WS_Message):
+        """
+        Every connection gets a delta against the last snapshot it
+        acknowledged, or a full snapshot if it has no usable baseline.
+        With area of interest filtering every connection also gets its
+        own entities, so nothing is shared.  Without it the snapshot is
+        the same for everyone, and connections with the same baseline
+        and wire format share one encoded frame.  Deltas only differ in
+        the last input of the player they are sent to, which is set in
+        the shared binary frame per connection.
+        """
+        tick = message.tick
+        shared_states = None if self.interest else to_states(message.body)
+        bodies: dict[int, dict] = {}
+        frames: dict[tuple, str | bytes] = {}
+        for connection, sender in self.active_connections.items():
+            wire_format = self.wire_formats.get(connection, WireFormat.JSON)
+            encoder = self.delta_encoders.get(connection)
+            baseline = encoder.baseline() if encoder else None
+            if self.interest:
+                body = self.interest.filter_snapshot(
+                    sender.player_session_uuid, message.body
+                )
+                states = to_states(body)
+                key = None
+            else:
+                body = message.body
+                states = shared_states
+                key = (wire_format, baseline)
+
+            delta = None
+            if baseline is not None:
+                delta = bodies.get(baseline) if key else None
+                if delta is None:
+                    delta = diff_states(
+                        baseline, encoder.baseline_states(baseline), states
+                    )
+                    if key:
+                        bodies[baseline] = delta
+
+            data = frames.get(key) if key else None
+            if data is None:
+                if delta is None:
+                    client_message = message.model_copy(update={"body": body})
+                else:
+                    client_message = message.model_copy(
+                        update={"message_type": "SERVER_DELTA_V2", "body": delta}
+                    )
+                data = encode_ws_message(client_message, wire_format)
+                if key:
+                    frames[key] = data
+            if delta is not None:
+                own = states.get(sender.player_session_uuid)
+                if own is not None and own.last_input_seq:
+                    data = _with_input_seq(message, data, delta, own.last_input_seq)
+            if encoder:
+                encoder.record(tick, states, baseline)
+            sender.enqueue(data)
+            _count_out(
+                "SERVER_POSITION_V2" if baseline is None else "SERVER_DELTA_V2",
+                data,
+            )
+
+
+def _with_input_seq(
+    message: WS_Message, data: str | bytes, delta: dict, input_seq: int
+) -> str | bytes:
+    if isinstance(data, bytes):
+        return with_input_seq(data, input_seq)
+    # JSON is the slow path anyways, encode it again
+    return encode_ws_message(
+        message.model_copy(
+            update={
+                "message_type": "SERVER_DELTA_V2",
+                "body": {**delta, "input_seq": input_seq},
+            }
+        ),
+        WireFormat.JSON,
+    )
+
+
+def _count_out(message_type: str, data: str | bytes, connections: int = 1):
+    MESSAGES_OUT.inc(message_type, amount=connections)
+    BYTES_OUT.inc(message_type, amount=len(data) * connections)
+
+
+async def broadcast_worker(
+    network_client: "NetworkClient", connection_manager: ConnectionManager
+):
+    """
+    Pumps messages from the game's out queue to every connection.
+
+    The game puts its snapshots on the out queue as part of each tick,
+    so waiting on the queue here sends them out at the tick rate no
+    matter if clients are sending anything to the server or not.
+    Everything put on the queue during the same tick is sent together.
+    """
+    out_queue = network_client.out_queue
+    while True:
+        message: WS_Message = await out_queue.get()
+        start = time.perf_counter()
+        connection_manager.broadcast_ws_message(message)
+        while not out_queue.empty():
+            connection_manager.broadcast_ws_message(out_queue.get_nowait())
+        BROADCAST_DURATION.observe(time.perf_counter() - start)
+
+
+class Room:
+    def __init__(
+        self,
+        room_id: str,
+        tick_rate: int = SERVER_TICK_RATE,
+        debug_view_every_n_ticks: int = 0,
+    ):
+        from lib.v2.game_simple import UPDATE_PHASES, NetworkClient, create_game
+
+        self.id = room_id
+        self.network_client = NetworkClient()
+        self.connections = ConnectionManager(self.network_client)
+        self.scheduler = TickScheduler(
+            tick_rate=tick_rate, duration_histogram=TICK_DURATION
+        )
+        # Last 10 seconds of ticks at the default tick rate
+        self.profiler = TickProfiler(
+            UPDATE_PHASES, budget=self.scheduler.interval, capacity=600
+        )
+        self.game = create_game(is_server_mode=True, headless=True)
+        if debug_view_every_n_ticks:
+            self.game.attach_debug_view(debug_view_every_n_ticks)
+        self.game.network_client = self.network_client
+        self.game.profiler = self.profiler
+        self.connections.interest = self.game.interest
+        self.tasks: List[asyncio.Task] = []
+
+    @property
+    def player_count(self) -> int:
+        return len(self.connections.active_connections)
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self.scheduler.run(self.game)),
+            asyncio.create_task(
+                broadcast_worker(self.network_client, self.connections)
+            ),
+        ]
+
+    async def stop(self):
+        self.game.running = False
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.scheduler.report()
+        if self.profiler.overruns:
+            logger.info(
+                f"Room {self.id}, slowest phase of overrun ticks: "
+                f"{self.profiler.overrun_phases}"
+            )
+
+
+async def import_game_module():
+    """
+    Imports the game in a thread, for servers that start without a room
+    so the first player doesn't wait for it.
+    """
+    await asyncio.to_thread(import_module, "lib.v2.game_simple")
+
+
+class RoomManager:
+    def __init__(
+        self,
+        max_rooms: int = MAX_ROOMS,
+        idle_timeout: float = ROOM_IDLE_TIMEOUT,
+        tick_rate: int = SERVER_TICK_RATE,
+        debug_view_every_n_ticks: int = 0,
+    ):
+        self.max_rooms = max_rooms
+        self.idle_timeout = idle_timeout
+        self.tick_rate = tick_rate
+        self.debug_view_every_n_ticks = debug_view_every_n_ticks
+        self.rooms: Dict[str, Room] = {}
+        self._idle_timers: Dict[str, asyncio.Task] = {}
+        # Counters of rooms that already closed, see `sender_total()` and
+        # `queue_total()`
+        self.retired_sender_stats: Counter = Counter()
+        self.retired_queue_stats: Counter = Counter()
+
+    def join(self, room_id: str) -> Room:
+        """
+        The room with this id, started if it isn't running yet.  Raises
+        `ValueError` for bad ids or when there are too many rooms.
+        """
+        if not re.fullmatch(ROOM_ID_PATTERN, room_id):
+            raise ValueError(f"Bad room id '{room_id}'")
+        room = self.rooms.get(room_id)
+        if room is None:
+            if len(self.rooms) >= self.max_rooms:
+                raise ValueError(f"Can't open more than {self.max_rooms} rooms")
+            # Only one window per process
+            debug_view = 0
+            if room_id == DEFAULT_ROOM_ID:
+                debug_view = self.debug_view_every_n_ticks
+            room = Room(room_id, self.tick_rate, debug_view)
+            room.start()
+            self.rooms[room_id] = room
+            logger.info(f"Room {room_id} started, {len(self.rooms)} rooms open")
+        timer = self._idle_timers.pop(room_id, None)
+        if timer:
+            timer.cancel()
+        return room
+
+    def leave(self, room: Room):
+        """Call after a player left `room`, empty rooms get closed later."""
+        if room.id == DEFAULT_ROOM_ID or room.player_count:
+            return
+        if room.id not in self._idle_timers:
+            self._idle_timers[room.id] = asyncio.create_task(
+                self._close_when_idle(room)
+            )
+
+    async def _close_when_idle(self, room: Room):
+        await asyncio.sleep(self.idle_timeout)
+        self._idle_timers.pop(room.id, None)
+        if room.player_count == 0 and self.rooms.get(room.id) is room:
+            await self.close(room.id)
+
+    async def close(self, room_id: str):
+        room = self.rooms.pop(room_id)
+        for attribute in SENDER_STATS:
+            self.retired_sender_stats[attribute] += room.connections.sender_total(
+                attribute
+            )
+        for queue in QUEUES:
+            for attribute in QUEUE_STATS:
+                self.retired_queue_stats[queue, attribute] += getattr(
+                    getattr(room.network_client, queue), attribute
+                )
+        await room.stop()
+        logger.info(f"Room {room_id} closed, {len(self.rooms)} rooms open")
+
+    async def close_all(self):
+        for timer in self._idle_timers.values():
+            timer.cancel()
+        self._idle_timers.clear()
+        for room_id in list(self.rooms):
+            await self.close(room_id)
+
+    def sender_total(self, attribute: str) -> int:
+        """Sum of a `ConnectionSender` counter over every room so far."""
+        return self.retired_sender_stats[attribute] + sum(
+            room.connections.sender_total(attribute) for room in self.rooms.values()
+        )
+
+    def queue_total(self, queue: str, attribute: str) -> int:
+        """Sum of a `MessageQueue` counter over every room so far."""
+        return self.retired_queue_stats[queue, attribute] + sum(
+            getattr(getattr(room.network_client, queue), attribute)
+            for room in self.rooms.values()
+        )
@@ -0,0 +1,343 @@
+"""
+Runs the v2 server on more than one core.
+
+One `server/v2/app.py` process runs every room in a single asyncio loop,
+so it can only ever use one core.  The supervisor starts `--workers`
+copies of it (`server/v2/worker.py`) on the ports after `--port` and
+routes players on `--port` itself:
+
+```
+python -m server.v2.supervisor --workers 4 --port 8000
+```
+
+Every room belongs to one worker, picked by hashing the room id (see
+`worker_for_room()`), so no worker needs to know about the others and a
+room always ends up on the same worker, even after it restarts.  The
+router accepts the TCP connection of a player, peeks at the request
+line for the room without reading it and hands the socket itself to the
+room's worker over a unix socket.  The worker does the websocket
+handshake and talks to the player directly, the router never sees a
+frame, it only costs anything when players connect.  With 60 bots in
+6 rooms on 2 workers for 30s (`tools/bot_swarm.py`), the router used
+0.05s of CPU against 7.8s and 11.4s for the workers, relaying the
+frames instead took 9.0s, as much as a worker.  Workers that die are
+started again, the players in their rooms have to reconnect.
+
+Only websockets go to the workers.  `GET /v2/workers` lists the
+workers, use their ports for `/metrics` and the debug endpoints.
+"""
+
+import argparse
+import asyncio
+from http import HTTPStatus
+import json
+import logging
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Set
+from urllib.parse import unquote
+import zlib
+
+from lib.v2.config import DEFAULT_ROOM_ID, TEST_HOST, TEST_PORT, FullPath, RootPath
+from server.v2.worker import send_connection, wait_readable
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    stream=sys.stdout,
+    encoding="utf-8",
+    level=logging.INFO,
+    format="%(asctime)s:%(levelname)s:%(message)s",
+    datefmt="%m/%d/%Y %I:%M:%S %p",
+)
+
+# Seconds between checks for dead workers and the least time between
+# restarts of the same worker
+WORKER_CHECK_INTERVAL = 1.0
+MIN_RESTART_INTERVAL = 5.0
+# Longest wait for the workers to listen before the router opens
+WORKER_START_TIMEOUT = 30.0
+# Longest request head the router looks at and how long it waits for it
+MAX_REQUEST_HEAD = 8192
+REQUEST_HEAD_TIMEOUT = 10.0
+
+_WS_PATH = re.compile(re.escape(RootPath.WS.value) + r"/[^/]+")
+_ROOM_WS_PATH = re.compile(re.escape(RootPath.ROOMS.value) + r"/([^/]+)/ws/[^/]+")
+
+
+def worker_for_room(room_id: str, workers: int) -> int:
+    """
+    Index of the worker that runs `room_id`.  `crc32` instead of `hash()`
+    since string hashes change between processes.
+    """
+    return zlib.crc32(room_id.encode()) % workers
+
+
+def room_for_path(target: str) -> str | None:
+    """
+    Room of a websocket request target like `FullPath.ROOM_WS`, None if
+    it isn't one.
+    """
+    path = target.split("?", 1)[0]
+    if _WS_PATH.fullmatch(path):
+        return DEFAULT_ROOM_ID
+    match = _ROOM_WS_PATH.fullmatch(path)
+    return unquote(match.group(1)) if match else None
+
+
+class Worker:
+    def __init__(self, index: int, port: int, env: dict):
+        self.index = index
+        self.port = port
+        self.env = env
+        self.process: subprocess.Popen | None = None
+        # Our end of the unix socket connections are handed off over
+        self.channel: socket.socket | None = None
+        self.restarts = 0
+        self.started_at = 0.0
+        self.handed_off = 0
+
+    def start(self):
+        self.started_at = time.monotonic()
+        if self.channel:
+            self.channel.close()
+        # SEQPACKET so every handed off socket is a message of its own
+        self.channel, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.channel.setblocking(False)
+        try:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "server.v2.worker",
+                    "--port",
+                    str(self.port),
+                    "--handoff-fd",
+                    str(child.fileno()),
+                ],
+                env=self.env,
+                pass_fds=[child.fileno()],
+            )
+        finally:
+            child.close()
+        logger.info(f"Worker {self.index} started on port {self.port}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+        if self.channel:
+            self.channel.close()
+            self.channel = None
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+
+class Supervisor:
+    def __init__(self, workers: int, base_port: int):
+        if workers <= 0:
+            raise ValueError("`workers` must be positive!")
+        default_worker = worker_for_room(DEFAULT_ROOM_ID, workers)
+        self.workers: List[Worker] = []
+        for i in range(workers):
+            env = dict(os.environ)
+            # Only the owner runs the default room
+            env["START_DEFAULT_ROOM"] = "true" if i == default_worker else "false"
+            self.workers.append(Worker(i, base_port + 1 + i, env))
+
+    def worker_for_room(self, room_id: str) -> Worker:
+        return self.workers[worker_for_room(room_id, len(self.workers))]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def describe(self) -> List[dict]:
+        return [
+            {
+                "index": worker.index,
+                "port": worker.port,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": worker.is_alive(),
+                "restarts": worker.restarts,
+                "handed_off": worker.handed_off,
+            }
+            for worker in self.workers
+        ]
+
+    async def wait_until_listening(self, timeout: float = WORKER_START_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            while time.monotonic() < deadline:
+                try:
+                    _, writer = await asyncio.open_connection(TEST_HOST, worker.port)
+                except OSError:
+                    await asyncio.sleep(0.1)
+                    continue
+                writer.close()
+                await writer.wait_closed()
+                break
+            else:
+                logger.warning(f"Worker {worker.index} isn't listening yet")
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            for worker in self.workers:
+                if worker.is_alive():
+                    continue
+                if time.monotonic() - worker.started_at < MIN_RESTART_INTERVAL:
+                    # Crashing on start up, don't spin
+                    continue
+                logger.warning(
+                    f"Worker {worker.index} exited with "
+                    f"{worker.process.returncode}, restarting it"
+                )
+                worker.restarts += 1
+                worker.start()
+
+
+async def peek_request_line(connection: socket.socket) -> str:
+    """
+    First line of the HTTP request on `connection`, left unread so the
+    worker still gets the whole request.
+    """
+    while True:
+        await wait_readable(connection)
+        try:
+            data = connection.recv(MAX_REQUEST_HEAD, socket.MSG_PEEK)
+        except BlockingIOError:
+            continue
+        if not data:
+            raise ConnectionError("Closed before sending a request")
+        end = data.find(b"\r\n")
+        if end >= 0:
+            return data[:end].decode("latin-1")
+        if len(data) >= MAX_REQUEST_HEAD:
+            raise ValueError("Request line too long")
+        # Only part of it arrived, peeked data stays readable so wait a bit
+        await asyncio.sleep(0.01)
+
+
+class Router:
+    """
+    Accepts players on the supervisor's port and hands their sockets to
+    the worker of their room.
+    """
+
+    def __init__(self, supervisor: Supervisor):
+        self.supervisor = supervisor
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def serve(self, listener: socket.socket):
+        listener.setblocking(False)
+        loop = asyncio.get_running_loop()
+        while True:
+            connection, _ = await loop.sock_accept(listener)
+            task = asyncio.create_task(self.route(connection))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def route(self, connection: socket.socket):
+        # Our copy is closed either way, the worker has its own
+        with connection:
+            try:
+                request_line = await asyncio.wait_for(
+                    peek_request_line(connection), REQUEST_HEAD_TIMEOUT
+                )
+                _, target, _ = request_line.split(" ", 2)
+            except (asyncio.TimeoutError, ValueError, OSError) as e:
+                logger.info(f"Dropping connection without a request: {e}")
+                return
+
+            if target.split("?", 1)[0] == FullPath.WORKERS.value:
+                await self._respond(connection, 200, self.supervisor.describe())
+                return
+            room_id = room_for_path(target)
+            if room_id is None:
+                await self._respond(connection, 404, {"detail": "Not Found"})
+                return
+            worker = self.supervisor.worker_for_room(room_id)
+            if not worker.is_alive() or worker.channel is None:
+                await self._respond(connection, 503, {"detail": "Worker is down"})
+                return
+            try:
+                await send_connection(worker.channel, connection)
+            except OSError as e:
+                logger.warning(f"Handing off to worker {worker.index} failed: {e}")
+                await self._respond(connection, 503, {"detail": "Worker is down"})
+                return
+            worker.handed_off += 1
+
+    async def _respond(self, connection: socket.socket, status: int, body):
+        """Answers a request the router handles itself and closes it."""
+        loop = asyncio.get_running_loop()
+        head = b""
+        try:
+            # Read the request first, closing with unread data resets the
+            # connection before the player gets the response
+            while b"\r\n\r\n" not in head and len(head) < MAX_REQUEST_HEAD:
+                data = await loop.sock_recv(connection, MAX_REQUEST_HEAD)
+                if not data:
+                    return
+                head += data
+            content = json.dumps(body).encode()
+            response = (
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                "content-type: application/json\r\n"
+                f"content-length: {len(content)}\r\n"
+                "connection: close\r\n\r\n"
+            ).encode()
+            await loop.sock_sendall(connection, response + content)
+        except OSError as e:
+            logger.info(f"Couldn't respond: {e}")
+
+
+async def run(supervisor: Supervisor, port: int):
+    listener = socket.create_server((TEST_HOST, port))
+    supervisor.start()
+    await supervisor.wait_until_listening()
+    watcher = asyncio.create_task(supervisor.watch())
+    serving = asyncio.create_task(Router(supervisor).serve(listener))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, serving.cancel)
+    logger.info(f"Routing players on port {port}")
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        watcher.cancel()
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="game server processes, defaults to one per core",
+    )
+    parser.add_argument("--port", type=int, default=TEST_PORT)
+    args = parser.parse_args()
+
+    supervisor = Supervisor(args.workers, args.port)
+    try:
+        asyncio.run(run(supervisor, args.port))
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
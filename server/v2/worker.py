@@ -0,0 +1,131 @@
+"""
+A worker process of `server/v2/supervisor.py`.
+
+It is the normal `server/v2/app.py` served by uvicorn on its own port,
+plus it takes over connections the supervisor's router accepted.  The
+router sends the socket of every connection for one of our rooms over
+the unix socket `--handoff-fd` (see `send_connection()`), before
+reading anything from it.  Here it gets handed to uvicorn as if
+uvicorn had accepted it itself, so the websocket handshake and every
+frame after it only go through this process.
+
+```
+python -m server.v2.worker --port 8001 --handoff-fd 3
+```
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+
+import uvicorn
+
+from lib.v2.config import TEST_HOST
+
+logger = logging.getLogger(__name__)
+
+# Message sent along with every handed off socket
+HANDOFF_MESSAGE = b"C"
+
+
+async def wait_readable(sock: socket.socket):
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+    loop.add_reader(sock, readable.set_result, None)
+    try:
+        await readable
+    finally:
+        loop.remove_reader(sock)
+
+
+async def wait_writable(sock: socket.socket):
+    loop = asyncio.get_running_loop()
+    writable = loop.create_future()
+    loop.add_writer(sock, writable.set_result, None)
+    try:
+        await writable
+    finally:
+        loop.remove_writer(sock)
+
+
+async def send_connection(channel: socket.socket, connection: socket.socket):
+    """
+    Hand `connection` to the worker at the other end of `channel`.
+    Raises an `OSError` if the worker is gone.
+    """
+    while True:
+        try:
+            socket.send_fds(channel, [HANDOFF_MESSAGE], [connection.fileno()])
+            return
+        except BlockingIOError:
+            await wait_writable(channel)
+
+
+class HandoffServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, handoff_fd: int):
+        super().__init__(config)
+        self.channel = socket.socket(fileno=handoff_fd)
+        self.channel.setblocking(False)
+        self.handed_off = 0
+        self._receiver: asyncio.Task | None = None
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if not self.should_exit:
+            self._receiver = asyncio.create_task(self._receive_connections())
+
+    async def shutdown(self, sockets=None):
+        if self._receiver:
+            self._receiver.cancel()
+        await super().shutdown(sockets)
+
+    def _create_protocol(self) -> asyncio.Protocol:
+        # What uvicorn does for the connections it accepts itself
+        config = self.config
+        return config.http_protocol_class(
+            config=config,
+            server_state=self.server_state,
+            app_state=self.lifespan.state,
+        )
+
+    async def _receive_connections(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await wait_readable(self.channel)
+            try:
+                message, fds, _, _ = socket.recv_fds(self.channel, 16, 4)
+            except BlockingIOError:
+                continue
+            if not message:
+                logger.warning("Router closed the handoff socket")
+                return
+            for fd in fds:
+                connection = socket.socket(fileno=fd)
+                connection.setblocking(False)
+                self.handed_off += 1
+                try:
+                    await loop.connect_accepted_socket(
+                        self._create_protocol, connection
+                    )
+                except OSError as e:
+                    # The player left while it was handed over
+                    logger.warning(f"Dropping handed off connection: {e}")
+                    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--handoff-fd", type=int, required=True)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    config = uvicorn.Config(
+        "server.v2.app:app", host=TEST_HOST, port=args.port, log_level=args.log_level
+    )
+    HandoffServer(config, args.handoff_fd).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmarks for `lib/v2/game_simple.py`: the phases of `Game.update()`
+on the server and the sprite (de)serialization at different entity
+counts.
+"""
+
+import pygame as pg
+
+from lib.v1.common import WS_Message
+from lib.v2.game_simple import Game
+from lib.v2.lag_compensation import EntityHistory
+from lib.v2.prediction import BUTTON_RIGHT, InputCommand
+from test.benchmark.runner import benchmark
+from test.helpers import make_game
+
+ENTITY_COUNTS = (10, 100, 1000)
+
+
+def drain_out_queue(game: Game):
+    while game.network_client.has_message_out():
+        game.network_client.out_queue.get_nowait()
+
+
+@benchmark("game.update.server", params=ENTITY_COUNTS)
+def bench_update(count):
+    game = make_game(network_players=count)
+
+    def run():
+        game.update()
+        drain_out_queue(game)
+
+    return run
+
+
+@benchmark("game.update.headless", params=ENTITY_COUNTS)
+def bench_update_headless(count):
+    """What the server runs, see `create_game(headless=True)`."""
+    game = make_game(network_players=count, headless=True)
+
+    def run():
+        game.update()
+        drain_out_queue(game)
+
+    return run
+
+
+@benchmark("game.phase.event_poll")
+def bench_event_poll():
+    make_game()
+    return pg.event.get
+
+
+@benchmark("game.phase.integrate", params=ENTITY_COUNTS)
+def bench_integrate(count):
+    game = make_game(network_players=count)
+    return lambda: game.entity_store.integrate(game.dt, game.bounds)
+
+
+@benchmark("game.phase.sprite_update", params=ENTITY_COUNTS)
+def bench_sprite_update(count):
+    # Client side, where sprites still move themselves
+    game = make_game(is_server_mode=False, network_players=count)
+
+    def run():
+        game.local_game_sprites.update()
+        game.network_game_sprites.update()
+        game.other_game_sprites.update()
+
+    return run
+
+
+@benchmark("game.phase.send_out_data", params=ENTITY_COUNTS)
+def bench_send_out_data(count):
+    game = make_game(network_players=count)
+    game.send_every_n_frames = 1
+
+    def run():
+        game._send_out_data()
+        drain_out_queue(game)
+
+    return run
+
+
+@benchmark("game.phase.receive_inputs", params=ENTITY_COUNTS)
+def bench_receive_inputs(count):
+    """One input from every network player, like a server tick."""
+    game = make_game(network_players=count)
+    game.dt = 1 / 60
+    messages = [
+        WS_Message(
+            player_session_uuid=id,
+            message_type="CLIENT_INPUT_V2",
+            body=InputCommand(0, BUTTON_RIGHT, 1 / 60),
+        )
+        for id in game.network_sprite_lookup
+    ]
+
+    def run():
+        # Inputs that were already applied are skipped, so every run is
+        # the next input and a tick later
+        game.sim_time += game.dt
+        for message in messages:
+            message.body.seq += 1
+            game.network_client.in_queue.put_nowait(message)
+        game._receive_data()
+
+    return run
+
+
+@benchmark("game.phase.render", params=ENTITY_COUNTS)
+def bench_render(count):
+    game = make_game(network_players=count)
+    return game._render_game
+
+
+@benchmark("game.phase.frame_end")
+def bench_frame_end():
+    game = make_game()
+    return game._handle_frame_end
+
+
+@benchmark("game.get_local_sprites_dict", params=ENTITY_COUNTS)
+def bench_get_local_sprites_dict(count):
+    game = make_game(is_server_mode=False)
+    for _ in range(count - 1):
+        game._add_other_local_player()
+    return game.get_local_sprites_dict
+
+
+@benchmark("game.get_network_sprites_dict", params=ENTITY_COUNTS)
+def bench_get_network_sprites_dict(count):
+    game = make_game(network_players=count)
+    return game.get_network_sprites_dict
+
+
+@benchmark("game.get_network_sprites", params=ENTITY_COUNTS)
+def bench_get_network_sprites(count):
+    """Client applying a snapshot of sprites it already knows about."""
+    server = make_game(network_players=count)
+    snapshot = server.get_network_sprites_dict()
+    game = make_game(is_server_mode=False)
+    game.get_network_sprites(snapshot)
+    return lambda: game.get_network_sprites(snapshot)
+
+
+@benchmark("history.record", params=ENTITY_COUNTS)
+def bench_history_record(count):
+    """Recording one tick of `count` players, the history is full."""
+    game = make_game(network_players=count, headless=True)
+    game.history = EntityHistory()
+    for _ in range(game.history.capacity):
+        game._record_history()
+    return game._record_history
+
+
+@benchmark("history.hits", params=ENTITY_COUNTS)
+def bench_history_hits(count):
+    """One shot checked against a tick between two recorded ones."""
+    game = make_game(network_players=count, headless=True)
+    game.history = EntityHistory()
+    for _ in range(game.history.capacity):
+        game._record_history()
+        game.frame_count += 1
+    shot = pg.Rect(640, 360, 4, 4)
+    history = game.history
+    return lambda: history.hits(shot, history.time_of_tick(game.frame_count - 10.5))
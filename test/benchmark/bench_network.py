@@ -0,0 +1,111 @@
+"""
+Benchmarks for message encoding and decoding and for broadcasting
+snapshots to many connections.
+"""
+
+import asyncio
+
+from lib.v1.common import parse_WS_Message
+from lib.v2.config import WireFormat
+from lib.v2.delta import DeltaEncoder
+from lib.v2.game_simple import NetworkClient
+from lib.v2.messages import decode_json_message
+from lib.v2.wire import decode_snapshot, encode_snapshot
+from server.fan_out import ConnectionSender
+from server.v2.rooms import ConnectionManager
+from test.benchmark.runner import benchmark
+from test.helpers import FakeWebSocket, make_snapshot
+
+ENTITY_COUNTS = (10, 100, 1000)
+CONNECTION_COUNTS = (10, 100, 1000)
+
+
+@benchmark("message.model_dump_json", params=ENTITY_COUNTS)
+def bench_model_dump_json(count):
+    return make_snapshot(count).model_dump_json
+
+
+@benchmark("message.parse_WS_Message", params=ENTITY_COUNTS)
+def bench_parse_ws_message(count):
+    data = make_snapshot(count).model_dump_json()
+    return lambda: parse_WS_Message(data)
+
+
+@benchmark("message.decode_json_message", params=ENTITY_COUNTS)
+def bench_decode_json_message(count):
+    data = make_snapshot(count).model_dump_json()
+    return lambda: decode_json_message(data)
+
+
+@benchmark("message.encode_snapshot", params=ENTITY_COUNTS)
+def bench_encode_snapshot(count):
+    message = make_snapshot(count)
+    return lambda: encode_snapshot(message)
+
+
+@benchmark("message.decode_snapshot", params=ENTITY_COUNTS)
+def bench_decode_snapshot(count):
+    data = encode_snapshot(make_snapshot(count))
+    return lambda: decode_snapshot(data)
+
+
+def _bench_broadcast(connections: int, wire_format: WireFormat, acked=False):
+    """
+    One 100 entity snapshot to every connection, including the writer
+    tasks handing the frames to the sockets.  With `acked` every client
+    acknowledged an earlier snapshot where only one player was moving,
+    so they get deltas.  The others kept sending inputs though, so every
+    delta has the input seq of its player.
+    """
+    loop = asyncio.new_event_loop()
+    manager = ConnectionManager(NetworkClient())
+    message = make_snapshot(100)
+    ids = [item["id"] for item in message.body]
+
+    async def connect():
+        for i in range(connections):
+            websocket = FakeWebSocket(keep_sent=False)
+            sender = ConnectionSender(websocket, ids[i % len(ids)])
+            sender.start()
+            manager.active_connections[websocket] = sender
+            manager.wire_formats[websocket] = wire_format
+            manager.delta_encoders[websocket] = DeltaEncoder(keyframe_every=2**31)
+        if acked:
+            # The tick before, only the first player moved since
+            earlier = message.model_copy(deep=True, update={"tick": 0})
+            earlier.body[0]["rect"] = (5, 5, 90, 61)
+            for item in earlier.body:
+                item["last_input_seq"] = max(0, item["last_input_seq"] - 1)
+            manager.broadcast_ws_message(earlier)
+            for websocket in manager.active_connections:
+                manager.acknowledge(websocket, 0)
+
+    async def broadcast():
+        manager.broadcast_ws_message(message)
+        while any(sender.qsize() for sender in manager.active_connections.values()):
+            await asyncio.sleep(0)
+
+    async def disconnect():
+        for sender in manager.active_connections.values():
+            sender.stop()
+        await asyncio.sleep(0)
+
+    loop.run_until_complete(connect())
+    yield lambda: loop.run_until_complete(broadcast())
+    loop.run_until_complete(disconnect())
+    loop.close()
+
+
+@benchmark("broadcast.json", params=CONNECTION_COUNTS)
+def bench_broadcast_json(connections):
+    yield from _bench_broadcast(connections, WireFormat.JSON)
+
+
+@benchmark("broadcast.binary", params=CONNECTION_COUNTS)
+def bench_broadcast_binary(connections):
+    yield from _bench_broadcast(connections, WireFormat.BINARY)
+
+
+@benchmark("broadcast.delta", params=CONNECTION_COUNTS)
+def bench_broadcast_delta(connections):
+    yield from _bench_broadcast(connections, WireFormat.BINARY, acked=True)
@@ -0,0 +1,103 @@
+"""
+Rendering benchmarks, run with the dummy SDL video driver so they work
+without a display.
+"""
+
+import uuid
+
+import pygame as pg
+
+from lib.text_cache import TextCache
+from test.benchmark.bench_game import ENTITY_COUNTS
+from test.helpers import make_game
+from test.benchmark.runner import benchmark
+
+
+@benchmark("render.fill")
+def bench_fill():
+    game = make_game()
+    return lambda: game.screen.fill("purple")
+
+
+@benchmark("render.group_draw", params=ENTITY_COUNTS)
+def bench_group_draw(count):
+    game = make_game(is_server_mode=False, network_players=count)
+    return lambda: game.network_game_sprites.draw(game.screen)
+
+
+@benchmark("render.display_flip")
+def bench_display_flip():
+    make_game()
+    return pg.display.flip
+
+
+def _nameplates(count):
+    pg.font.init()
+    font = pg.font.Font(None, 20)
+    return font, [str(uuid.uuid4()) for _ in range(count)]
+
+
+@benchmark("render.nameplates.uncached", params=ENTITY_COUNTS)
+def bench_nameplates_uncached(count):
+    """One UUID nameplate per player, rendered every frame like v1 does."""
+    font, names = _nameplates(count)
+
+    def run():
+        for name in names:
+            font.render(name, False, "pink")
+
+    return run
+
+
+@benchmark("render.nameplates.cached", params=ENTITY_COUNTS)
+def bench_nameplates_cached(count):
+    font, names = _nameplates(count)
+    cache = TextCache()
+
+    def run():
+        for name in names:
+            cache.render(font, name, False, "pink")
+
+    return run
+
+
+def _frame(game):
+    """Drawing and updating the window, without the client's 60 fps sleep."""
+
+    def run():
+        game._render_game()
+        if game.render_sprites is not None:
+            pg.display.update(game.dirty_rects)
+        else:
+            pg.display.flip()
+
+    return run
+
+
+@benchmark("render.frame.full", params=ENTITY_COUNTS)
+def bench_frame_full(count):
+    """Fill, draw everything and flip, nothing moving."""
+    game = make_game(is_server_mode=False, network_players=count)
+    return _frame(game)
+
+
+@benchmark("render.frame.dirty_static", params=ENTITY_COUNTS)
+def bench_frame_dirty_static(count):
+    game = make_game(is_server_mode=False, network_players=count)
+    game.enable_dirty_rendering()
+    return _frame(game)
+
+
+@benchmark("render.frame.dirty_one_moving", params=ENTITY_COUNTS)
+def bench_frame_dirty_one_moving(count):
+    """Like a player walking around an otherwise still screen."""
+    game = make_game(is_server_mode=False, network_players=count)
+    game.enable_dirty_rendering()
+    player = game.cur_player
+    frame = _frame(game)
+
+    def run():
+        player.rect = player.rect.move(1, 0).clamp(game.bounds)
+        frame()
+
+    return run
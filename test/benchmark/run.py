@@ -0,0 +1,33 @@
+"""
+Runs the benchmark suite and prints the results as JSON.
+
+```
+python test/benchmark/run.py --output results.json
+python test/benchmark/run.py --baseline results.json
+python test/benchmark/run.py -k "get_network_sprites|broadcast"
+```
+
+or
+
+```
+bazel run //test:benchmark -- --baseline $PWD/results.json
+```
+
+With `--baseline` the exit code is 1 if any benchmark got more than
+`--threshold` (20% by default) slower, so it can gate a deploy.
+Baselines only make sense from the same machine.
+"""
+
+import os
+import sys
+
+# Has to be set before pygame is imported, `lib/v2/game_simple.py` opens
+# the display on import
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from test.benchmark import bench_game, bench_network, bench_render
+from test.benchmark.runner import main
+
+if __name__ == "__main__":
+    sys.exit(main())
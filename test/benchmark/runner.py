@@ -0,0 +1,167 @@
+"""
+Tiny benchmark runner, see `test/benchmark/run.py` for how to run it.
+
+A benchmark is a setup function registered with `@benchmark()` that
+builds whatever it needs and returns the function to time, so setup
+costs don't end up in the numbers.  Setups that need to clean up can
+`yield` the function instead, the code after the `yield` runs once the
+benchmark is done.  Benchmarks with `params` get registered once per
+param, named like `get_network_sprites[100]`.
+
+Each benchmark is called enough times to take `min_time` seconds per
+round, for `rounds` rounds, and the per call times of the rounds are
+reported in microseconds.  The median is what gets compared against a
+baseline since it's the least noisy.
+"""
+
+import argparse
+from functools import partial
+import inspect
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+Setup = Callable[..., Callable[[], Any]]
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+# Allowed slow down before a benchmark counts as a regression
+DEFAULT_THRESHOLD = 0.2
+
+
+def benchmark(name: str, params: Iterable[Any] | None = None):
+    def register(setup: Setup) -> Setup:
+        if params is None:
+            BENCHMARKS[name] = setup
+        else:
+            for param in params:
+                BENCHMARKS[f"{name}[{param}]"] = partial(setup, param)
+        return setup
+
+    return register
+
+
+def time_benchmark(
+    fn: Callable[[], Any], min_time: float = 0.2, rounds: int = 5
+) -> Dict[str, float]:
+    # Find how many calls take at least `min_time`
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+
+    times = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+
+    median = statistics.median(times)
+    return {
+        "median_us": median * 1e6,
+        "min_us": min(times) * 1e6,
+        "stdev_us": statistics.stdev(times) * 1e6 if len(times) > 1 else 0.0,
+        "ops_per_sec": 1 / median if median else 0.0,
+        "calls_per_round": number,
+        "rounds": rounds,
+    }
+
+
+def run_benchmarks(
+    pattern: str | None = None, min_time: float = 0.2, rounds: int = 5
+) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        fixture = setup()
+        if inspect.isgenerator(fixture):
+            try:
+                results[name] = time_benchmark(next(fixture), min_time, rounds)
+            finally:
+                next(fixture, None)
+        else:
+            results[name] = time_benchmark(fixture, min_time, rounds)
+        print(f"{name:<50} {results[name]['median_us']:>12.2f} us", file=sys.stderr)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    Compares the median of every benchmark that is in both.  `ratio` is
+    new time over baseline time, so above 1 is slower.
+    """
+    rows = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "same"
+        rows.append(
+            {
+                "name": name,
+                "baseline_us": baseline[name]["median_us"],
+                "median_us": result["median_us"],
+                "ratio": ratio,
+                "status": status,
+            }
+        )
+    return rows
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("-k", "--filter", help="regex of benchmarks to run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": run_benchmarks(args.filter, args.min_time, args.rounds),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["benchmarks"]
+    rows = compare(report["benchmarks"], baseline, args.threshold)
+    for row in rows:
+        print(
+            f"{row['name']:<50} {row['baseline_us']:>12.2f} -> "
+            f"{row['median_us']:>12.2f} us  x{row['ratio']:.2f}  {row['status']}",
+            file=sys.stderr,
+        )
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,47 @@
+import unittest
+
+from test.benchmark import runner
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.registered = dict(runner.BENCHMARKS)
+        runner.BENCHMARKS.clear()
+
+    def tearDown(self):
+        runner.BENCHMARKS.clear()
+        runner.BENCHMARKS.update(self.registered)
+
+    def test_params_and_teardown(self):
+        calls = []
+
+        @runner.benchmark("sum", params=(10, 100))
+        def bench_sum(count):
+            numbers = list(range(count))
+            yield lambda: sum(numbers)
+            calls.append(count)
+
+        results = runner.run_benchmarks("sum", min_time=0.001, rounds=2)
+        self.assertEqual(list(results), ["sum[10]", "sum[100]"])
+        self.assertEqual(calls, [10, 100])
+        self.assertGreater(results["sum[10]"]["median_us"], 0)
+
+    def test_compare(self):
+        baseline = {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}}
+        results = {
+            "a": {"median_us": 13.0},
+            "b": {"median_us": 5.0},
+            "new": {"median_us": 1.0},
+        }
+        rows = runner.compare(results, baseline, threshold=0.2)
+        self.assertEqual(
+            [(row["name"], row["status"]) for row in rows],
+            [("a", "regression"), ("b", "improvement")],
+        )
+        self.assertEqual(
+            runner.compare(results, baseline, threshold=0.5)[0]["status"], "same"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Fakes and builders shared by the tests and the benchmarks.
+"""
+
+import asyncio
+import uuid
+
+import pygame as pg
+
+from lib.v1.common import WS_Message
+from lib.v2.entity_store import EntityStore
+from lib.v2.game_simple import Game, NetworkClient, Player, load_image
+
+
+class FakeWebSocket:
+    """
+    Stands in for a starlette `WebSocket`, what gets sent ends up in
+    `sent`.  Benchmarks send millions of frames, so they can turn
+    `keep_sent` off.  A `stalled` one waits for `unstall` before every
+    send, a `broken` one fails like a connection that was reset.
+    """
+
+    def __init__(self, stalled=False, broken=False, keep_sent=True):
+        self.sent = []
+        self.stalled = stalled
+        self.broken = broken
+        self.keep_sent = keep_sent
+        self.unstall = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        if self.broken:
+            raise RuntimeError("connection reset")
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send_text(self, data):
+        await self._send(data)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def _send(self, data):
+        if self.broken:
+            raise RuntimeError("connection closed")
+        if self.stalled:
+            await self.unstall.wait()
+        if self.keep_sent:
+            self.sent.append(data)
+
+
+def make_message(message_type, body=None, player_session_uuid=None, tick=None):
+    """From a random player unless `player_session_uuid` is given."""
+    return WS_Message(
+        player_session_uuid=player_session_uuid or str(uuid.uuid4()),
+        message_type=message_type,
+        body=body,
+        tick=tick,
+    )
+
+
+def make_snapshot(count=10, tick=1, moved_x=0, input_seq=0) -> WS_Message:
+    """
+    Positions of `count` players with the same ids every time, only the
+    first one is at `moved_x`.  Player `i` last sent input `input_seq + i`.
+    """
+    return WS_Message(
+        player_session_uuid=str(uuid.uuid4()),
+        message_type="SERVER_POSITION_V2",
+        body=[
+            {
+                "id": str(uuid.UUID(int=i + 1)),
+                "class_name": "Player",
+                "rect": (moved_x if i == 0 else i, 0, 90, 61),
+                "last_input_seq": input_seq + i,
+            }
+            for i in range(count)
+        ],
+        tick=tick,
+    )
+
+
+def make_game(
+    is_server_mode: bool = True,
+    network_players: int = 0,
+    headless: bool = False,
+    screen_size: tuple | None = None,
+) -> Game:
+    """
+    Like `create_game()`, but with a `NetworkClient` and without reading
+    the environment.  With `screen_size` it draws on a surface of its own
+    instead of the display, so games can be compared pixel by pixel.
+    """
+    pg.init()
+    if not Player.images:
+        img = load_image("player1.gif")
+        Player.images = [img, pg.transform.flip(img, 1, 0)]
+    game = Game(is_server_mode=is_server_mode, network_client=NetworkClient())
+    if screen_size:
+        game.screen = pg.Surface(screen_size).convert()
+        game.bounds = pg.Rect((0, 0), screen_size)
+    if headless:
+        game.screen = None
+    if is_server_mode:
+        game.entity_store = EntityStore(capacity=network_players + 1)
+    if not headless:
+        game._add_fps()
+    game._add_cur_player(str(uuid.uuid4()))
+    game.dt = 1 / 60
+
+    bounds = game.bounds
+    for i in range(network_players):
+        id = str(uuid.uuid4())
+        rect = pg.Rect(
+            (i * 37) % bounds.width,
+            (i * 53) % bounds.height,
+            *Player.images[0].get_size(),
+        )
+        game.network_sprite_lookup[id] = game._add_network_player(id, rect)
+    return game
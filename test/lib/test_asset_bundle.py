@@ -0,0 +1,84 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+import pygame as pg
+
+from game_assets.bundle import ALIGNMENT, AssetBundle, write_bundle
+from game_assets.interface import get_intro_image_path
+from lib.assets import AssetManager
+
+
+class TestAssetBundle(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        directory = Path(self.tmp.name)
+
+        opaque = pg.Surface((5, 3))
+        opaque.fill("red")
+        opaque.set_at((4, 2), pg.Color("blue"))
+        pg.image.save(opaque, str(directory / "opaque.bmp"))
+
+        alpha = pg.Surface((2, 2), pg.SRCALPHA)
+        alpha.fill((10, 20, 30, 40))
+        pg.image.save(alpha, str(directory / "alpha.png"))
+
+        # A GIF with a colorkey, pygame can't save those
+        shutil.copy(get_intro_image_path(), directory / "keyed.gif")
+
+        (directory / "data.txt").write_text("hello")
+
+        self.files = {
+            path.name: path for path in sorted(directory.iterdir()) if path.is_file()
+        }
+        self.path = directory / "assets.bundle"
+        write_bundle(self.files, self.path)
+        self.bundle = AssetBundle(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_images_match_the_files(self):
+        for name in ("opaque.bmp", "alpha.png", "keyed.gif"):
+            expected = pg.image.load(self.files[name])
+            image = self.bundle.image(name)
+            self.assertEqual(image.get_size(), expected.get_size())
+            for x in range(image.get_width()):
+                for y in range(image.get_height()):
+                    self.assertEqual(image.get_at((x, y)), expected.get_at((x, y)))
+            self.assertEqual(image.get_colorkey(), expected.get_colorkey())
+
+    def test_pixel_formats(self):
+        self.assertEqual(self.bundle.entries["opaque.bmp"].pixel_format, "RGB")
+        self.assertEqual(self.bundle.entries["alpha.png"].pixel_format, "RGBA")
+        self.assertEqual(
+            self.bundle.entries["keyed.gif"].colorkey, (255, 255, 255, 255)
+        )
+
+    def test_data_is_page_aligned(self):
+        for entry in self.bundle.entries.values():
+            self.assertEqual(entry.offset % ALIGNMENT, 0)
+
+    def test_files(self):
+        self.assertEqual(self.bundle.text("data.txt"), "hello")
+        with self.assertRaises(ValueError):
+            self.bundle.image("data.txt")
+
+    def test_bad_file(self):
+        bad = Path(self.tmp.name) / "bad.bundle"
+        bad.write_bytes(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            AssetBundle(bad)
+
+    def test_asset_manager_prefers_the_bundle(self):
+        assets = AssetManager([Path(self.tmp.name) / "missing"], bundle=self.bundle)
+        self.assertEqual(assets.image("opaque.bmp", convert=False).get_size(), (5, 3))
+        assets.preload(["alpha.png"])
+        self.assertEqual(assets.text("data.txt"), "hello")
+        with self.assertRaises(FileNotFoundError):
+            assets.image("missing.png", convert=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+import pygame as pg
+
+from lib.assets import AssetManager
+
+
+def save_image(directory: Path, name: str, size=(8, 4), color="red"):
+    surface = pg.Surface(size)
+    surface.fill(color)
+    surface.set_at((0, 0), pg.Color("blue"))
+    pg.image.save(surface, str(directory / name))
+
+
+class TestAssetManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.first = Path(self.tmp.name) / "first"
+        self.second = Path(self.tmp.name) / "second"
+        self.first.mkdir()
+        self.second.mkdir()
+        save_image(self.first, "a.png")
+        save_image(self.first, "b.png", size=(16, 16))
+        save_image(self.second, "a.png", color="green")
+        save_image(self.second, "c.png")
+        (self.second / "data.txt").write_text("hello")
+        self.assets = AssetManager([self.first, self.second])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_first_directory_wins(self):
+        self.assertEqual(self.assets.path("a.png"), self.first / "a.png")
+        self.assertEqual(self.assets.path("c.png"), self.second / "c.png")
+        with self.assertRaises(FileNotFoundError):
+            self.assets.path("missing.png")
+
+    def test_image_is_decoded_once(self):
+        first = self.assets.image("a.png", convert=False)
+        second = self.assets.image("a.png", convert=False)
+        self.assertIs(first, second)
+        self.assertEqual((self.assets.hits, self.assets.misses), (1, 1))
+        self.assertIn("a.png", self.assets.load_times)
+
+    def test_variants(self):
+        image = self.assets.image("a.png", convert=False)
+        flipped = self.assets.image("a.png", convert=False, flip_x=True)
+        scaled = self.assets.image("a.png", convert=False, scale=(16, 8))
+        self.assertIsNot(image, flipped)
+        self.assertEqual(flipped.get_at((7, 0)), pg.Color("blue"))
+        self.assertEqual(scaled.get_size(), (16, 8))
+        self.assertIs(self.assets.image("a.png", convert=False, flip_x=True), flipped)
+
+    def test_converted(self):
+        pg.display.init()
+        pg.display.set_mode((10, 10))
+        image = self.assets.image("a.png")
+        self.assertEqual(image.get_bitsize(), pg.display.get_surface().get_bitsize())
+        self.assertIs(self.assets.image("a.png"), image)
+
+    def test_least_recently_used_is_evicted(self):
+        small = 8 * 4 * 4
+        assets = AssetManager([self.first, self.second], max_bytes=small * 2)
+        assets.image("a.png", convert=False)
+        assets.image("c.png", convert=False)
+        # Makes "c.png" the oldest
+        assets.image("a.png", convert=False)
+        assets.image("a.png", convert=False, flip_y=True)
+        self.assertEqual(assets.evictions, 1)
+        self.assertLessEqual(assets.bytes, small * 2)
+        misses = assets.misses
+        assets.image("a.png", convert=False)
+        self.assertEqual(assets.misses, misses)
+        assets.image("c.png", convert=False)
+        self.assertEqual(assets.misses, misses + 1)
+
+    def test_preload(self):
+        self.assets.preload(["a.png", "b.png", "c.png"], workers=2)
+        self.assertEqual(self.assets.misses, 3)
+        self.assets.image("b.png", convert=False)
+        self.assertEqual(self.assets.hits, 1)
+
+    def test_text(self):
+        self.assertEqual(self.assets.text("data.txt"), "hello")
+
+    def test_default_asset_dirs(self):
+        assets = AssetManager()
+        self.assertTrue(assets.path("intro_ball.gif").exists())
+        self.assertTrue(assets.path("player1.gif").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,317 @@
+import unittest
+import uuid
+
+from lib.v1.common import WS_Message
+from lib.v2.config import WireFormat
+from lib.v2.delta import (
+    DeltaDecoder,
+    DeltaEncoder,
+    EntityDelta,
+    SnapshotDelta,
+    diff_states,
+    parse_snapshot_delta,
+    to_states,
+)
+from lib.v2.game_simple import NetworkClient, create_game
+from lib.v2.messages import EntityState
+from lib.v2.prediction import BUTTON_RIGHT
+from lib.v2.wire import decode_ws_message, encode_ws_message, with_input_seq
+
+
+def make_states(count=3, moved=(), input_seq=None):
+    """`input_seq` is the last input of every player."""
+    ids = [str(uuid.UUID(int=i + 1)) for i in range(count)]
+    return {
+        id: EntityState(
+            id, "Player", (i + (5 if i in moved else 0), i * 2, 90, 61), input_seq
+        )
+        for i, id in enumerate(ids)
+    }
+
+
+def as_delta(body):
+    """What the client gets after the body went through JSON."""
+    return parse_snapshot_delta(body)
+
+
+class TestDiff(unittest.TestCase):
+    def test_only_changed_fields(self):
+        baseline = make_states()
+        states = make_states(moved=(1,))
+        ids = list(states)
+        del states[ids[2]]
+        new = EntityState(str(uuid.uuid4()), "Player", (7, 8, 9, 10), 3)
+        states[new.id] = new
+
+        body = diff_states(4, baseline, states)
+        self.assertEqual(body["baseline_tick"], 4)
+        self.assertEqual(
+            body["changed"],
+            [
+                {"id": ids[1], "position": (6, 2)},
+                {
+                    "id": new.id,
+                    "class_name": "Player",
+                    "position": (7, 8),
+                    "size": (9, 10),
+                },
+            ],
+        )
+        self.assertEqual(body["removed"], [ids[2]])
+        self.assertIsNone(body["input_seq"])
+
+    def test_input_seqs_dont_count(self):
+        body = diff_states(4, make_states(input_seq=3), make_states(input_seq=9))
+        self.assertEqual(body["changed"], [])
+
+    def test_to_states(self):
+        body = [{"id": "a", "class_name": "Player", "rect": [1, 2, 3, 4]}]
+        self.assertEqual(
+            to_states(body), {"a": EntityState("a", "Player", (1, 2, 3, 4), None)}
+        )
+
+
+class TestDeltaEncoder(unittest.TestCase):
+    def test_keyframe_until_acked(self):
+        encoder = DeltaEncoder()
+        self.assertIsNone(encoder.baseline())
+        encoder.record(5, make_states(), None)
+        self.assertIsNone(encoder.baseline())
+        encoder.acknowledge(5)
+        self.assertEqual(encoder.baseline(), 5)
+        # Acks of snapshots that were never sent or are older are ignored
+        encoder.acknowledge(99)
+        encoder.record(10, make_states(), 5)
+        encoder.acknowledge(10)
+        encoder.acknowledge(5)
+        self.assertEqual(encoder.baseline(), 10)
+
+    def test_periodic_keyframes(self):
+        encoder = DeltaEncoder(keyframe_every=3)
+        baselines = []
+        for tick in range(1, 8):
+            baseline = encoder.baseline()
+            baselines.append(baseline)
+            encoder.record(tick, make_states(), baseline)
+            encoder.acknowledge(tick)
+        self.assertEqual(baselines, [None, 1, 2, None, 4, 5, None])
+        self.assertEqual((encoder.keyframes, encoder.deltas), (3, 4))
+
+    def test_lost_acks_fall_back_to_keyframes(self):
+        encoder = DeltaEncoder(max_baselines=4)
+        encoder.record(1, make_states(), None)
+        encoder.acknowledge(1)
+        for tick in range(2, 5):
+            self.assertEqual(encoder.baseline(), 1)
+            encoder.record(tick, make_states(), 1)
+        # No ack got through since, so tick 1 is forgotten
+        encoder.record(5, make_states(), 1)
+        self.assertIsNone(encoder.baseline())
+
+
+class TestDeltaDecoder(unittest.TestCase):
+    def test_applies_delta_against_baseline(self):
+        decoder = DeltaDecoder()
+        baseline = make_states()
+        changes = decoder.keyframe(5, list(baseline.values()))
+        self.assertEqual(len(changes.changed), 3)
+
+        # Two deltas against the same baseline, the second one also has
+        # what the first one did
+        first = make_states(moved=(0,))
+        decoder.delta(10, as_delta(diff_states(5, baseline, first)))
+        second = make_states(moved=(0, 1))
+        changes = decoder.delta(15, as_delta(diff_states(5, baseline, second)))
+        self.assertEqual(changes.states, second)
+        # Compared to the latest snapshot, not the baseline
+        self.assertEqual(changes.changed, [second[list(second)[1]]])
+        self.assertEqual(changes.removed, [])
+
+    def test_removed(self):
+        decoder = DeltaDecoder()
+        baseline = make_states()
+        decoder.keyframe(5, baseline.values())
+        states = dict(baseline)
+        gone = states.popitem()[0]
+        changes = decoder.delta(10, as_delta(diff_states(5, baseline, states)))
+        self.assertEqual(changes.removed, [gone])
+        self.assertEqual(changes.changed, [])
+
+    def test_skips_late_and_unknown_baselines(self):
+        decoder = DeltaDecoder(max_baselines=2)
+        decoder.keyframe(10, make_states().values())
+        self.assertIsNone(decoder.keyframe(5, make_states().values()))
+        delta = SnapshotDelta(3, [], [])
+        self.assertIsNone(decoder.delta(15, delta))
+        decoder.keyframe(15, make_states().values())
+        decoder.keyframe(20, make_states().values())
+        # Tick 10 was forgotten
+        self.assertIsNone(decoder.delta(25, SnapshotDelta(10, [], [])))
+        self.assertEqual(decoder.skipped, 2)
+
+    def test_new_entity_needs_every_field(self):
+        decoder = DeltaDecoder()
+        decoder.keyframe(5, [])
+        with self.assertRaises(ValueError):
+            decoder.delta(10, SnapshotDelta(5, [EntityDelta("a", position=(1, 2))], []))
+
+
+class TestDeltaWire(unittest.TestCase):
+    def make_message(self, body):
+        return WS_Message(
+            player_session_uuid=str(uuid.uuid4()),
+            message_type="SERVER_DELTA_V2",
+            body=body,
+            tick=10,
+        )
+
+    def test_round_trip(self):
+        baseline = make_states(5)
+        states = make_states(5, moved=(1, 3))
+        del states[list(states)[4]]
+        states["x"] = EntityState(str(uuid.uuid4()), "Player", (1, 2, 3, 4), 7)
+        states = {state.id: state for state in states.values()}
+        body = dict(diff_states(5, baseline, states), input_seq=42)
+        message = self.make_message(body)
+        expected = parse_snapshot_delta(message.body)
+        self.assertEqual(expected.input_seq, 42)
+        for wire_format in WireFormat:
+            decoded = decode_ws_message(encode_ws_message(message, wire_format))
+            self.assertEqual(decoded.message_type, "SERVER_DELTA_V2")
+            self.assertEqual(decoded.tick, 10)
+            self.assertEqual(decoded.body, expected)
+
+    def test_ack_round_trip(self):
+        ack = WS_Message(
+            player_session_uuid=str(uuid.uuid4()),
+            message_type="CLIENT_ACK_V2",
+            body="",
+            tick=42,
+        )
+        data = encode_ws_message(ack, WireFormat.BINARY)
+        self.assertEqual(len(data), 8)
+        for wire_format in WireFormat:
+            decoded = decode_ws_message(encode_ws_message(ack, wire_format))
+            self.assertEqual(decoded.message_type, "CLIENT_ACK_V2")
+            self.assertEqual(decoded.tick, 42)
+
+    def test_with_input_seq(self):
+        message = self.make_message(diff_states(5, make_states(), make_states()))
+        data = with_input_seq(encode_ws_message(message, WireFormat.BINARY), 99)
+        self.assertEqual(decode_ws_message(data).body.input_seq, 99)
+
+    def test_truncated_delta(self):
+        states = make_states(moved=(0,))
+        message = self.make_message(diff_states(5, make_states(), states))
+        data = encode_ws_message(message, WireFormat.BINARY)
+        with self.assertRaises(ValueError):
+            decode_ws_message(data[:-3])
+
+    def test_idle_players_save_bandwidth(self):
+        """
+        100 players, only one of them moving, but all of them sending
+        inputs so their input seqs keep going up.
+        """
+        baseline = make_states(100, input_seq=10)
+        states = make_states(100, moved=(0,), input_seq=20)
+        for wire_format in WireFormat:
+            full = encode_ws_message(
+                WS_Message(
+                    player_session_uuid=str(uuid.uuid4()),
+                    message_type="SERVER_POSITION_V2",
+                    body=list(states.values()),
+                    tick=10,
+                ),
+                wire_format,
+            )
+            body = dict(diff_states(5, baseline, states), input_seq=20)
+            delta = encode_ws_message(self.make_message(body), wire_format)
+            self.assertLess(len(delta), len(full) * 0.05)
+
+
+class TestGameDeltas(unittest.TestCase):
+    def test_unchanged_sprites_keep_their_rects(self):
+        server = create_game(is_server_mode=True, headless=True)
+        for _ in range(3):
+            id = str(uuid.uuid4())
+            server.network_sprite_lookup[id] = server._add_network_player(id)
+        client = create_game(is_server_mode=False, headless=True)
+        client.interpolator = None
+        client.network_client = NetworkClient()
+        self.assertIsNotNone(client.delta_decoder)
+
+        def send(tick, message_type, body):
+            client.network_client.in_queue.put_nowait(
+                WS_Message(
+                    player_session_uuid=server.get_cur_player_id(),
+                    message_type=message_type,
+                    body=body,
+                    tick=tick,
+                )
+            )
+            client._receive_data()
+
+        baseline = to_states(server.get_local_sprites_dict())
+        baseline.update(to_states(server.get_network_sprites_dict()))
+        send(5, "SERVER_POSITION_V2", list(baseline.values()))
+        self.assertEqual(len(client.network_sprite_lookup), 4)
+        rects = {
+            id: sprite._rect for id, sprite in client.network_sprite_lookup.items()
+        }
+
+        states = dict(baseline)
+        moved, gone = list(server.network_sprite_lookup)[:2]
+        state = states[moved]
+        states[moved] = state._replace(rect=(1, 2) + state.rect[2:])
+        del states[gone]
+        send(10, "SERVER_DELTA_V2", as_delta(diff_states(5, baseline, states)))
+
+        self.assertNotIn(gone, client.network_sprite_lookup)
+        self.assertEqual(client.network_sprite_lookup[moved].rect.topleft, (1, 2))
+        for id, sprite in client.network_sprite_lookup.items():
+            if id != moved:
+                self.assertIs(sprite._rect, rects[id])
+
+        acks = []
+        while client.network_client.has_message_out():
+            message = client.network_client.out_queue.get_nowait()
+            if message.message_type == "CLIENT_ACK_V2":
+                acks.append(message.tick)
+        # Coalesced to the newest ack
+        self.assertEqual(acks, [10])
+
+    def test_reconciles_own_input_without_moving(self):
+        client = create_game(is_server_mode=False, headless=True)
+        client.interpolator = None
+        client.network_client = NetworkClient()
+        client.dt = 1 / 60
+        id = client.get_cur_player_id()
+        server_rect = (100, 100, 90, 61)
+        baseline = {id: EntityState(id, "Player", server_rect, None)}
+
+        def send(tick, message_type, body):
+            client.network_client.in_queue.put_nowait(
+                WS_Message(
+                    player_session_uuid=id,
+                    message_type=message_type,
+                    body=body,
+                    tick=tick,
+                )
+            )
+            client._receive_data()
+
+        send(5, "SERVER_POSITION_V2", list(baseline.values()))
+        client._send_input(BUTTON_RIGHT)
+        client._send_input(BUTTON_RIGHT)
+        self.assertEqual(len(client.predictor.pending), 2)
+
+        # The server applied both inputs but we didn't get anywhere
+        body = dict(diff_states(5, baseline, baseline), input_seq=2)
+        send(10, "SERVER_DELTA_V2", as_delta(body))
+        self.assertEqual(client.predictor.last_acked_seq, 2)
+        self.assertEqual(len(client.predictor.pending), 0)
+        self.assertEqual(tuple(client.cur_player.rect), server_rect)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import pygame as pg
+
+from lib.v2.game_simple import Game
+from test import helpers
+
+
+def make_game(dirty: bool) -> Game:
+    # Both games draw on their own surface so they can be compared
+    game = helpers.make_game(
+        is_server_mode=False, network_players=3, screen_size=(400, 300)
+    )
+    if dirty:
+        game.enable_dirty_rendering()
+    return game
+
+
+def move(game: Game, frame: int):
+    for i, sprite in enumerate(game.network_game_sprites):
+        if i != 0:
+            sprite.rect = sprite.rect.move(7 * i, 3 * frame % 11)
+    # Overlaps the others
+    game.cur_player.rect = pg.Rect(30 + frame * 5, 20, 90, 61)
+
+
+class TestDirtyRendering(unittest.TestCase):
+    def test_same_pixels_as_full_redraw(self):
+        full, dirty = make_game(False), make_game(True)
+        for frame in range(10):
+            for game in (full, dirty):
+                move(game, frame)
+                game._render_game()
+            self.assertEqual(
+                pg.image.tobytes(full.screen, "RGB"),
+                pg.image.tobytes(dirty.screen, "RGB"),
+                f"frame {frame}",
+            )
+
+    def test_static_frame_draws_nothing(self):
+        game = make_game(True)
+        game._render_game()
+        self.assertTrue(game.dirty_rects)
+        game._render_game()
+        self.assertEqual(game.dirty_rects, [])
+
+    def test_only_moved_sprite_is_dirty(self):
+        game = make_game(True)
+        game._render_game()
+        old = game.cur_player.rect
+        game.cur_player.rect = old.move(10, 0)
+        game._render_game()
+        area = game.dirty_rects[0].unionall(game.dirty_rects[1:])
+        self.assertEqual(area, old.union(old.move(10, 0)))
+
+    def test_removed_sprite_is_cleared(self):
+        full, dirty = make_game(False), make_game(True)
+        for game in (full, dirty):
+            game._render_game()
+            next(iter(game.network_game_sprites)).kill()
+            game._render_game()
+        self.assertEqual(
+            pg.image.tobytes(full.screen, "RGB"),
+            pg.image.tobytes(dirty.screen, "RGB"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
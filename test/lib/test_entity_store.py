@@ -0,0 +1,61 @@
+import unittest
+
+import pygame as pg
+
+from lib.v2.entity_store import EntityStore
+
+
+class TestEntityStore(unittest.TestCase):
+    def test_add_get_set(self):
+        store = EntityStore()
+        store.add("a", pg.Rect(10, 20, 30, 40))
+        self.assertIn("a", store)
+        self.assertEqual(store.get_rect("a"), pg.Rect(10, 20, 30, 40))
+
+        store.set_rect("a", pg.Rect(1, 2, 3, 4))
+        self.assertEqual(store.get_rect("a"), pg.Rect(1, 2, 3, 4))
+
+        with self.assertRaises(ValueError):
+            store.add("a", pg.Rect(0, 0, 1, 1))
+
+    def test_grow_and_remove(self):
+        store = EntityStore(capacity=2)
+        for i in range(5):
+            store.add(str(i), pg.Rect(i, i, 1, 1))
+        self.assertEqual(len(store), 5)
+        self.assertGreaterEqual(store.capacity, 5)
+
+        store.remove("1")
+        self.assertEqual(len(store), 4)
+        self.assertNotIn("1", store)
+        for i in (0, 2, 3, 4):
+            self.assertEqual(store.get_rect(str(i)), pg.Rect(i, i, 1, 1))
+        self.assertEqual(store.rects().shape, (4, 4))
+
+    def test_integrate_moves_and_clamps(self):
+        store = EntityStore()
+        store.add("moving", pg.Rect(0, 0, 10, 10), velocity=(100, 50))
+        store.add("outside", pg.Rect(-50, 500, 10, 10))
+        store.integrate(0.1, pg.Rect(0, 0, 100, 100))
+
+        self.assertEqual(store.get_rect("moving"), pg.Rect(10, 5, 10, 10))
+        self.assertEqual(store.get_rect("outside"), pg.Rect(0, 90, 10, 10))
+
+    def test_integrate_bounces(self):
+        store = EntityStore()
+        store.add("bouncer", pg.Rect(80, 0, 10, 10), velocity=(100, 0), bounce=True)
+        store.add("stopper", pg.Rect(80, 0, 10, 10), velocity=(100, 0))
+        bounds = pg.Rect(0, 0, 100, 100)
+
+        store.integrate(0.1, bounds)
+        self.assertEqual(store.get_rect("bouncer").x, 90)
+        # Hits the edge and turns around
+        store.integrate(0.1, bounds)
+        self.assertEqual(store.get_rect("bouncer").x, 90)
+        store.integrate(0.1, bounds)
+        self.assertEqual(store.get_rect("bouncer").x, 80)
+        self.assertEqual(store.get_rect("stopper").x, 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+import pygame as pg
+
+from lib.v1.common import WS_Message
+from lib.v2.game_simple import (
+    SCREEN_HEIGHT,
+    SCREEN_WIDTH,
+    NetworkClient,
+    create_game,
+)
+
+
+class TestHeadlessGame(unittest.TestCase):
+    def test_no_sdl_work(self):
+        game = create_game(is_server_mode=True, headless=True)
+        game.dt = 1 / 60
+        fail = mock.Mock(side_effect=AssertionError("SDL used while headless"))
+        with (
+            mock.patch.object(pg.display, "flip", fail),
+            mock.patch.object(pg.event, "get", fail),
+            mock.patch.object(game, "_render_game", fail),
+        ):
+            start = game.cur_player.rect.center
+            for _ in range(5):
+                game.update()
+
+        self.assertIsNone(game.screen)
+        self.assertEqual(game.frame_count, 5)
+        # No `Fps` counter to render
+        self.assertEqual(len(game.other_game_sprites), 0)
+        # The server's own player still moves
+        self.assertNotEqual(game.cur_player.rect.center, start)
+        self.assertTrue(
+            pg.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT).contains(game.cur_player.rect)
+        )
+
+    def test_debug_view_renders_every_n_frames(self):
+        game = create_game(is_server_mode=True, headless=True)
+        game.attach_debug_view(every_n_frames=3)
+        game.dt = 1 / 60
+        with (
+            mock.patch.object(pg.display, "flip") as flip,
+            mock.patch.object(game, "_render_game") as render,
+        ):
+            for _ in range(6):
+                game.update()
+
+        self.assertTrue(game.owns_display())
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(flip.call_count, 2)
+        self.assertEqual(len(game.other_game_sprites), 1)
+
+    def test_disconnect_before_first_message(self):
+        game = create_game(is_server_mode=True, headless=True)
+        game.network_client = NetworkClient()
+        game.network_client.in_queue.put_nowait(
+            WS_Message(
+                player_session_uuid="never-sent-anything",
+                message_type="CLIENT_DISCONNECTED_FROM_SERVER_V2",
+                body="",
+            )
+        )
+        game._receive_data()
+        self.assertEqual(game.network_sprite_lookup, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from lib.v2.interest import InterestManager, SpatialGrid
+
+
+class TestSpatialGrid(unittest.TestCase):
+    def test_query(self):
+        grid = SpatialGrid(cell_size=100)
+        grid.update("a", 50, 50)
+        grid.update("b", 140, 50)
+        grid.update("c", 900, 900)
+
+        self.assertEqual(set(grid.query(50, 50, 100)), {"a", "b"})
+        self.assertEqual(set(grid.query(50, 50, 50)), {"a"})
+        self.assertEqual(set(grid.query(880, 880, 50)), {"c"})
+
+    def test_moves_between_cells(self):
+        grid = SpatialGrid(cell_size=100)
+        grid.update("a", 50, 50)
+        grid.update("a", 60, 60)
+        self.assertEqual(grid.entity_cells["a"], (0, 0))
+
+        grid.update("a", 250, -50)
+        self.assertEqual(grid.entity_cells["a"], (2, -1))
+        self.assertNotIn((0, 0), grid.cells)
+        self.assertEqual(set(grid.query(250, -50, 10)), {"a"})
+
+        grid.remove("a")
+        self.assertEqual(len(grid), 0)
+        self.assertEqual(len(grid.cells), 0)
+
+
+class TestInterestManager(unittest.TestCase):
+    def setUp(self):
+        self.interest = InterestManager(radius=100, hysteresis=1.5)
+        self.interest.update_entity("viewer", (0, 0))
+
+    def test_filter_snapshot(self):
+        self.interest.update_entity("near", (50, 0))
+        self.interest.update_entity("far", (500, 0))
+        body = [
+            {"id": "viewer", "class_name": "Player", "rect": (0, 0, 1, 1)},
+            {"id": "near", "class_name": "Player", "rect": (50, 0, 1, 1)},
+            ("far", "Player", (500, 0, 1, 1)),
+        ]
+        filtered = self.interest.filter_snapshot("viewer", body)
+        self.assertEqual(filtered, body[:2])
+
+    def test_unknown_viewer_gets_everything(self):
+        body = [{"id": "near", "class_name": "Player", "rect": (50, 0, 1, 1)}]
+        self.assertEqual(self.interest.filter_snapshot("new", body), body)
+
+    def test_hysteresis(self):
+        self.interest.update_entity("other", (120, 0))
+        self.assertNotIn("other", self.interest.visible_for("viewer"))
+
+        self.interest.update_entity("other", (90, 0))
+        self.assertIn("other", self.interest.visible_for("viewer"))
+
+        # Past the radius, but not past radius * hysteresis
+        self.interest.update_entity("other", (140, 0))
+        self.assertIn("other", self.interest.visible_for("viewer"))
+
+        self.interest.update_entity("other", (160, 0))
+        self.assertNotIn("other", self.interest.visible_for("viewer"))
+
+    def test_remove_entity(self):
+        self.interest.update_entity("other", (10, 0))
+        self.assertIn("other", self.interest.visible_for("viewer"))
+        self.interest.remove_entity("other")
+        self.assertNotIn("other", self.interest.visible["viewer"])
+        self.interest.remove_entity("viewer")
+        self.assertNotIn("viewer", self.interest.visible)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from lib.v2.interpolation import SnapshotBuffer, SnapshotInterpolator
+
+
+class TestSnapshotBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = SnapshotBuffer()
+        self.buffer.push(1.0, 10, (0, 0, 10, 10))
+        self.buffer.push(1.1, 15, (100, 50, 10, 10))
+
+    def test_interpolates(self):
+        self.assertEqual(self.buffer.sample(1.05, 0.25), (50, 25, 10, 10))
+
+    def test_holds_before_first_snapshot(self):
+        self.assertEqual(self.buffer.sample(0.5, 0.25), (0, 0, 10, 10))
+
+    def test_bounded_extrapolation(self):
+        self.assertEqual(self.buffer.sample(1.15, 0.25), (150, 75, 10, 10))
+        # Only extrapolates up to 0.25s past the last snapshot
+        self.assertEqual(self.buffer.sample(5.0, 0.25), (350, 175, 10, 10))
+
+    def test_drops_stale_snapshots(self):
+        self.assertFalse(self.buffer.push(1.2, 12, (999, 999, 10, 10)))
+        self.assertFalse(self.buffer.push(1.2, 15, (999, 999, 10, 10)))
+        self.assertFalse(self.buffer.push(1.05, 20, (999, 999, 10, 10)))
+        self.assertTrue(self.buffer.push(1.2, 20, (200, 100, 10, 10)))
+        self.assertEqual(self.buffer.sample(1.15, 0.25), (150, 75, 10, 10))
+
+    def test_trims_old_snapshots(self):
+        for i in range(2, 10):
+            self.buffer.push(1.0 + i / 10, 10 + i * 5, (i * 100, 0, 10, 10))
+        self.buffer.sample(1.55, 0.25)
+        self.assertEqual(len(self.buffer.snapshots), 5)
+
+
+class TestSnapshotInterpolator(unittest.TestCase):
+    def test_delay(self):
+        interpolator = SnapshotInterpolator(delay=0.1)
+        interpolator.push("a", (0, 0, 10, 10), now=1.0, tick=1)
+        interpolator.push("a", (100, 0, 10, 10), now=1.1, tick=2)
+        interpolator.push("a", (50, 0, 10, 10), now=1.15, tick=1)
+
+        self.assertEqual(interpolator.sample("a", now=1.15), (50, 0, 10, 10))
+        self.assertEqual(interpolator.dropped_snapshots, 1)
+        self.assertIsNone(interpolator.sample("b", now=1.15))
+
+        interpolator.remove("a")
+        self.assertIsNone(interpolator.sample("a", now=1.15))
+
+    def test_hold(self):
+        interpolator = SnapshotInterpolator(delay=0.1)
+        interpolator.push("a", (0, 0, 10, 10), now=1.0, tick=10)
+        interpolator.push("a", (100, 0, 10, 10), now=1.1, tick=15)
+        interpolator.push("b", (0, 0, 10, 10), now=1.1, tick=15)
+        # Only "b" is in the next snapshot, "a" stopped
+        interpolator.push("b", (5, 0, 10, 10), now=1.2, tick=20)
+        interpolator.hold(now=1.2, tick=20)
+
+        self.assertEqual(interpolator.sample("a", now=1.5), (100, 0, 10, 10))
+        self.assertEqual(interpolator.sample("b", now=1.3), (5, 0, 10, 10))
+        self.assertEqual(len(interpolator.buffers["b"].snapshots), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
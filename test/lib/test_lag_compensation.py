@@ -0,0 +1,97 @@
+import unittest
+
+import numpy as np
+import pygame as pg
+
+from lib.v2.game_simple import create_game
+from lib.v2.lag_compensation import EntityHistory
+
+
+def record(history, time, tick, rects):
+    ids = list(rects)
+    values = np.array([rects[id] for id in ids], dtype=np.float64).reshape(-1, 4)
+    history.record(time, tick, ids, values[:, :2], values[:, 2:])
+
+
+class TestEntityHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = EntityHistory(capacity=4, max_entities=2)
+        record(self.history, 1.0, 10, {"a": (0, 0, 10, 10), "b": (50, 50, 5, 5)})
+        record(self.history, 1.1, 11, {"a": (100, 40, 10, 10), "b": (50, 50, 5, 5)})
+
+    def test_rewind_interpolates(self):
+        self.assertEqual(
+            self.history.rewind(1.05), {"a": (50, 20, 10, 10), "b": (50, 50, 5, 5)}
+        )
+        self.assertEqual(self.history.rect_at("a", 1.075), (75, 30, 10, 10))
+
+    def test_rewind_is_clamped(self):
+        self.assertEqual(self.history.rect_at("a", 0.0), (0, 0, 10, 10))
+        self.assertEqual(self.history.rect_at("a", 9.0), (100, 40, 10, 10))
+
+    def test_ring_buffer_keeps_capacity_ticks(self):
+        for i in range(2, 10):
+            record(self.history, 1.0 + i / 10, 10 + i, {"a": (i, 0, 10, 10)})
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(self.history.recorded, 10)
+        # Older than the oldest tick kept
+        self.assertEqual(self.history.rect_at("a", 1.0), (6, 0, 10, 10))
+        self.assertEqual(self.history.time_of_tick(18.5), 1.85)
+
+    def test_entities_on_one_side_are_not_interpolated(self):
+        record(self.history, 1.2, 12, {"a": (100, 40, 10, 10), "c": (7, 7, 7, 7)})
+        self.assertEqual(self.history.rect_at("c", 1.15), (7, 7, 7, 7))
+        self.assertEqual(self.history.rect_at("b", 1.15), (50, 50, 5, 5))
+        self.assertIsNone(self.history.rect_at("c", 1.05))
+
+    def test_removed_entity_leaves_no_past(self):
+        self.history.remove("b")
+        record(self.history, 1.2, 12, {"a": (0, 0, 10, 10), "c": (9, 9, 9, 9)})
+        self.assertEqual(self.history.columns["c"], 1)
+        self.assertNotIn("c", self.history.rewind(1.05))
+        self.assertIsNone(self.history.rect_at("b", 1.2))
+
+    def test_grows_past_max_entities(self):
+        rects = {str(i): (i, i, 1, 1) for i in range(5)}
+        record(self.history, 1.2, 12, rects)
+        self.assertEqual(self.history.rewind(1.2), rects)
+        # Still there from before growing
+        self.assertEqual(self.history.rect_at("a", 1.0), (0, 0, 10, 10))
+
+    def test_hits(self):
+        shot = (55, 22, 4, 4)
+        self.assertEqual(self.history.hits(shot, 1.05), ["a"])
+        self.assertEqual(self.history.hits(shot, 1.1), [])
+        self.assertEqual(self.history.hits(shot, 1.05, exclude=["a"]), [])
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            EntityHistory().rewind(1.0)
+
+
+class TestGameHistory(unittest.TestCase):
+    def test_off_by_default(self):
+        self.assertIsNone(create_game(is_server_mode=True, headless=True).history)
+
+    def test_records_every_tick(self):
+        game = create_game(is_server_mode=True, headless=True)
+        game.history = EntityHistory()
+        game.dt = 1 / 60
+        target = game._add_network_player("target", pg.Rect(0, 0, 20, 20))
+        game.network_sprite_lookup["target"] = target
+        for _ in range(10):
+            target.rect = target.rect.move(10, 0)
+            game.update()
+        history = game.history
+        shot = pg.Rect(32, 5, 4, 4)
+        # Where the target was three ticks in
+        self.assertEqual(history.hits(shot, history.time_of_tick(2)), ["target"])
+        now = history.time_of_tick(game.frame_count - 1)
+        self.assertEqual(history.hits(shot, now), [])
+
+        game._remove_network_player("target")
+        self.assertNotIn("target", game.history.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
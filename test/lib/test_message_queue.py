@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+
+from lib.v2.game_simple import NetworkClient
+from lib.v2.message_queue import MessageQueue
+from test.helpers import make_message
+
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+        queue.task_done()
+    return messages
+
+
+class TestMessageQueue(unittest.TestCase):
+    def test_coalesces_positions_per_player(self):
+        queue = MessageQueue()
+        for i in range(3):
+            queue.put_nowait(make_message("CLIENT_POSITION_V2", i, "a"))
+            queue.put_nowait(make_message("CLIENT_POSITION_V2", i, "b"))
+        self.assertEqual(queue.qsize(), 2)
+        self.assertEqual(queue.coalesced, 4)
+        self.assertEqual(
+            [(m.player_session_uuid, m.body) for m in drain(queue)],
+            [("a", 2), ("b", 2)],
+        )
+        # Nothing left to replace once it's been handed out
+        queue.put_nowait(make_message("CLIENT_POSITION_V2", 3, "a"))
+        self.assertEqual(queue.qsize(), 1)
+
+    def test_coalesced_messages_keep_their_order(self):
+        # A delta queued after a keyframe must not overtake it, even if an
+        # older delta was queued before it
+        queue = MessageQueue()
+        queue.put_nowait(make_message("SERVER_DELTA_V2", "delta 1", "a"))
+        queue.put_nowait(make_message("SERVER_POSITION_V2", "keyframe 2", "a"))
+        queue.put_nowait(make_message("SERVER_DELTA_V2", "delta 3", "a"))
+        queue.put_nowait(make_message("SERVER_POSITION_V2", "keyframe 4", "a"))
+        queue.put_nowait(make_message("SERVER_DELTA_V2", "delta 5", "a"))
+        self.assertEqual(queue.coalesced, 3)
+        self.assertEqual(
+            [m.body for m in drain(queue)],
+            ["keyframe 4", "delta 5"],
+        )
+
+    def test_drops_oldest_but_keeps_fifo(self):
+        queue = MessageQueue(maxsize=3)
+        queue.put_nowait(
+            make_message("CLIENT_DISCONNECTED_FROM_SERVER_V2", player_session_uuid="a")
+        )
+        for i in range(5):
+            queue.put_nowait(make_message("CLIENT_INPUT_V2", i, "b"))
+        self.assertEqual(queue.qsize(), 3)
+        self.assertEqual(queue.dropped, 3)
+        self.assertEqual(
+            [m.body for m in drain(queue)],
+            [None, 3, 4],
+        )
+
+    def test_fifo_goes_past_the_bound(self):
+        queue = MessageQueue(maxsize=2)
+        for id in "abc":
+            queue.put_nowait(
+                make_message(
+                    "CLIENT_DISCONNECTED_FROM_SERVER_V2", player_session_uuid=id
+                )
+            )
+        # Only droppable messages are turned away once it's full of events
+        queue.put_nowait(make_message("CLIENT_INPUT_V2"))
+        self.assertEqual(queue.qsize(), 3)
+        self.assertEqual(queue.dropped, 1)
+
+    def test_join_ignores_discarded_messages(self):
+        async def run():
+            queue = MessageQueue(maxsize=1)
+            for i in range(3):
+                queue.put_nowait(make_message("CLIENT_INPUT_V2", body=i))
+            self.assertEqual((await queue.get()).body, 2)
+            queue.task_done()
+            await asyncio.wait_for(queue.join(), 1)
+
+        asyncio.run(run())
+
+    def test_clients_do_not_share_queues(self):
+        first = NetworkClient()
+        second = NetworkClient()
+        first.enque_message_out(make_message("CLIENT_INPUT_V2"))
+        self.assertIsNot(first.out_queue, second.out_queue)
+        self.assertFalse(second.has_message_out())
+
+
+if __name__ == "__main__":
+    unittest.main()
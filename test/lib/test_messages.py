@@ -0,0 +1,70 @@
+import json
+import unittest
+import uuid
+
+from lib.v2.config import WireFormat
+from lib.v2.messages import (
+    EntityState,
+    decode_json_message,
+    peek_json_message_type,
+)
+from lib.v2.prediction import InputCommand
+from lib.v2.wire import encode_ws_message, peek_message_type
+from test.helpers import make_message
+
+
+class TestMessages(unittest.TestCase):
+    def test_typed_bodies(self):
+        id = str(uuid.uuid4())
+        message = make_message(
+            "SERVER_POSITION_V2",
+            [{"id": id, "class_name": "Player", "rect": [1, 2, 3, 4]}],
+            tick=7,
+        )
+        decoded = decode_json_message(message.model_dump_json())
+        self.assertEqual(decoded.tick, 7)
+        self.assertEqual(decoded.body, [EntityState(id, "Player", (1, 2, 3, 4))])
+
+        message = make_message("CLIENT_INPUT_V2", (3, 1, 0.0, 0.5, 0.016))
+        decoded = decode_json_message(message.model_dump_json())
+        self.assertEqual(decoded.body, InputCommand(3, 1, 0.016, 0.0, 0.5))
+
+    def test_bad_bodies(self):
+        for message in (
+            make_message("CLIENT_INPUT_V2", [1, 2]),
+            make_message("SERVER_POSITION_V2", [{"id": "a"}]),
+            make_message("SERVER_POSITION_V2", [{"id": "a", "rect": [1]}]),
+        ):
+            with self.assertRaises(ValueError):
+                decode_json_message(message.model_dump_json())
+        with self.assertRaises(ValueError):
+            decode_json_message(json.dumps({"message_type": "X"}))
+
+    def test_unknown_messages_pass_through(self):
+        decoded = decode_json_message("hello")
+        self.assertEqual(decoded.message_type, "UNKOWN")
+        self.assertEqual(decoded.body, "hello")
+        self.assertEqual(decode_json_message("{not json").body, "{not json")
+
+        message = make_message("SOMETHING_ELSE", {"a": [1]})
+        self.assertEqual(decode_json_message(message.model_dump_json()), message)
+
+    def test_peek(self):
+        message = make_message("CLIENT_INPUT_V2", (3, 1, 0.0, 0.0, 0.016))
+        self.assertEqual(
+            peek_json_message_type(message.model_dump_json()), "CLIENT_INPUT_V2"
+        )
+        self.assertEqual(
+            peek_json_message_type(json.dumps({"message_type": "A", "body": 1})), "A"
+        )
+        self.assertIsNone(peek_json_message_type("hello"))
+        self.assertIsNone(peek_json_message_type('{"message_type": 5'))
+        self.assertEqual(
+            peek_message_type(encode_ws_message(message, WireFormat.BINARY)),
+            "CLIENT_INPUT_V2",
+        )
+        self.assertIsNone(peek_message_type(b"XX\x02\x01"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from lib.v2.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_with_labels(self):
+        counter = self.registry.counter("messages_total", "Messages", ("type",))
+        counter.inc("A")
+        counter.inc("A")
+        counter.inc("B", amount=2.5)
+        lines = self.registry.render().splitlines()
+        self.assertEqual(lines[0], "# HELP messages_total Messages")
+        self.assertEqual(lines[1], "# TYPE messages_total counter")
+        self.assertIn('messages_total{type="A"} 2', lines)
+        self.assertIn('messages_total{type="B"} 2.5', lines)
+
+    def test_gauge_from_function(self):
+        items = [1, 2, 3]
+        self.registry.gauge("items", "Items", function=lambda: len(items))
+        self.assertIn("items 3", self.registry.render().splitlines())
+        items.pop()
+        self.assertIn("items 2", self.registry.render().splitlines())
+
+    def test_function_with_labels(self):
+        self.registry.gauge(
+            "depth", "Depth", ("queue",), function=lambda: {("in",): 1, ("out",): 4}
+        )
+        lines = self.registry.render().splitlines()
+        self.assertIn('depth{queue="in"} 1', lines)
+        self.assertIn('depth{queue="out"} 4', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("tick_seconds", "Ticks", (0.01, 0.1))
+        for value in (0.005, 0.01, 0.05, 1.0):
+            histogram.observe(value)
+        lines = self.registry.render().splitlines()
+        self.assertIn('tick_seconds_bucket{le="0.01"} 2', lines)
+        self.assertIn('tick_seconds_bucket{le="0.1"} 3', lines)
+        self.assertIn('tick_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("tick_seconds_sum 1.065", lines)
+        self.assertIn("tick_seconds_count 4", lines)
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.counter("c", "C", ("type",))
+        counter.inc('a"b\\')
+        self.assertIn('c{type="a\\"b\\\\"} 1', self.registry.render().splitlines())
+
+    def test_duplicate_name(self):
+        self.registry.counter("c", "C")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("c", "C")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import math
+import unittest
+
+import pygame as pg
+
+from lib.v2.game_simple import NetworkClient, create_game
+from lib.v2.prediction import (
+    BUTTON_DOWN,
+    BUTTON_LEFT,
+    BUTTON_RIGHT,
+    BUTTON_UP,
+    MAX_INPUT_BUDGET,
+    MAX_INPUT_DT,
+    InputCommand,
+    InputPredictor,
+    apply_input,
+    quantize_axis,
+)
+
+BOUNDS = pg.Rect(0, 0, 1280, 720)
+SPEED = 1000
+
+
+class TestApplyInput(unittest.TestCase):
+    def test_moves_and_clamps(self):
+        rect = pg.Rect(100, 100, 10, 10)
+        moved = apply_input(
+            rect, InputCommand(1, BUTTON_RIGHT | BUTTON_DOWN, 0.01), SPEED, BOUNDS
+        )
+        self.assertEqual(moved.topleft, (110, 110))
+        # Original rect is left alone
+        self.assertEqual(rect.topleft, (100, 100))
+
+        moved = apply_input(
+            rect, InputCommand(2, BUTTON_LEFT | BUTTON_UP, 1.0), SPEED, BOUNDS
+        )
+        self.assertEqual(moved.topleft, (0, 0))
+
+    def test_analog_axes(self):
+        rect = pg.Rect(100, 100, 10, 10)
+        moved = apply_input(
+            rect, InputCommand(1, 0, 0.01, axis_x=0.5, axis_y=-1.0), SPEED, BOUNDS
+        )
+        self.assertEqual(moved.topleft, (105, 90))
+        # Buttons and stick together still can't go faster than full speed
+        moved = apply_input(
+            rect, InputCommand(1, BUTTON_RIGHT, 0.01, axis_x=1.0), SPEED, BOUNDS
+        )
+        self.assertEqual(moved.topleft, (110, 100))
+
+    def test_from_body_clamps(self):
+        command = InputCommand.from_body(["3", 1, 2.0, -0.5, 5])
+        self.assertEqual(command.seq, 3)
+        self.assertEqual(command.dt, MAX_INPUT_DT)
+        self.assertEqual(command.axis_x, 1.0)
+        self.assertEqual(command.axis_y, -0.5)
+        self.assertEqual(InputCommand.from_body(command.to_body()), command)
+        with self.assertRaises(ValueError):
+            InputCommand.from_body([1])
+
+    def test_from_body_rejects_non_finite(self):
+        for bad in (math.nan, math.inf, -math.inf):
+            for index in (2, 3, 4):
+                body = [1, 0, 0.0, 0.0, 0.016]
+                body[index] = bad
+                with self.subTest(body=body), self.assertRaises(ValueError):
+                    InputCommand.from_body(body)
+
+
+class TestInputPredictor(unittest.TestCase):
+    def setUp(self):
+        self.predictor = InputPredictor()
+        self.server_rect = pg.Rect(100, 100, 10, 10)
+        self.predicted = self.server_rect
+        for _ in range(3):
+            command = self.predictor.record(BUTTON_RIGHT, 0.016)
+            self.predicted = apply_input(self.predicted, command, SPEED, BOUNDS)
+
+    def test_replays_unacknowledged_inputs(self):
+        # Server has only processed the first input
+        server_rect = apply_input(
+            self.server_rect, self.predictor.pending[0], SPEED, BOUNDS
+        )
+        rect = self.predictor.reconcile(1, server_rect, self.predicted, SPEED, BOUNDS)
+        self.assertEqual(rect, self.predicted)
+        self.assertEqual(self.predictor.corrections, 0)
+        self.assertEqual([c.seq for c in self.predictor.pending], [2, 3])
+
+    def test_server_wins(self):
+        rect = self.predictor.reconcile(
+            3, pg.Rect(500, 500, 10, 10), self.predicted, SPEED, BOUNDS
+        )
+        self.assertEqual(rect, pg.Rect(500, 500, 10, 10))
+        self.assertEqual(self.predictor.corrections, 1)
+        self.assertEqual(len(self.predictor.pending), 0)
+
+    def test_record_quantizes(self):
+        command = self.predictor.record(BUTTON_UP, 0.01666, 0.3)
+        self.assertEqual(command.dt, 0.017)
+        self.assertEqual(command.axis_x, quantize_axis(0.3))
+        self.assertEqual(round(command.axis_x * 127), 38)
+
+    def test_ignores_old_acks(self):
+        self.predictor.reconcile(2, self.server_rect, self.predicted, SPEED, BOUNDS)
+        self.assertIsNone(
+            self.predictor.reconcile(1, self.server_rect, self.predicted, SPEED, BOUNDS)
+        )
+
+
+class TestServerInputs(unittest.TestCase):
+    def setUp(self):
+        self.game = create_game(is_server_mode=True, headless=True)
+        self.id = "player"
+
+    def y(self):
+        return self.game.network_sprite_lookup[self.id].rect.y
+
+    def test_replayed_inputs_are_skipped(self):
+        self.game._apply_network_input(self.id, InputCommand(1, BUTTON_DOWN, 0.01))
+        start = self.y()
+        self.game._apply_network_input(self.id, InputCommand(1, BUTTON_DOWN, 0.01))
+        self.game._apply_network_input(self.id, InputCommand(0, BUTTON_DOWN, 0.01))
+        self.assertEqual(self.y(), start)
+        self.game._apply_network_input(self.id, InputCommand(2, BUTTON_DOWN, 0.01))
+        self.assertGreater(self.y(), start)
+        self.assertEqual(self.game.last_processed_input[self.id], 2)
+
+    def test_non_finite_inputs_are_dropped(self):
+        self.game._apply_network_input(self.id, [1, BUTTON_DOWN, 0, 0, 0.01])
+        start = self.game.network_sprite_lookup[self.id].rect.copy()
+        self.game._apply_network_input(self.id, [2, BUTTON_DOWN, 0, 0, math.nan])
+        self.game._apply_network_input(self.id, [3, 0, math.inf, 0, 0.01])
+        self.assertEqual(self.game.network_sprite_lookup[self.id].rect, start)
+        self.assertEqual(self.game.last_processed_input[self.id], 1)
+
+    def test_more_inputs_dont_move_faster(self):
+        """Five inputs worth of time every tick."""
+        seq = 0
+        ticks = 12
+        for _ in range(ticks):
+            self.game.sim_time += 1 / 60
+            for _ in range(5):
+                seq += 1
+                command = InputCommand(seq, BUTTON_DOWN, 0.05)
+                self.game._apply_network_input(self.id, command)
+        allowed = SPEED * (MAX_INPUT_BUDGET + ticks / 60)
+        self.assertLessEqual(self.y(), allowed + 1)
+        self.assertGreater(self.y(), allowed - 20)
+
+    def test_bad_input_time_keeps_the_cap(self):
+        self.game._apply_network_input(self.id, InputCommand(1, 0, 0.0))
+        start = self.y()
+        # Straight to the game, past the checks of `InputCommand.from_body()`
+        self.game._apply_network_input(self.id, InputCommand(2, BUTTON_DOWN, math.nan))
+        for seq in range(3, 40):
+            self.game._apply_network_input(self.id, InputCommand(seq, BUTTON_DOWN, 0.1))
+        # No server time passed, so only the starting budget
+        self.assertLessEqual(self.y() - start, SPEED * MAX_INPUT_BUDGET + 1)
+
+    def test_leftover_time_carries_over(self):
+        self.game.sim_time += 1.0
+        self.game._apply_network_input(self.id, InputCommand(1, 0, 0.0))
+        # Saved up, but only up to `MAX_INPUT_BUDGET`
+        self.game.sim_time += 1.0
+        self.game._apply_network_input(self.id, InputCommand(2, BUTTON_DOWN, 0.1))
+        self.game._apply_network_input(self.id, InputCommand(3, BUTTON_DOWN, 0.1))
+        self.game._apply_network_input(self.id, InputCommand(4, BUTTON_DOWN, 0.1))
+        budget, _ = self.game.input_budgets[self.id]
+        self.assertAlmostEqual(budget, 0.0)
+        self.assertAlmostEqual(self.y(), SPEED * MAX_INPUT_BUDGET, delta=3)
+
+
+class TestClientInputs(unittest.TestCase):
+    def test_only_sends_input(self):
+        game = create_game(is_server_mode=False, headless=True)
+        game.network_client = NetworkClient()
+        game.dt = 1 / 60
+        game._send_input(0)
+        game._send_input(0, 0.0, 0.0)
+        self.assertFalse(game.network_client.has_message_out())
+        self.assertEqual(len(game.predictor.pending), 0)
+
+        game._send_input(BUTTON_RIGHT)
+        game._send_input(0, 0.5)
+        sent = []
+        while game.network_client.has_message_out():
+            sent.append(game.network_client.out_queue.get_nowait().body[0])
+        self.assertEqual(sent, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import pygame as pg
+
+from lib.text_cache import TextCache
+
+
+class TestTextCache(unittest.TestCase):
+    def setUp(self):
+        pg.font.init()
+        self.font = pg.font.Font(None, 20)
+
+    def test_same_text_is_rendered_once(self):
+        cache = TextCache()
+        first = cache.render(self.font, "FPS: 60", False, "yellow")
+        second = cache.render(self.font, "FPS: 60", False, "yellow")
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_key_has_every_argument(self):
+        cache = TextCache()
+        other_font = pg.font.Font(None, 30)
+        surfaces = [
+            cache.render(self.font, "a", False, "yellow"),
+            cache.render(self.font, "b", False, "yellow"),
+            cache.render(self.font, "a", True, "yellow"),
+            cache.render(self.font, "a", False, "pink"),
+            cache.render(self.font, "a", False, "yellow", "black"),
+            cache.render(other_font, "a", False, "yellow"),
+        ]
+        self.assertEqual(len({id(surface) for surface in surfaces}), len(surfaces))
+        self.assertEqual(cache.misses, len(surfaces))
+
+    def test_pg_color(self):
+        cache = TextCache()
+        first = cache.render(self.font, "a", False, pg.Color(255, 0, 0))
+        second = cache.render(self.font, "a", False, pg.Color(255, 0, 0))
+        self.assertIs(first, second)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TextCache(max_entries=2)
+        a = cache.render(self.font, "a", False, "white")
+        cache.render(self.font, "b", False, "white")
+        # Makes "b" the oldest
+        cache.render(self.font, "a", False, "white")
+        cache.render(self.font, "c", False, "white")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIs(cache.render(self.font, "a", False, "white"), a)
+        misses = cache.misses
+        cache.render(self.font, "b", False, "white")
+        self.assertEqual(cache.misses, misses + 1)
+
+    def test_bad_max_entries(self):
+        with self.assertRaises(ValueError):
+            TextCache(max_entries=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+
+from lib.v2.tick_profiler import TickProfiler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTickProfiler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.profiler = TickProfiler(
+            ("poll", "send", "render"), budget=0.010, capacity=4, clock=self.clock
+        )
+
+    def run_tick(self, tick, poll, send, render):
+        self.profiler.begin_tick(tick)
+        for phase, duration in (("poll", poll), ("send", send), ("render", render)):
+            self.clock.now += duration
+            self.profiler.mark(phase)
+        self.profiler.end_tick()
+
+    def test_overruns_blame_slowest_phase(self):
+        self.run_tick(0, 0.001, 0.002, 0.003)
+        self.run_tick(1, 0.001, 0.020, 0.003)
+        self.assertEqual(self.profiler.overruns, 1)
+        self.assertEqual(self.profiler.overrun_phases, {"send": 1})
+
+        summary = self.profiler.summary()
+        self.assertEqual(summary["window_ticks"], 2)
+        self.assertAlmostEqual(summary["phases"]["send"]["max_ms"], 20)
+        self.assertAlmostEqual(summary["phases"]["total"]["max_ms"], 24)
+        histogram = summary["phases"]["send"]["histogram"]
+        self.assertEqual(histogram["<4ms"], 1)
+        self.assertEqual(histogram["<32ms"], 1)
+        self.assertEqual(sum(histogram.values()), 2)
+
+    def test_ring_buffer_keeps_latest(self):
+        for tick in range(10):
+            self.run_tick(tick, 0.001, 0.001, 0.001)
+        summary = self.profiler.summary()
+        self.assertEqual(summary["recorded_ticks"], 10)
+        self.assertEqual(summary["window_ticks"], 4)
+
+        ticks = [
+            event["args"]["tick"]
+            for event in self.profiler.chrome_trace()["traceEvents"]
+            if event["name"] == "tick"
+        ]
+        self.assertEqual(ticks, [6, 7, 8, 9])
+
+    def test_chrome_trace(self):
+        self.run_tick(5, 0.001, 0.0, 0.002)
+        events = self.profiler.chrome_trace()["traceEvents"]
+        # Phases that took no time are left out
+        self.assertEqual([e["name"] for e in events], ["tick", "poll", "render"])
+        self.assertAlmostEqual(events[0]["dur"], 3000)
+        self.assertAlmostEqual(events[2]["ts"], 1000)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.profiler.dump_chrome_trace(path)
+            with open(path) as f:
+                self.assertEqual(len(json.load(f)["traceEvents"]), 3)
+
+    def test_empty_summary(self):
+        summary = self.profiler.summary()
+        self.assertEqual(summary["phases"]["total"]["max_ms"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
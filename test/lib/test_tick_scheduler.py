@@ -0,0 +1,98 @@
+import asyncio
+import time
+import unittest
+
+from lib.v2.tick_scheduler import TickScheduler
+
+
+class FakeGame:
+    """Stands in for `Game`, only needs `running`, `dt` and `update()`."""
+
+    def __init__(self, tick_limit, work_seconds=0.0, slow_tick=None, bad_tick=None):
+        self.running = True
+        self.dt = 0.0
+        self.updates = 0
+        self.tick_limit = tick_limit
+        self.work_seconds = work_seconds
+        self.slow_tick = slow_tick
+        self.bad_tick = bad_tick
+
+    def update(self):
+        self.updates += 1
+        if self.updates == self.bad_tick:
+            raise KeyError("bad tick")
+        if self.slow_tick is not None and self.updates == self.slow_tick:
+            time.sleep(0.2)
+        elif self.work_seconds:
+            time.sleep(self.work_seconds)
+        if self.updates >= self.tick_limit:
+            self.running = False
+
+
+class TestTickScheduler(unittest.TestCase):
+    def test_fixed_rate(self):
+        scheduler = TickScheduler(tick_rate=100)
+        game = FakeGame(tick_limit=20)
+
+        start = time.perf_counter()
+        asyncio.run(scheduler.run(game))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(scheduler.stats.ticks, 20)
+        self.assertEqual(game.dt, 0.01)
+        self.assertEqual(scheduler.stats.overruns, 0)
+        # 19 waits of 10ms between 20 ticks
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertLess(elapsed, 0.5)
+
+    def test_event_loop_runs_between_ticks(self):
+        scheduler = TickScheduler(tick_rate=50)
+        game = FakeGame(tick_limit=10)
+        other_task_runs = 0
+
+        async def other_task():
+            nonlocal other_task_runs
+            while game.running:
+                other_task_runs += 1
+                await asyncio.sleep(0.001)
+
+        async def main():
+            await asyncio.gather(scheduler.run(game), other_task())
+
+        asyncio.run(main())
+        self.assertGreater(other_task_runs, 10)
+
+    def test_overruns_counted(self):
+        scheduler = TickScheduler(tick_rate=200)
+        game = FakeGame(tick_limit=5, work_seconds=0.01)
+        asyncio.run(scheduler.run(game))
+
+        self.assertEqual(scheduler.stats.overruns, 5)
+        self.assertGreaterEqual(scheduler.stats.max_tick_duration, 0.01)
+
+    def test_skips_when_too_far_behind(self):
+        scheduler = TickScheduler(tick_rate=100, max_catch_up_ticks=3)
+        game = FakeGame(tick_limit=10, slow_tick=2)
+        asyncio.run(scheduler.run(game))
+
+        # The 200ms tick puts the scheduler ~19 ticks behind, which is
+        # more than it's allowed to catch up.
+        self.assertGreater(scheduler.stats.skipped_ticks, 3)
+        self.assertEqual(scheduler.stats.ticks, 10)
+
+    def test_keeps_ticking_after_errors(self):
+        scheduler = TickScheduler(tick_rate=200)
+        game = FakeGame(tick_limit=5, bad_tick=2)
+        with self.assertLogs("lib.v2.tick_scheduler", "ERROR"):
+            asyncio.run(scheduler.run(game))
+
+        self.assertEqual(game.updates, 5)
+        self.assertEqual(scheduler.stats.errors, 1)
+
+    def test_invalid_tick_rate(self):
+        with self.assertRaises(ValueError):
+            TickScheduler(tick_rate=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
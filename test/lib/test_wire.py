@@ -0,0 +1,129 @@
+import unittest
+import uuid
+
+from lib.v1.common import WS_Message
+from lib.v2.config import WireFormat
+from lib.v2.prediction import BUTTON_LEFT, BUTTON_UP, InputPredictor
+from lib.v2.wire import (
+    INPUT,
+    EntityState,
+    decode_input,
+    decode_snapshot,
+    decode_ws_message,
+    encode_snapshot,
+    encode_ws_message,
+    parse_wire_format,
+)
+
+
+def make_position_message(count=3):
+    return WS_Message(
+        player_session_uuid=str(uuid.uuid4()),
+        message_type="SERVER_POSITION_V2",
+        body=[
+            {
+                "id": str(uuid.uuid4()),
+                "class_name": "Player",
+                "rect": (i, i * 2, 40, 30),
+            }
+            for i in range(count)
+        ],
+        tick=42,
+    )
+
+
+class TestWire(unittest.TestCase):
+    def test_round_trip(self):
+        message = make_position_message()
+        decoded = decode_snapshot(encode_snapshot(message))
+
+        self.assertEqual(decoded.player_session_uuid, message.player_session_uuid)
+        self.assertEqual(decoded.message_type, message.message_type)
+        self.assertEqual(decoded.tick, 42)
+        self.assertEqual(len(decoded.body), 3)
+        for item, state in zip(message.body, decoded.body):
+            self.assertIsInstance(state, EntityState)
+            self.assertEqual(state.id, item["id"])
+            self.assertEqual(state.class_name, "Player")
+            self.assertEqual(state.rect, item["rect"])
+
+    def test_binary_is_smaller_than_json(self):
+        message = make_position_message(50)
+        self.assertLess(
+            len(encode_snapshot(message)), len(message.model_dump_json()) / 3
+        )
+
+    def test_json_fallback(self):
+        disconnect = WS_Message(
+            player_session_uuid=str(uuid.uuid4()),
+            message_type="CLIENT_DISCONNECTED_FROM_SERVER_V2",
+            body="",
+        )
+        self.assertIsInstance(encode_ws_message(disconnect, WireFormat.BINARY), str)
+
+        # Ids that aren't UUIDs can't be packed, so JSON is used instead
+        message = make_position_message()
+        message.body[0]["id"] = "not-a-uuid"
+        self.assertIsInstance(encode_ws_message(message, WireFormat.BINARY), str)
+
+        message = make_position_message()
+        self.assertIsInstance(encode_ws_message(message, WireFormat.JSON), str)
+        self.assertIsInstance(encode_ws_message(message, WireFormat.BINARY), bytes)
+
+    def test_decode_ws_message(self):
+        message = make_position_message()
+        for wire_format in WireFormat:
+            decoded = decode_ws_message(encode_ws_message(message, wire_format))
+            self.assertEqual(decoded.message_type, "SERVER_POSITION_V2")
+            self.assertEqual(len(decoded.body), 3)
+
+    def test_input_round_trip(self):
+        command = InputPredictor().record(BUTTON_UP | BUTTON_LEFT, 0.0166, -0.42, 0.9)
+        message = WS_Message(
+            player_session_uuid=str(uuid.uuid4()),
+            message_type="CLIENT_INPUT_V2",
+            body=command.to_body(),
+        )
+        data = encode_ws_message(message, WireFormat.BINARY)
+        self.assertEqual(len(data), INPUT.size)
+
+        for frame in (data, encode_ws_message(message, WireFormat.JSON)):
+            decoded = decode_ws_message(frame)
+            self.assertEqual(decoded.message_type, "CLIENT_INPUT_V2")
+            # Recorded commands survive the trip exactly, so the server
+            # replays the same movement the client predicted
+            self.assertEqual(decoded.body, command)
+
+        with self.assertRaises(ValueError):
+            decode_input(data[:-1])
+
+    def test_non_finite_json_input(self):
+        for bad in ("NaN", "Infinity", "-Infinity"):
+            for body in (
+                f"[1,0,0,0,{bad}]",
+                f"[1,0,{bad},0,0.01]",
+                f"[1,0,0,{bad},0.01]",
+            ):
+                data = (
+                    '{"player_session_uuid":"a","message_type":"CLIENT_INPUT_V2",'
+                    f'"body":{body}}}'
+                )
+                with self.subTest(body=body), self.assertRaises(ValueError):
+                    decode_ws_message(data)
+
+    def test_truncated_frame(self):
+        data = encode_snapshot(make_position_message())
+        with self.assertRaises(ValueError):
+            decode_snapshot(data[:-1])
+        with self.assertRaises(ValueError):
+            decode_snapshot(b"XX")
+
+    def test_parse_wire_format(self):
+        self.assertIs(parse_wire_format("binary"), WireFormat.BINARY)
+        self.assertIs(parse_wire_format("BINARY"), WireFormat.BINARY)
+        self.assertIs(parse_wire_format("msgpack"), WireFormat.JSON)
+        self.assertIs(parse_wire_format(None), WireFormat.JSON)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from server.fan_out import ConnectionSender, OverflowPolicy
+from test.helpers import FakeWebSocket
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestConnectionSender(unittest.TestCase):
+    def test_sends_in_order(self):
+        async def main():
+            ws = FakeWebSocket()
+            sender = ConnectionSender(ws, "a")
+            sender.start()
+            sender.enqueue("one")
+            sender.enqueue(b"two")
+            await settle()
+            sender.stop()
+            return ws, sender
+
+        ws, sender = asyncio.run(main())
+        self.assertEqual(ws.sent, ["one", b"two"])
+        self.assertEqual(sender.sent_frames, 2)
+
+    def test_slow_client_does_not_block_others(self):
+        async def main():
+            slow_ws, fast_ws = FakeWebSocket(stalled=True), FakeWebSocket()
+            slow = ConnectionSender(slow_ws, "slow", max_queue_size=4)
+            fast = ConnectionSender(fast_ws, "fast", max_queue_size=4)
+            slow.start()
+            fast.start()
+            for i in range(10):
+                for sender in (slow, fast):
+                    sender.enqueue(f"position {i}")
+                await settle()
+            slow_ws.unstall.set()
+            await settle()
+            slow.stop()
+            fast.stop()
+            return slow_ws, fast_ws, slow
+
+        slow_ws, fast_ws, slow = asyncio.run(main())
+        self.assertEqual(len(fast_ws.sent), 10)
+        # One frame was in flight when it stalled, then the queue of 4
+        # kept only the newest positions.
+        self.assertEqual(
+            slow_ws.sent,
+            ["position 0", "position 6", "position 7", "position 8", "position 9"],
+        )
+        self.assertEqual(slow.dropped_frames, 5)
+
+    def test_never_drop_frames_are_kept(self):
+        sender = ConnectionSender(FakeWebSocket(), "a", max_queue_size=2)
+        sender.enqueue("disconnect 1", OverflowPolicy.NEVER_DROP)
+        sender.enqueue("position 1")
+        sender.enqueue("disconnect 2", OverflowPolicy.NEVER_DROP)
+        sender.enqueue("disconnect 3", OverflowPolicy.NEVER_DROP)
+        self.assertFalse(sender.enqueue("position 2"))
+
+        frames = [data for data, _ in sender._frames]
+        self.assertEqual(frames, ["disconnect 1", "disconnect 2", "disconnect 3"])
+        self.assertEqual(sender.dropped_frames, 2)
+
+    def test_send_failure_closes_sender(self):
+        async def main():
+            sender = ConnectionSender(FakeWebSocket(broken=True), "a")
+            sender.start()
+            sender.enqueue("one")
+            await settle()
+            return sender
+
+        sender = asyncio.run(main())
+        self.assertTrue(sender.closed)
+        self.assertEqual(sender.send_failures, 1)
+        self.assertFalse(sender.enqueue("two"))
+
+
+if __name__ == "__main__":
+    unittest.main()
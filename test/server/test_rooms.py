@@ -0,0 +1,230 @@
+import asyncio
+import unittest
+from unittest import mock
+import uuid
+
+from lib.v2.config import DEFAULT_ROOM_ID, WireFormat
+from lib.v2.wire import decode_ws_message
+from server.v2 import app
+from server.v2.rooms import ConnectionManager, RoomManager
+from test.helpers import FakeWebSocket, make_snapshot
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestRoomManager(unittest.TestCase):
+    def test_rooms_are_isolated(self):
+        async def main():
+            rooms = RoomManager(idle_timeout=0.01)
+            a = rooms.join("a")
+            b = rooms.join("b")
+            await settle()
+            await rooms.close_all()
+            return a, b
+
+        a, b = asyncio.run(main())
+        self.assertIsNot(a.game, b.game)
+        self.assertIsNot(a.network_client, b.network_client)
+        self.assertIsNot(a.network_client.in_queue, b.network_client.in_queue)
+        self.assertIsNot(a.game.local_game_sprites, b.game.local_game_sprites)
+        self.assertIsNot(a.game.network_sprite_lookup, b.game.network_sprite_lookup)
+        self.assertIsNot(a.game.clock, b.game.clock)
+        self.assertIsNone(a.game.screen)
+        self.assertFalse(a.game.owns_display())
+        self.assertIs(a.game.network_client, a.network_client)
+        self.assertEqual(len(a.game.local_game_sprites), 1)
+
+    def test_join_returns_running_room(self):
+        async def main():
+            rooms = RoomManager()
+            first = rooms.join("a")
+            second = rooms.join("a")
+            await settle()
+            ticks = first.scheduler.stats.ticks
+            await rooms.close_all()
+            return first, second, ticks
+
+        first, second, ticks = asyncio.run(main())
+        self.assertIs(first, second)
+        self.assertGreater(ticks, 0)
+        self.assertFalse(first.game.running)
+
+    def test_bad_room_ids(self):
+        rooms = RoomManager(max_rooms=1)
+        for room_id in ("", "a/b", "x" * 33):
+            with self.assertRaises(ValueError):
+                rooms.join(room_id)
+
+    def test_max_rooms(self):
+        async def main():
+            rooms = RoomManager(max_rooms=1)
+            rooms.join("a")
+            try:
+                with self.assertRaises(ValueError):
+                    rooms.join("b")
+            finally:
+                await rooms.close_all()
+
+        asyncio.run(main())
+
+    def test_empty_room_closes_after_idle_timeout(self):
+        async def main():
+            rooms = RoomManager(idle_timeout=0.01)
+            room = rooms.join("a")
+            rooms.leave(room)
+            await asyncio.sleep(0.05)
+            return rooms, room
+
+        rooms, room = asyncio.run(main())
+        self.assertNotIn("a", rooms.rooms)
+        self.assertFalse(room.game.running)
+
+    def test_rejoin_cancels_close(self):
+        async def main():
+            rooms = RoomManager(idle_timeout=0.01)
+            room = rooms.join("a")
+            rooms.leave(room)
+            rejoined = rooms.join("a")
+            await asyncio.sleep(0.05)
+            is_open = "a" in rooms.rooms
+            await rooms.close_all()
+            return room, rejoined, is_open
+
+        room, rejoined, is_open = asyncio.run(main())
+        self.assertIs(room, rejoined)
+        self.assertTrue(is_open)
+
+    def test_default_room_stays_open(self):
+        async def main():
+            rooms = RoomManager(idle_timeout=0.01)
+            room = rooms.join(DEFAULT_ROOM_ID)
+            rooms.leave(room)
+            await asyncio.sleep(0.05)
+            is_open = DEFAULT_ROOM_ID in rooms.rooms
+            await rooms.close_all()
+            return room, is_open
+
+        room, is_open = asyncio.run(main())
+        self.assertTrue(is_open)
+
+    def test_debug_view_only_in_default_room(self):
+        async def main():
+            rooms = RoomManager(debug_view_every_n_ticks=10)
+            default = rooms.join(DEFAULT_ROOM_ID)
+            other = rooms.join("a")
+            await rooms.close_all()
+            return default, other
+
+        default, other = asyncio.run(main())
+        self.assertTrue(default.game.owns_display())
+        self.assertEqual(default.game.render_every_n_frames, 10)
+        self.assertIsNone(other.game.screen)
+
+
+class TestPlayInRoom(unittest.TestCase):
+    def test_leaves_room_when_connection_breaks(self):
+        """Not with a `WebSocketDisconnect`, the player still has to go."""
+
+        async def main():
+            rooms = RoomManager(idle_timeout=0.01)
+            with mock.patch.object(app, "ROOMS", rooms):
+                with self.assertRaises(RuntimeError):
+                    await app.play_in_room(
+                        FakeWebSocket(broken=True), "a", "gone", WireFormat.JSON.value
+                    )
+            room = rooms.rooms["a"]
+            players = room.player_count
+            await asyncio.sleep(0.05)
+            return rooms, room, players
+
+        rooms, room, players = asyncio.run(main())
+        self.assertEqual(players, 0)
+        self.assertNotIn("gone", room.connections.active_player_uuids)
+        # Closed once it was idle for long enough
+        self.assertNotIn("a", rooms.rooms)
+        self.assertFalse(room.game.running)
+
+
+class TestIdlePlayers(unittest.TestCase):
+    def test_idle_player_is_in_snapshots(self):
+        """A client that never pressed anything, so never sent an input."""
+
+        async def main():
+            rooms = RoomManager()
+            room = rooms.join("a")
+            websocket = FakeWebSocket()
+            await room.connections.connect(websocket, "idle", WireFormat.JSON)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if websocket.sent:
+                    break
+            room.connections.active_connections[websocket].stop()
+            await rooms.close_all()
+            return websocket.sent
+
+        sent = asyncio.run(main())
+        snapshot = decode_ws_message(sent[0])
+        self.assertEqual(snapshot.message_type, "SERVER_POSITION_V2")
+        self.assertIn("idle", [state.id for state in snapshot.body])
+
+
+class TestDeltaBroadcast(unittest.TestCase):
+    def test_deltas_after_ack(self):
+        async def main():
+            manager = ConnectionManager(None)
+            acking, silent = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(acking, "a", WireFormat.BINARY)
+            await manager.connect(silent, "b", WireFormat.BINARY)
+            manager.broadcast_ws_message(make_snapshot(tick=5))
+            manager.acknowledge(acking, 5)
+            manager.broadcast_ws_message(make_snapshot(tick=10, moved_x=50))
+            await settle()
+            for sender in manager.active_connections.values():
+                sender.stop()
+            return acking.sent, silent.sent
+
+        acking, silent = asyncio.run(main())
+        types = [decode_ws_message(data).message_type for data in acking]
+        self.assertEqual(types, ["SERVER_POSITION_V2", "SERVER_DELTA_V2"])
+        delta = decode_ws_message(acking[1]).body
+        self.assertEqual(delta.baseline_tick, 5)
+        self.assertEqual([entity.position for entity in delta.changed], [(50, 0)])
+        self.assertLess(len(acking[1]), len(acking[0]) / 5)
+        # Clients that never ack keep getting full snapshots
+        types = [decode_ws_message(data).message_type for data in silent]
+        self.assertEqual(types, ["SERVER_POSITION_V2", "SERVER_POSITION_V2"])
+
+    def test_own_input_seq_only(self):
+        """Players standing still but sending inputs don't show up."""
+        ids = [str(uuid.UUID(int=i + 1)) for i in (1, 2, 3)]
+
+        async def main():
+            manager = ConnectionManager(None)
+            websockets = [FakeWebSocket() for _ in ids]
+            formats = [WireFormat.BINARY, WireFormat.BINARY, WireFormat.JSON]
+            for websocket, id, wire_format in zip(websockets, ids, formats):
+                await manager.connect(websocket, id, wire_format)
+            manager.broadcast_ws_message(make_snapshot(tick=5, input_seq=10))
+            for websocket in websockets:
+                manager.acknowledge(websocket, 5)
+            manager.broadcast_ws_message(make_snapshot(tick=10, input_seq=20))
+            await settle()
+            for sender in manager.active_connections.values():
+                sender.stop()
+            return [websocket.sent[1] for websocket in websockets]
+
+        deltas = asyncio.run(main())
+        for i, data in enumerate(deltas):
+            delta = decode_ws_message(data).body
+            self.assertEqual(delta.changed, [])
+            self.assertEqual(delta.input_seq, 20 + i + 1)
+        # Everything else is shared
+        self.assertEqual(len(deltas[0]), len(deltas[1]))
+        self.assertNotEqual(deltas[0], deltas[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
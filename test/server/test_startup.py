@@ -0,0 +1,27 @@
+import json
+import subprocess
+import sys
+import unittest
+
+CHECK = """
+import json, sys
+import server.v2.app
+print(json.dumps(sorted(m for m in ("pygame", "numpy") if m in sys.modules)))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def test_app_import_is_light(self):
+        """
+        Workers only need pygame once they run a room, importing the app
+        must not pull it in or open a display.
+        """
+        result = subprocess.run(
+            [sys.executable, "-c", CHECK], capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+from collections import Counter
+import json
+import socket
+import unittest
+
+from websockets import connect
+
+from lib.v1.common import WS_Message
+from lib.v2.config import DEFAULT_ROOM_ID, TEST_HOST, FullPath, WireFormat
+from lib.v2.prediction import InputCommand
+from lib.v2.wire import encode_ws_message
+from server.v2.supervisor import Router, Supervisor, room_for_path, worker_for_room
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((TEST_HOST, 0))
+        return sock.getsockname()[1]
+
+
+class TestSupervisor(unittest.TestCase):
+    def test_worker_for_room_is_stable(self):
+        # Has to match between processes, unlike `hash()`
+        self.assertEqual(worker_for_room("abc", 4), worker_for_room("abc", 4))
+        self.assertEqual(worker_for_room("abc", 1), 0)
+
+    def test_rooms_spread_over_workers(self):
+        counts = Counter(worker_for_room(f"room-{i}", 4) for i in range(1000))
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        self.assertGreater(min(counts.values()), 200)
+
+    def test_only_owner_starts_default_room(self):
+        supervisor = Supervisor(workers=3, base_port=9000)
+        self.assertEqual([w.port for w in supervisor.workers], [9001, 9002, 9003])
+        starts = [w.env["START_DEFAULT_ROOM"] for w in supervisor.workers]
+        self.assertEqual(starts.count("true"), 1)
+        owner = supervisor.worker_for_room(DEFAULT_ROOM_ID)
+        self.assertEqual(owner.env["START_DEFAULT_ROOM"], "true")
+
+    def test_needs_workers(self):
+        with self.assertRaises(ValueError):
+            Supervisor(workers=0, base_port=9000)
+
+    def test_room_for_path(self):
+        self.assertEqual(
+            room_for_path("/v2/ws/abc?wire_format=binary"), DEFAULT_ROOM_ID
+        )
+        self.assertEqual(room_for_path("/v2/rooms/red%20team/ws/abc"), "red team")
+        self.assertIsNone(room_for_path("/v2/rooms"))
+        self.assertIsNone(room_for_path("/v2/rooms/a/ws/abc/more"))
+        self.assertIsNone(room_for_path(FullPath.WORKERS.value))
+
+
+class TestRouter(unittest.TestCase):
+    def test_hands_connections_to_worker(self):
+        """A real worker process that gets the player's socket."""
+
+        async def main():
+            supervisor = Supervisor(workers=1, base_port=free_port() - 1)
+            listener = socket.create_server((TEST_HOST, 0))
+            port = listener.getsockname()[1]
+            supervisor.start()
+            router = asyncio.create_task(Router(supervisor).serve(listener))
+            try:
+                await supervisor.wait_until_listening()
+                url = f"ws://{TEST_HOST}:{port}{FullPath.WS.value}".replace(
+                    "{player_session_uuid}", "abc"
+                )
+                command = InputCommand(seq=1, buttons=0, dt=1 / 60, axis_x=1.0)
+                async with connect(url) as websocket:
+                    # Players show up in snapshots once they sent something
+                    await websocket.send(
+                        encode_ws_message(
+                            WS_Message(
+                                player_session_uuid="abc",
+                                message_type="CLIENT_INPUT_V2",
+                                body=command.to_body(),
+                            ),
+                            WireFormat.JSON,
+                        )
+                    )
+                    first = await asyncio.wait_for(websocket.recv(), 10)
+
+                reader, writer = await asyncio.open_connection(TEST_HOST, port)
+                writer.write(f"GET {FullPath.WORKERS.value} HTTP/1.1\r\n\r\n".encode())
+                response = await reader.read()
+                writer.close()
+                return first, response
+            finally:
+                router.cancel()
+                listener.close()
+                supervisor.stop()
+
+        first, response = asyncio.run(main())
+        self.assertTrue(first)
+        head, body = response.split(b"\r\n\r\n", 1)
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+        workers = json.loads(body)
+        self.assertEqual(len(workers), 1)
+        self.assertEqual(workers[0]["handed_off"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
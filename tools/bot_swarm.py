@@ -0,0 +1,397 @@
+"""
+Load generator for the v2 server.  Starts a swarm of headless bots that
+speak the same websocket protocol as `client/v2/client.py` (input
+commands out, position snapshots in) and reports how the server holds
+up:
+
+- connect time: until the websocket handshake is done
+- snapshot inter-arrival time and jitter (standard deviation of it)
+- end to end latency: from sending an input until a snapshot
+  acknowledges it with `last_input_seq`
+- bytes per second sent and received per bot
+
+Bots acknowledge the snapshots they got like the client does, so the
+server sends them deltas (see `lib/v2/delta.py`), unless `--no-deltas`
+is passed.
+
+Everything runs on localhost.  Start the server first, or pass
+`--spawn-server` to have this start one in a subprocess:
+
+```
+python tools/bot_swarm.py --bots 200 --duration 30 --spawn-server
+```
+
+or
+
+```
+bazel run //:bot_swarm -- --bots 200 --duration 30
+```
+
+Hundreds of bots need more open files than the default limit on some
+systems, the soft limit gets raised to the hard limit on start up.
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import json
+import math
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+import uuid
+
+from websockets import connect
+
+from lib.v1.common import WS_Message
+from lib.v2.config import TEST_HOST, FullPath, WireFormat
+from lib.v2.delta import DeltaDecoder
+from lib.v2.messages import EntityState
+from lib.v2.prediction import (
+    BUTTON_DOWN,
+    BUTTON_LEFT,
+    BUTTON_RIGHT,
+    BUTTON_UP,
+    InputPredictor,
+)
+from lib.v2.wire import (
+    decode_ws_message,
+    encode_ws_message,
+    parse_wire_format,
+    peek_message_type,
+)
+
+# How long each step of a movement pattern lasts, in seconds
+PATTERN_STEP = 0.5
+
+SNAPSHOT_MESSAGE_TYPES = {"SERVER_POSITION_V2", "SERVER_DELTA_V2"}
+
+
+def circle_pattern(t: float, rng: random.Random) -> int:
+    steps = [BUTTON_RIGHT, BUTTON_DOWN, BUTTON_LEFT, BUTTON_UP]
+    return steps[int(t / PATTERN_STEP) % len(steps)]
+
+
+def zigzag_pattern(t: float, rng: random.Random) -> int:
+    horizontal = BUTTON_RIGHT if int(t / (PATTERN_STEP * 4)) % 2 else BUTTON_LEFT
+    vertical = BUTTON_DOWN if int(t / PATTERN_STEP) % 2 else BUTTON_UP
+    return horizontal | vertical
+
+
+def random_pattern(t: float, rng: random.Random) -> int:
+    return rng.randrange(16)
+
+
+def idle_pattern(t: float, rng: random.Random) -> int:
+    return 0
+
+
+PATTERNS: Dict[str, Callable[[float, random.Random], int]] = {
+    "circle": circle_pattern,
+    "zigzag": zigzag_pattern,
+    "random": random_pattern,
+    "idle": idle_pattern,
+}
+
+
+@dataclass
+class BotStats:
+    connect_time: float | None = None
+    snapshots: int = 0
+    # How many of the snapshots were deltas
+    deltas: int = 0
+    inputs: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    run_time: float = 0.0
+    error: str | None = None
+    snapshot_gaps: List[float] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+
+
+class Bot:
+    def __init__(
+        self,
+        url: str,
+        pattern: Callable[[float, random.Random], int],
+        input_rate: float,
+        wire_format: WireFormat,
+        seed: int,
+        deltas: bool = True,
+    ):
+        self.id = str(uuid.uuid4())
+        url = url.replace("{player_session_uuid}", self.id)
+        self.url = f"{url}?wire_format={wire_format.value}"
+        self.pattern = pattern
+        self.input_interval = 1 / input_rate
+        self.wire_format = wire_format
+        self.rng = random.Random(seed)
+        self.predictor = InputPredictor()
+        self.decoder = DeltaDecoder() if deltas else None
+        # Send time of inputs that haven't been acknowledged yet
+        self.sent_at: Dict[int, float] = {}
+        self.stats = BotStats()
+
+    async def run(self, duration: float):
+        start = time.perf_counter()
+        try:
+            async with connect(self.url, max_queue=None) as websocket:
+                self.stats.connect_time = time.perf_counter() - start
+                receiver = asyncio.create_task(self._receive(websocket))
+                try:
+                    await self._send_inputs(websocket, duration)
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            self.stats.error = f"{type(e).__name__}: {e}"
+        self.stats.run_time = time.perf_counter() - start
+
+    async def _send_inputs(self, websocket, duration: float):
+        start = time.perf_counter()
+        next_send = start
+        while (now := time.perf_counter()) - start < duration:
+            command = self.predictor.record(
+                self.pattern(now - start, self.rng), self.input_interval
+            )
+            frame = encode_ws_message(
+                WS_Message(
+                    player_session_uuid=self.id,
+                    message_type="CLIENT_INPUT_V2",
+                    body=command.to_body(),
+                ),
+                self.wire_format,
+            )
+            self.sent_at[command.seq] = time.perf_counter()
+            await websocket.send(frame)
+            self.stats.inputs += 1
+            self.stats.bytes_out += len(frame)
+
+            next_send += self.input_interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    async def _receive(self, websocket):
+        last_arrival = None
+        async for frame in websocket:
+            now = time.perf_counter()
+            self.stats.bytes_in += len(frame)
+            if peek_message_type(frame) not in SNAPSHOT_MESSAGE_TYPES:
+                continue
+            try:
+                ws_msg = decode_ws_message(frame)
+                states = self._apply_snapshot(ws_msg)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if states is None:
+                # Late, or its baseline is gone
+                continue
+
+            self.stats.snapshots += 1
+            if last_arrival is not None:
+                self.stats.snapshot_gaps.append(now - last_arrival)
+            last_arrival = now
+
+            if ws_msg.message_type == "SERVER_DELTA_V2":
+                self.stats.deltas += 1
+                # Deltas only have our last input, not every player's
+                acked_seq = ws_msg.body.input_seq
+            else:
+                own = states.get(self.id)
+                acked_seq = own.last_input_seq if own else None
+            if acked_seq:
+                self._acknowledge(acked_seq, now)
+            if self.decoder:
+                await self._send_ack(websocket, ws_msg.tick)
+
+    def _apply_snapshot(self, ws_msg: WS_Message) -> Dict[str, EntityState] | None:
+        """The full snapshot by id, None if it couldn't be applied."""
+        if self.decoder is None:
+            return {state.id: state for state in ws_msg.body}
+        if ws_msg.message_type == "SERVER_DELTA_V2":
+            changes = self.decoder.delta(ws_msg.tick, ws_msg.body)
+        else:
+            changes = self.decoder.keyframe(ws_msg.tick, ws_msg.body)
+        return changes.states if changes else None
+
+    async def _send_ack(self, websocket, tick: int):
+        frame = encode_ws_message(
+            WS_Message(
+                player_session_uuid=self.id,
+                message_type="CLIENT_ACK_V2",
+                body="",
+                tick=tick,
+            ),
+            self.wire_format,
+        )
+        await websocket.send(frame)
+        self.stats.bytes_out += len(frame)
+
+    def _acknowledge(self, acked_seq: int, now: float):
+        sent_at = self.sent_at.pop(acked_seq, None)
+        if sent_at is not None:
+            self.stats.latencies.append(now - sent_at)
+        # Older inputs are covered by this acknowledgement
+        for seq in [seq for seq in self.sent_at if seq < acked_seq]:
+            del self.sent_at[seq]
+
+
+def percentiles(values: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    """p50/p90/p99/max, in milliseconds by default."""
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {}
+    for name, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        index = min(len(values) - 1, math.ceil(p * len(values)) - 1)
+        result[name] = round(values[index] * scale, 3)
+    result["max"] = round(values[-1] * scale, 3)
+    return result
+
+
+def summarize(bots: List[Bot]) -> Dict:
+    stats = [bot.stats for bot in bots]
+    connected = [s for s in stats if s.connect_time is not None]
+    gaps = [gap for s in stats for gap in s.snapshot_gaps]
+    jitters = [
+        statistics.pstdev(s.snapshot_gaps) for s in stats if len(s.snapshot_gaps) > 1
+    ]
+    bytes_in = [s.bytes_in / s.run_time for s in connected if s.run_time > 0]
+    bytes_out = [s.bytes_out / s.run_time for s in connected if s.run_time > 0]
+    errors: Dict[str, int] = {}
+    for s in stats:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+
+    return {
+        "bots": len(stats),
+        "connected": len(connected),
+        "errors": errors,
+        "connect_time_ms": percentiles([s.connect_time for s in connected]),
+        "snapshots": sum(s.snapshots for s in stats),
+        "deltas": sum(s.deltas for s in stats),
+        "snapshot_gap_ms": percentiles(gaps),
+        "snapshot_jitter_ms": percentiles(jitters),
+        "latency_ms": percentiles([l for s in stats for l in s.latencies]),
+        "inputs_sent": sum(s.inputs for s in stats),
+        "inputs_acked": sum(len(s.latencies) for s in stats),
+        "bytes_in_per_sec_per_bot": (
+            round(statistics.mean(bytes_in), 1) if bytes_in else 0
+        ),
+        "bytes_out_per_sec_per_bot": (
+            round(statistics.mean(bytes_out), 1) if bytes_out else 0
+        ),
+    }
+
+
+def raise_open_file_limit():
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server.v2.app:app",
+            "--host",
+            TEST_HOST,
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ]
+    )
+
+
+def bot_url(port: int, rooms: int, index: int) -> str:
+    """Bots go to the default room, or are dealt out over `rooms` rooms."""
+    if rooms <= 1:
+        return f"ws://{TEST_HOST}:{port}{FullPath.WS.value}"
+    path = FullPath.ROOM_WS.value.replace("{room_id}", f"bots-{index % rooms}")
+    return f"ws://{TEST_HOST}:{port}{path}"
+
+
+async def run_swarm(args) -> Dict:
+    wire_format = parse_wire_format(args.wire_format)
+    bots = [
+        Bot(
+            bot_url(args.port, args.rooms, i),
+            PATTERNS[args.pattern],
+            args.input_rate,
+            wire_format,
+            args.seed + i,
+            deltas=not args.no_deltas,
+        )
+        for i in range(args.bots)
+    ]
+
+    tasks = []
+    for bot in bots:
+        # Spread out the handshakes instead of opening every
+        # connection at once
+        tasks.append(asyncio.create_task(bot.run(args.duration)))
+        await asyncio.sleep(1 / args.connect_rate)
+    await asyncio.gather(*tasks)
+    return summarize(bots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--pattern", choices=PATTERNS, default="circle")
+    parser.add_argument(
+        "--input-rate", type=float, default=60.0, help="inputs per second per bot"
+    )
+    parser.add_argument(
+        "--connect-rate", type=float, default=100.0, help="new bots per second"
+    )
+    parser.add_argument(
+        "--wire-format", choices=[f.value for f in WireFormat], default="json"
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--rooms", type=int, default=1, help="spread the bots over this many rooms"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-deltas",
+        action="store_true",
+        help="don't acknowledge snapshots, so the server only sends full ones",
+    )
+    parser.add_argument(
+        "--spawn-server", action="store_true", help="start a v2 server on --port"
+    )
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    server = spawn_server(args.port) if args.spawn_server else None
+    try:
+        if server:
+            # Give uvicorn time to start
+            time.sleep(3)
+        report = asyncio.run(run_swarm(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
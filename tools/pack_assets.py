@@ -0,0 +1,79 @@
+"""
+Packs the game's assets into one bundle for release builds, see
+`game_assets/bundle.py` for the format.
+
+```
+python tools/pack_assets.py --output game_assets/assets.bundle
+```
+
+or
+
+```
+bazel build //client:asset_bundle
+```
+
+Everything in `game_assets/img` and `game_assets/data` goes in, plus the
+files of pygame's examples that the games use.  The client picks up the
+bundle from `game_assets/assets.bundle` or from `ASSET_BUNDLE`.
+"""
+
+import argparse
+from pathlib import Path
+import sys
+from typing import Dict
+
+from game_assets.bundle import AssetBundle, write_bundle
+from game_assets.interface import BUNDLE_NAME, get_asset_dirs
+from lib.assets import default_asset_dirs
+
+# Used by `lib/v2/game_simple.py` and the aliens reference
+PYGAME_EXAMPLE_ASSETS = (
+    "player1.gif",
+    "explosion1.gif",
+    "alien1.gif",
+    "alien2.gif",
+    "alien3.gif",
+    "bomb.gif",
+    "shot.gif",
+    "background.gif",
+    "boom.wav",
+    "car_door.wav",
+    "house_lo.wav",
+)
+
+
+def collect_assets() -> Dict[str, Path]:
+    files: Dict[str, Path] = {}
+    for asset_dir in get_asset_dirs():
+        for path in sorted(asset_dir.iterdir()):
+            if path.is_file() and path.suffix != ".py":
+                files.setdefault(path.name, path)
+    pygame_dir = default_asset_dirs()[-1]
+    for name in PYGAME_EXAMPLE_ASSETS:
+        files.setdefault(name, pygame_dir / name)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=get_asset_dirs()[0].parent / BUNDLE_NAME,
+        help="defaults to game_assets/assets.bundle",
+    )
+    args = parser.parse_args()
+
+    files = collect_assets()
+    write_bundle(files, args.output)
+    bundle = AssetBundle(args.output)
+    size = args.output.stat().st_size
+    print(
+        f"Packed {len(bundle.entries)} assets into {args.output} "
+        f"({size / 1024:.0f} KiB)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
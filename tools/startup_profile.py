@@ -0,0 +1,145 @@
+"""
+Reports how long importing a module takes and which of its imports take
+the longest, from `python -X importtime`.  Every module is imported in
+a fresh interpreter, the same as a new server worker or test run.
+
+```
+python tools/startup_profile.py server.v2.app lib.v2.game_simple --top 15
+```
+
+For every module this prints the wall time of the whole interpreter
+(median of `--runs`), the total import time, whether pygame got
+imported and whether it opened a display, then the slowest imports by
+their own time (`self`) and with everything they imported
+(`cumulative`).
+"""
+
+import argparse
+from dataclasses import dataclass
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+DEFAULT_MODULES = ("server.v2.app", "lib.v2.game_simple", "client.v2.client")
+
+# Printed to stdout by the child after the import
+REPORT_CODE = """
+import json, sys
+pygame = sys.modules.get("pygame")
+print(json.dumps({
+    "pygame": pygame is not None,
+    "display": bool(pygame and pygame.display.get_init()),
+}))
+"""
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTime]:
+    """Lines like `import time:       539 |     764591 |   fastapi`."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # The header line
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        imports.append(
+            ImportTime(
+                module=stripped,
+                self_us=int(fields[0]),
+                cumulative_us=int(fields[1]),
+                # Two spaces per level, after the one separating space
+                depth=(len(name) - len(stripped) - 1) // 2,
+            )
+        )
+    return imports
+
+
+def profile_module(module: str, runs: int = 3) -> Dict:
+    env = dict(os.environ)
+    env.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    walls = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                f"import {module}\n{REPORT_CODE}",
+            ],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+    # The last run's import times, the module files are cached by then
+    imports = parse_importtime(result.stderr)
+    state = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "module": module,
+        "wall_ms": statistics.median(walls) * 1000,
+        "import_ms": sum(i.cumulative_us for i in imports if i.depth == 0) / 1000,
+        "imports": len(imports),
+        "pygame_imported": state["pygame"],
+        "display_opened": state["display"],
+        "slowest_self": _slowest(imports, "self_us"),
+        "slowest_cumulative": _slowest(imports, "cumulative_us"),
+    }
+
+
+def _slowest(imports: List[ImportTime], attribute: str, top: int = 100):
+    slowest = sorted(imports, key=lambda i: getattr(i, attribute), reverse=True)
+    return [
+        {"module": i.module, "ms": getattr(i, attribute) / 1000} for i in slowest[:top]
+    ]
+
+
+def print_report(report: Dict, top: int):
+    print(f"{report['module']}")
+    print(
+        f"  wall {report['wall_ms']:.0f} ms, imports {report['import_ms']:.0f} ms "
+        f"({report['imports']} modules), pygame imported: "
+        f"{report['pygame_imported']}, display opened: {report['display_opened']}"
+    )
+    for key in ("slowest_self", "slowest_cumulative"):
+        print(f"  {key.replace('_', ' ')}:")
+        for entry in report[key][:top]:
+            print(f"    {entry['ms']:8.1f} ms  {entry['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="also write the reports to this JSON file")
+    args = parser.parse_args()
+
+    reports = [profile_module(module, args.runs) for module in args.modules]
+    for report in reports:
+        print_report(report, args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()